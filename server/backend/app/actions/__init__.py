@@ -2,8 +2,14 @@
 
 from .audio import handle_audio
 from .clipboard import copy_text, paste_text
-from .keyboard import handle_keyboard
-from .obs import handle_obs
+from .keyboard import (
+    handle_keyboard,
+    handle_keyboard_down,
+    handle_keyboard_type,
+    handle_keyboard_type_cancel,
+    handle_keyboard_up,
+)
+from .obs import handle_obs, handle_obs_batch
 from .processes import list_processes
 from .screenshot import take_screenshot
 from .scripts import run_script
@@ -14,7 +20,12 @@ __all__ = [
     "copy_text",
     "paste_text",
     "handle_keyboard",
+    "handle_keyboard_down",
+    "handle_keyboard_up",
+    "handle_keyboard_type",
+    "handle_keyboard_type_cancel",
     "handle_obs",
+    "handle_obs_batch",
     "list_processes",
     "take_screenshot",
     "run_script",
@@ -1,18 +1,436 @@
 from __future__ import annotations
 
-from typing import List
+import concurrent.futures
+import threading
+import time
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
 
-import pyautogui
+from loguru import logger
 
+from app.actions.keyboard_backend import KeyboardController, create_backend
+from app.config import get_settings
 
-def _parse_combo(combo: str) -> List[str]:
+settings = get_settings()
+
+# Seconds a caller waits for its keys to be sent (the queue may hold other clients' keys)
+KEYBOARD_TIMEOUT = 5.0
+
+_controller: Optional[KeyboardController] = None
+_held: Optional["HeldKeys"] = None
+_typer: Optional["TextTyper"] = None
+# Registered before the typer exists (it is created on first use)
+_typing_listeners: List["TypingListener"] = []
+_controller_lock = threading.Lock()
+
+
+@lru_cache(maxsize=512)
+def _parse_combo_cached(combo: str) -> Tuple[str, ...]:
     parts = [p.strip() for p in combo.replace("+", " ").split()]  # split on + or spaces
-    return [p.lower() for p in parts if p]
+    return tuple(p.lower() for p in parts if p)
+
+
+def _parse_combo(combo: str) -> List[str]:
+    return list(_parse_combo_cached(combo))
+
+
+def get_keyboard() -> KeyboardController:
+    """The input-thread controller, created with the configured backend on first use."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = KeyboardController(
+                    create_backend(settings.keyboard_backend), settings.keyboard_key_delay
+                )
+    return _controller
+
+
+class HeldKeys:
+    """Keys held down by clients (push-to-talk), released when the client goes away.
+
+    - a key is pressed when its first client holds it and released when its last
+      one lets go, so two decks holding the same key don't release it for each other
+    - a client's holds end on ``up``, ``release_all`` (disconnect), after an optional
+      hold duration, or ``timeout`` seconds after the client was last seen (``touch``)
+    - all state lives on the input thread: every change is a job there, so holds and
+      hotkeys stay in order and timed releases get the scheduler's sub-ms precision
+    """
+
+    def __init__(self, controller: KeyboardController, timeout: float = 35.0):
+        self.controller = controller
+        self.timeout = timeout
+        # Input thread only: key -> holding clients, client -> {key: hold generation}
+        self._holders: Dict[str, Set[Any]] = {}
+        self._clients: Dict[Any, Dict[str, int]] = {}
+        self._generation = 0
+        # Generation that started each client's current holds; stale expiry checks stop there
+        self._periods: Dict[Any, int] = {}
+        # Last sign of life per holding client (written by the event loop, read by expiry jobs)
+        self._seen: Dict[Any, float] = {}
+        self._expired = 0
+
+    def down(
+        self, client: Any, keys: Tuple[str, ...], duration: Optional[float] = None
+    ) -> concurrent.futures.Future:
+        """Hold ``keys`` for ``client``; released after ``duration`` seconds if given."""
+        return self.controller.submit(self._down, client, tuple(keys), duration)
+
+    def up(self, client: Any, keys: Optional[Tuple[str, ...]] = None) -> concurrent.futures.Future:
+        """Let go of ``keys`` (all of the client's keys when None)."""
+        return self.controller.submit(self._up, client, None if keys is None else tuple(keys), None)
+
+    def release_all(self, client: Any) -> concurrent.futures.Future:
+        return self.controller.submit(self._up, client, None, None)
+
+    def touch(self, client: Any) -> None:
+        """Record a sign of life (any message or heartbeat) from a client holding keys."""
+        if client in self._seen:
+            self._seen[client] = time.perf_counter()
+
+    def held(self, client: Any) -> List[str]:
+        return list(self._clients.get(client, ()))
+
+    def _down(self, client: Any, keys: Tuple[str, ...], duration: Optional[float]) -> List[str]:
+        self._generation += 1
+        generation = self._generation
+        held = self._clients.setdefault(client, {})
+        self._seen[client] = time.perf_counter()
+        try:
+            for key in keys:
+                holders = self._holders.setdefault(key, set())
+                if not holders:
+                    self.controller.press(key)
+                holders.add(client)
+                held[key] = generation
+        finally:
+            if not held:
+                self._forget(client)
+            elif client not in self._periods:
+                self._periods[client] = generation
+                self.controller.schedule(self.timeout, self._expire, client, generation)
+        if duration is not None:
+            self.controller.schedule(duration, self._up, client, keys, generation)
+        return list(held)
+
+    def _up(
+        self, client: Any, keys: Optional[Tuple[str, ...]], generation: Optional[int]
+    ) -> List[str]:
+        held = self._clients.get(client)
+        if not held:
+            return []
+        if keys is None:
+            keys = tuple(held)
+        released = []
+        # Last pressed first, like a hand letting go of a chord
+        for key in reversed(keys):
+            if key not in held or (generation is not None and held[key] != generation):
+                continue  # not held, or held again since this timed release was scheduled
+            del held[key]
+            holders = self._holders.get(key)
+            if holders is None:
+                continue
+            holders.discard(client)
+            if not holders:
+                del self._holders[key]
+                self.controller.release(key)
+            released.append(key)
+        if not held:
+            self._forget(client)
+        return released
+
+    def _forget(self, client: Any) -> None:
+        self._clients.pop(client, None)
+        self._periods.pop(client, None)
+        self._seen.pop(client, None)
+
+    def _expire(self, client: Any, period: int) -> None:
+        if self._periods.get(client) != period:
+            return  # released since (a later hold runs its own check)
+        idle = time.perf_counter() - self._seen.get(client, 0.0)
+        if idle < self.timeout:
+            self.controller.schedule(self.timeout - idle, self._expire, client, period)
+            return
+        self._expired += 1
+        logger.warning(f"Releasing keys of unresponsive client: {', '.join(self._clients[client])}")
+        self._up(client, None, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"clients": len(self._clients), "keys": len(self._holders), "expired": self._expired}
+
+
+# Listener signature: (client, messageId, {"status", "typed", "cancelled"[, "error"]})
+TypingListener = Callable[[Any, Any, Dict[str, Any]], None]
+
+
+class _TypingJob:
+    __slots__ = ("client", "message_id", "job_id", "text", "rate", "position", "started", "future")
+
+    def __init__(self, client: Any, message_id: Any, text: str, rate: float):
+        self.client = client
+        self.message_id = message_id
+        # Texts without a messageId can't be cancelled by id but still need a unique key
+        self.job_id = object() if message_id is None else message_id
+        self.text = text
+        self.rate = rate
+        self.position = 0
+        self.started = 0.0
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+
+
+class TextTyper:
+    """Types text (keyboard:type) on the input thread, one chunk per job.
+
+    - ``chunk`` characters go out per job and the next chunk is scheduled at
+      ``started + typed / rate``, so throughput stays at ``rate`` characters per
+      second (0 = unthrottled) and hotkeys or key releases can run between chunks
+    - texts are typed one after another, never interleaved
+    - a text is cancelled by ``(client, messageId)`` or when its client disconnects;
+      it stops before the next chunk
+    - listeners hear when a text is done (typed, cancelled or failed)
+    """
+
+    def __init__(self, controller: KeyboardController, rate: float = 300.0, chunk: int = 16):
+        self.controller = controller
+        self.rate = rate
+        self.chunk = max(1, chunk)
+        # Input thread only
+        self._jobs: Dict[Tuple[Any, Any], _TypingJob] = {}
+        self._waiting: Deque[_TypingJob] = deque()
+        self._active: Optional[_TypingJob] = None
+        self._listeners: List[TypingListener] = []
+        self.typed = 0
+        self._cancelled = 0
+
+    def add_listener(self, listener: TypingListener) -> None:
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def type(
+        self, client: Any, message_id: Any, text: str, rate: Optional[float] = None
+    ) -> concurrent.futures.Future:
+        """Queue ``text``; the future resolves to ``{"typed": n, "cancelled": bool}`` when done."""
+        # NFC: one code point per accented letter where one exists, which layouts can type
+        text = unicodedata.normalize("NFC", text.replace("\r\n", "\n"))
+        job = _TypingJob(client, message_id, text, self.rate if rate is None else rate)
+        self.controller.submit(self._enqueue, job)
+        return job.future
+
+    def cancel(self, client: Any, message_id: Any) -> concurrent.futures.Future:
+        """Stop a text; the future resolves to False if it wasn't queued or typing."""
+        return self.controller.submit(self._cancel, client, message_id)
+
+    def cancel_all(self, client: Any) -> concurrent.futures.Future:
+        return self.controller.submit(self._cancel_all, client)
+
+    def _enqueue(self, job: _TypingJob) -> None:
+        key = (job.client, job.job_id)
+        if key in self._jobs:
+            self._notify(job, ValueError(f"Text {job.message_id} is already being typed"))
+            return
+        self._jobs[key] = job
+        self._waiting.append(job)
+        if self._active is None:
+            self._next()
+
+    def _next(self) -> None:
+        if self._waiting:
+            job = self._active = self._waiting.popleft()
+            job.started = time.perf_counter()
+            self._step(job)
+
+    def _step(self, job: _TypingJob) -> None:
+        if job is not self._active:
+            return  # cancelled while this chunk was scheduled
+        end = job.position + self.chunk
+        try:
+            self.controller.type_text(job.text[job.position : end])
+        except Exception as exc:
+            self._finish(job, exc)
+            return
+        typed = min(end, len(job.text)) - job.position
+        job.position += typed
+        self.typed += typed
+        if job.position >= len(job.text):
+            self._finish(job)
+        elif job.rate > 0:
+            due = job.started + job.position / job.rate
+            self.controller.schedule(due - time.perf_counter(), self._step, job)
+        else:
+            self.controller.submit(self._step, job)
+
+    def _finish(
+        self, job: _TypingJob, error: Optional[BaseException] = None, cancelled: bool = False
+    ) -> None:
+        self._jobs.pop((job.client, job.job_id), None)
+        self._notify(job, error, cancelled)
+        if job is self._active:
+            self._active = None
+            self._next()
+
+    def _notify(
+        self, job: _TypingJob, error: Optional[BaseException] = None, cancelled: bool = False
+    ) -> None:
+        result: Dict[str, Any] = {"status": "ok", "typed": job.position, "cancelled": cancelled}
+        if error is not None:
+            result.update(status="error", error=str(error))
+            job.future.set_exception(error)
+        else:
+            job.future.set_result({"typed": job.position, "cancelled": cancelled})
+        for listener in list(self._listeners):
+            try:
+                listener(job.client, job.message_id, result)
+            except Exception:
+                logger.exception("Typing listener failed")
+
+    def _cancel(self, client: Any, job_id: Any) -> bool:
+        job = self._jobs.get((client, job_id))
+        if job is None:
+            return False
+        self._cancelled += 1
+        if job is not self._active:
+            self._waiting.remove(job)
+        self._finish(job, cancelled=True)
+        return True
+
+    def _cancel_all(self, client: Any) -> None:
+        for owner, job_id in [key for key in self._jobs if key[0] is client]:
+            self._cancel(owner, job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "chunk": self.chunk,
+            "queued": len(self._jobs),
+            "typed": self.typed,
+            "cancelled": self._cancelled,
+        }
+
+
+def get_held_keys() -> HeldKeys:
+    global _held
+    if _held is None:
+        controller = get_keyboard()
+        with _controller_lock:
+            if _held is None:
+                _held = HeldKeys(controller, settings.keyboard_hold_timeout)
+    return _held
+
+
+def get_typer() -> TextTyper:
+    global _typer
+    if _typer is None:
+        controller = get_keyboard()
+        with _controller_lock:
+            if _typer is None:
+                typer = TextTyper(
+                    controller, settings.keyboard_type_rate, settings.keyboard_type_chunk
+                )
+                for listener in _typing_listeners:
+                    typer.add_listener(listener)
+                _typer = typer
+    return _typer
+
+
+def add_typing_listener(listener: TypingListener) -> None:
+    """Be told when a keyboard:type text is done; see ``TypingListener``."""
+    if listener not in _typing_listeners:
+        _typing_listeners.append(listener)
+    if _typer is not None:
+        _typer.add_listener(listener)
+
+
+def touch_client(client: Any) -> None:
+    """Heartbeat hook for the websocket; a no-op until something has been held."""
+    if _held is not None:
+        _held.touch(client)
+
+
+def release_client(client: Any) -> None:
+    """Disconnect hook for the websocket: let go of everything the client holds or types."""
+    if _held is not None:
+        _held.release_all(client)
+    if _typer is not None:
+        _typer.cancel_all(client)
+
+
+def _hold_request(data: Any) -> Tuple[Tuple[str, ...], Optional[float]]:
+    """``"ctrl+m"`` or ``{"keys": "ctrl+m", "durationMs": 500}`` -> (keys, seconds)."""
+    duration_ms = None
+    if isinstance(data, dict):
+        duration_ms = data.get("durationMs")
+        data = data.get("keys")
+    if not isinstance(data, str) or not data.strip():
+        raise ValueError("Keyboard hold payload must be a key combo like 'ctrl+m'")
+    if duration_ms is None:
+        return _parse_combo_cached(data), None
+    try:
+        duration = float(duration_ms) / 1000
+    except (TypeError, ValueError):
+        raise ValueError("durationMs must be a number") from None
+    return _parse_combo_cached(data), max(0.0, duration)
+
+
+def _wait(future: concurrent.futures.Future) -> Any:
+    try:
+        return future.result(KEYBOARD_TIMEOUT)
+    except concurrent.futures.TimeoutError:
+        raise RuntimeError("Keyboard input timed out") from None
+
+
+def handle_keyboard_down(data: Any, client: Any = None) -> dict:
+    keys, duration = _hold_request(data)
+    held = _wait(get_held_keys().down(client, keys, duration))
+    return {"status": "ok", "held": held}
+
+
+def handle_keyboard_up(data: Any = None, client: Any = None) -> dict:
+    """Release the given combo, or every key the client holds when ``data`` is empty."""
+    keys = None if data in (None, "", {}) else _hold_request(data)[0]
+    released = _wait(get_held_keys().up(client, keys))
+    return {"status": "ok", "released": released}
+
+
+def handle_keyboard_type(data: Any, client: Any = None, message_id: Any = None) -> dict:
+    """Queue ``"text"`` or ``{"text": ..., "rate": chars/s}`` and return without waiting.
+
+    Typing a paragraph takes seconds, so the ack only confirms the text is queued;
+    typing listeners (the websocket's ``keyboard:typed`` event) report when it's done.
+    """
+    rate = None
+    if isinstance(data, dict):
+        rate = data.get("rate")
+        data = data.get("text")
+    if not isinstance(data, str) or not data:
+        raise ValueError("Keyboard type payload must be a non-empty string")
+    typer = get_typer()
+    if rate is not None:
+        try:
+            rate = max(0.0, float(rate))
+        except (TypeError, ValueError):
+            raise ValueError("rate must be a number of characters per second") from None
+    else:
+        rate = typer.rate
+    typer.type(client, message_id, data, rate)
+    return {
+        "status": "ok",
+        "queued": len(data),
+        "etaMs": round(len(data) / rate * 1000) if rate else 0,
+    }
+
+
+def handle_keyboard_type_cancel(data: Any, client: Any = None) -> dict:
+    """Cancel the keyboard:type request with messageId ``data`` (or ``{"messageId": ...}``)."""
+    message_id = data.get("messageId") if isinstance(data, dict) else data
+    if message_id is None:
+        raise ValueError("Keyboard type cancel needs the messageId of the text")
+    return {"status": "ok", "cancelled": _wait(get_typer().cancel(client, message_id))}
 
 
 def handle_keyboard(combo: str) -> dict:
     if not isinstance(combo, str) or not combo.strip():
         raise ValueError("Keyboard payload must be a non-empty string like 'ctrl+shift+s'")
-    keys = _parse_combo(combo)
-    pyautogui.hotkey(*keys)
+    _wait(get_keyboard().hotkey(_parse_combo_cached(combo)))
     return {"status": "ok", "combo": combo}
@@ -0,0 +1,336 @@
+"""Synthetic key event backends (pynput, pyautogui, recording) and the input thread."""
+
+from __future__ import annotations
+
+import concurrent.futures
+import heapq
+import itertools
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+KEYBOARD_BACKENDS = ("auto", "pynput", "pyautogui", "null")
+
+# Characters of typed text that are sent as named keys
+_TEXT_KEYS = {"\n": "enter", "\r": "enter", "\t": "tab"}
+
+# pyautogui key names (the deck's vocabulary) -> pynput Key attribute names; names pynput has
+# no Key for (numpad, browser and IME keys, f21-f24...) are sent through pyautogui
+_PYNPUT_ALIASES = {
+    "control": "ctrl",
+    "ctrlleft": "ctrl_l",
+    "ctrlright": "ctrl_r",
+    "shiftleft": "shift_l",
+    "shiftright": "shift_r",
+    "option": "alt",
+    "altleft": "alt_l",
+    "altright": "alt_r",
+    "optionleft": "alt_l",
+    "optionright": "alt_r",
+    "win": "cmd",
+    "windows": "cmd",
+    "super": "cmd",
+    "meta": "cmd",
+    "command": "cmd",
+    "winleft": "cmd_l",
+    "winright": "cmd_r",
+    "return": "enter",
+    "escape": "esc",
+    "del": "delete",
+    "pageup": "page_up",
+    "pgup": "page_up",
+    "pagedown": "page_down",
+    "pgdn": "page_down",
+    "capslock": "caps_lock",
+    "numlock": "num_lock",
+    "scrolllock": "scroll_lock",
+    "printscreen": "print_screen",
+    "prtsc": "print_screen",
+    "prtscr": "print_screen",
+    "prntscrn": "print_screen",
+    "print": "print_screen",
+    "apps": "menu",
+    "volumeup": "media_volume_up",
+    "volumedown": "media_volume_down",
+    "volumemute": "media_volume_mute",
+    "playpause": "media_play_pause",
+    "nexttrack": "media_next",
+    "prevtrack": "media_previous",
+}
+
+
+class KeyboardBackend(ABC):
+    """Presses and releases single keys; only ever called from the input thread."""
+
+    name = "base"
+
+    @abstractmethod
+    def press(self, key: str) -> None: ...
+
+    @abstractmethod
+    def release(self, key: str) -> None: ...
+
+    def type_text(self, text: str) -> None:
+        """Type ``text`` as-is (any character, not just key names)."""
+        for char in text:
+            key = _TEXT_KEYS.get(char, char)
+            self.press(key)
+            self.release(key)
+
+
+class PynputBackend(KeyboardBackend):
+    name = "pynput"
+
+    def __init__(self) -> None:
+        from pynput.keyboard import Controller, Key, KeyCode  # type: ignore
+
+        self._controller = Controller()
+        self._key = Key
+        self._key_code = KeyCode
+        self._resolved: Dict[str, Any] = {}
+        # pyautogui, imported on the first key name pynput has no Key for (False: unavailable)
+        self._pyautogui: Any = None
+
+    def _resolve(self, key: str) -> Any:
+        """pynput key for ``key``, or None if it has to be sent through pyautogui."""
+        if key in self._resolved:
+            return self._resolved[key]
+        special = getattr(self._key, _PYNPUT_ALIASES.get(key, key), None)
+        if special is not None:
+            resolved = special
+        elif len(key) == 1:
+            resolved = self._key_code.from_char(key)
+        elif self._fallback_valid(key):
+            resolved = None
+        else:
+            raise ValueError(f"Unknown key: {key}")
+        self._resolved[key] = resolved
+        return resolved
+
+    def _fallback_valid(self, key: str) -> bool:
+        if self._pyautogui is None:
+            try:
+                import pyautogui  # type: ignore
+            except Exception:  # noqa: BLE001 - pyautogui raises various errors without a display
+                pyautogui = False
+            self._pyautogui = pyautogui
+        return bool(self._pyautogui) and bool(self._pyautogui.isValidKey(key))
+
+    def press(self, key: str) -> None:
+        resolved = self._resolve(key)
+        if resolved is None:
+            self._pyautogui.keyDown(key, _pause=False)
+        else:
+            self._controller.press(resolved)
+
+    def release(self, key: str) -> None:
+        resolved = self._resolve(key)
+        if resolved is None:
+            self._pyautogui.keyUp(key, _pause=False)
+        else:
+            self._controller.release(resolved)
+
+    def type_text(self, text: str) -> None:
+        # Sends any Unicode character, using the platform's unicode input where no key has it
+        self._controller.type(text)
+
+
+class PyAutoGUIBackend(KeyboardBackend):
+    name = "pyautogui"
+
+    def __init__(self) -> None:
+        import pyautogui  # type: ignore
+
+        self._pyautogui = pyautogui
+
+    def press(self, key: str) -> None:
+        # _pause=False skips pyautogui.PAUSE (0.1 s) after every event
+        self._pyautogui.keyDown(key, _pause=False)
+
+    def release(self, key: str) -> None:
+        self._pyautogui.keyUp(key, _pause=False)
+
+    def type_text(self, text: str) -> None:
+        # pyautogui.write silently drops characters it has no key for
+        missing = sorted({char for char in text if not self._pyautogui.isValidKey(char)})
+        if missing:
+            raise ValueError(
+                f"pyautogui can't type {''.join(missing)!r}; install pynput for Unicode text"
+            )
+        self._pyautogui.write(text, _pause=False)
+
+
+class RecordingBackend(KeyboardBackend):
+    """Null backend for tests: records ``(event, key, perf_counter)`` instead of typing."""
+
+    name = "null"
+
+    def __init__(self) -> None:
+        self.events: List[Tuple[str, str, float]] = []
+
+    def press(self, key: str) -> None:
+        self.events.append(("down", key, time.perf_counter()))
+
+    def release(self, key: str) -> None:
+        self.events.append(("up", key, time.perf_counter()))
+
+    def type_text(self, text: str) -> None:
+        self.events.append(("type", text, time.perf_counter()))
+
+    def keys(self) -> List[Tuple[str, str]]:
+        return [(event, key) for event, key, _ in self.events]
+
+
+def create_backend(name: str = "auto") -> KeyboardBackend:
+    """Backend by name; ``auto`` prefers pynput and falls back to pyautogui."""
+    name = (name or "auto").strip().lower()
+    if name == "null":
+        return RecordingBackend()
+    if name == "pynput":
+        return PynputBackend()
+    if name == "pyautogui":
+        return PyAutoGUIBackend()
+    if name != "auto":
+        raise ValueError(f"Unknown keyboard backend {name!r}, expected one of {KEYBOARD_BACKENDS}")
+    try:
+        return PynputBackend()
+    except Exception as exc:  # noqa: BLE001 - pynput raises various errors without a display
+        logger.info(f"pynput unavailable ({exc}), using pyautogui for keyboard input")
+    return PyAutoGUIBackend()
+
+
+class KeyboardController:
+    """Runs every synthetic key event on one ``keyboard-input`` thread.
+
+    - one queue for all clients: combos never interleave and keep their order
+    - the backend is only touched from that thread (X11/pynput aren't thread-safe)
+    - ``key_delay`` seconds between events (0 = as fast as the OS takes them)
+    - ``schedule`` runs a job at a set time: the thread sleeps until just before
+      it and spins the last ``SPIN_SECONDS``, so it runs within a fraction of a
+      millisecond of its deadline
+    """
+
+    SPIN_SECONDS = 0.002
+
+    def __init__(self, backend: KeyboardBackend, key_delay: float = 0.0):
+        self.backend = backend
+        self.key_delay = max(0.0, key_delay)
+        # (due, sequence, fn, args, future); sequence keeps same-time jobs in submit order
+        self._jobs: List[
+            Tuple[float, int, Callable[..., Any], tuple, concurrent.futures.Future]
+        ] = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="keyboard-input", daemon=True)
+        self._thread.start()
+        self._events = 0
+        self._errors = 0
+        self._late_max = 0.0
+
+    def _next_job(
+        self,
+    ) -> Optional[Tuple[float, Callable[..., Any], tuple, concurrent.futures.Future]]:
+        while True:
+            with self._cond:
+                while not self._closed and not self._jobs:
+                    self._cond.wait()
+                if self._closed:
+                    return None
+                due = self._jobs[0][0]
+                remaining = due - time.perf_counter()
+                if remaining <= 0:
+                    _, _, fn, args, future = heapq.heappop(self._jobs)
+                    return due, fn, args, future
+                if remaining > self.SPIN_SECONDS:
+                    # Woken early by a new (possibly earlier) job: look again
+                    self._cond.wait(remaining - self.SPIN_SECONDS)
+                    continue
+            while time.perf_counter() < due:
+                time.sleep(0)  # spin, but let other threads have the GIL meanwhile
+
+    def _run(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            due, fn, args, future = job
+            self._late_max = max(self._late_max, time.perf_counter() - due)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as exc:  # noqa: BLE001 - reported to the caller
+                self._errors += 1
+                future.set_exception(exc)
+
+    def schedule(
+        self, delay: float, fn: Callable[..., Any], *args: Any
+    ) -> concurrent.futures.Future:
+        """Run ``fn(*args)`` on the input thread ``delay`` seconds from now."""
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._cond:
+            heapq.heappush(
+                self._jobs,
+                (time.perf_counter() + max(0.0, delay), next(self._sequence), fn, args, future),
+            )
+            self._cond.notify()
+        return future
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> concurrent.futures.Future:
+        """Run ``fn(*args)`` on the input thread after everything queued before it."""
+        return self.schedule(0.0, fn, *args)
+
+    def _pause(self) -> None:
+        if self.key_delay:
+            time.sleep(self.key_delay)
+
+    def press(self, key: str) -> None:
+        """Key down; input thread only (use ``submit``/``schedule`` from elsewhere)."""
+        self.backend.press(key)
+        self._events += 1
+        self._pause()
+
+    def release(self, key: str) -> None:
+        """Key up; input thread only."""
+        self.backend.release(key)
+        self._events += 1
+        self._pause()
+
+    def type_text(self, text: str) -> None:
+        """Type a run of text; input thread only."""
+        self.backend.type_text(text)
+        self._events += len(text)
+        self._pause()
+
+    def _hotkey(self, keys: Sequence[str]) -> None:
+        pressed: List[str] = []
+        try:
+            for key in keys:
+                self.press(key)
+                pressed.append(key)
+        finally:
+            # Release in reverse order, even if a press failed halfway
+            for key in reversed(pressed):
+                self.release(key)
+
+    def hotkey(self, keys: Sequence[str]) -> concurrent.futures.Future:
+        return self.submit(self._hotkey, tuple(keys))
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "keyDelay": self.key_delay,
+            "queued": len(self._jobs),
+            "events": self._events,
+            "errors": self._errors,
+            "maxLateMs": round(self._late_max * 1000, 3),
+        }
@@ -1,23 +1,81 @@
 from __future__ import annotations
 
 import base64
-from typing import Any, Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
 
 import httpx
 from loguru import logger
 
+from app.actions.obs_actions import OBS_ACTIONS
+from app.actions.obs_meters import AudioMeterHub
+from app.actions.obs_state import OBSStateMirror, control_state
+from app.actions.obs_thumbnails import Thumbnail, ThumbnailService
+from app.actions.obs_ws import (
+    BATCH_EXECUTION_TYPES,
+    OBSRequestClient,
+    OBSWebSocketClient,
+    batch_request_items,
+    batch_result,
+    raise_for_batch,
+    raise_for_request_status,
+)
 from app.config import get_settings
+from app.utils.circuit_breaker import AdaptiveTimeout, CircuitBreaker
 
 settings = get_settings()
 
+T = TypeVar("T")
+
+# Upper bound for the generic obs:batch action
+MAX_BATCH_REQUESTS = 100
 
-class OBSClient:
-    """Lightweight RPC client against OBS WebSocket HTTP endpoint."""
 
-    def __init__(self, url: str, password: str = "", timeout: float = 10.0):
+class OBSClient:
+    """Lightweight RPC client against OBS WebSocket HTTP endpoint.
+
+    Requests go through one long-lived keep-alive connection pool, created on first
+    use and closed by ``close()`` (on app shutdown), so a button press doesn't pay for
+    a TCP connect and the auth header is built once.
+
+    Consecutive transport failures open a circuit breaker: calls then fail at once
+    while a background probe (``GetVersion``) waits for OBS to come back. Request
+    timeouts follow the observed latency, with ``timeout`` as the upper bound.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        password: str = "",
+        timeout: float = 10.0,
+        max_connections: int = 4,
+        max_keepalive_connections: int = 2,
+        keepalive_expiry: float = 30.0,
+        transport: Optional[httpx.BaseTransport] = None,
+        timeout_min: float = 1.0,
+        breaker_threshold: int = 3,
+        breaker_reset: float = 5.0,
+    ):
         self.base_url = self._normalize_url(url)
         self.password = password or ""
         self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._transport = transport
+        self._http: Optional[httpx.Client] = None
+        self._http_lock = threading.Lock()
+        self._requests = 0
+        self._failures = 0
+        self._pools_created = 0
+        self.breaker = CircuitBreaker(
+            "obs-http", breaker_threshold, breaker_reset, probe=self._probe
+        )
+        self.latency = AdaptiveTimeout(timeout_min, timeout)
 
     @staticmethod
     def _normalize_url(url: str) -> str:
@@ -31,52 +89,137 @@ class OBSClient:
             headers["Authorization"] = f"Basic {token}"
         return headers
 
+    def _get_http(self) -> httpx.Client:
+        http = self._http
+        if http is None:
+            with self._http_lock:
+                if self._http is None:
+                    self._http = httpx.Client(
+                        base_url=self.base_url,
+                        headers=self._headers(),
+                        timeout=self.timeout,
+                        limits=self.limits,
+                        transport=self._transport,
+                    )
+                    self._pools_created += 1
+                http = self._http
+        return http
+
+    def _probe(self) -> None:
+        response = self._get_http().post(
+            "/api", json={"requestType": "GetVersion", "requestData": {}}
+        )
+        response.raise_for_status()
+
+    def close(self) -> None:
+        """Close the pooled connections; the next call opens a new pool."""
+        self.breaker.close()
+        with self._http_lock:
+            http, self._http = self._http, None
+        if http is not None:
+            http.close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "requests": self._requests,
+            "failures": self._failures,
+            "poolsCreated": self._pools_created,
+            "maxConnections": self.limits.max_connections,
+            "maxKeepalive": self.limits.max_keepalive_connections,
+            "open": 0,
+            "idle": 0,
+            "breaker": self.breaker.stats(),
+            "latency": self.latency.stats(),
+        }
+        http = self._http
+        # httpx keeps the connection pool on its (default) transport
+        pool = getattr(getattr(http, "_transport", None), "_pool", None)
+        try:
+            connections = list(getattr(pool, "connections", None) or [])
+            stats["open"] = len(connections)
+            stats["idle"] = sum(1 for connection in connections if connection.is_idle())
+        except Exception:  # noqa: BLE001 - stats must never break diagnostics
+            pass
+        return stats
+
     def call(self, request_type: str, request_data: Dict[str, Any] | None = None) -> Dict[str, Any]:
-        payload = {"requestType": request_type, "requestData": request_data or {}}
+        result = self._post({"requestType": request_type, "requestData": request_data or {}})
+        raise_for_request_status(result.get("requestStatus", {}))
+        return result.get("responseData", {})
 
-        try:
-            response = httpx.post(
-                f"{self.base_url}/api",
-                json=payload,
-                headers=self._headers(),
-                timeout=self.timeout,
+    def call_batch(
+        self,
+        requests: Sequence[Dict[str, Any]],
+        execution_type: str = "serial",
+        halt_on_failure: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Same contract as ``OBSWebSocketClient.call_batch``.
+
+        The HTTP endpoint has no batch request, so the requests are sent one by one
+        over the pooled connection (``parallel`` runs serially too).
+        """
+        if execution_type not in BATCH_EXECUTION_TYPES:
+            raise ValueError(
+                f"Unknown batch execution type {execution_type!r}, "
+                f"expected one of {tuple(BATCH_EXECUTION_TYPES)}"
             )
-            response.raise_for_status()
-        except httpx.TimeoutException:
-            raise RuntimeError("OBS WebSocket connection timeout. Is OBS Studio running?") from None
-        except httpx.HTTPStatusError as exc:
-            status = exc.response.status_code
-            reason = exc.response.reason_phrase
-            if status == 404:
-                raise RuntimeError(
-                    "OBS WebSocket server not found. Is OBS Studio running with WebSocket enabled?"
-                ) from None
-            if status == 401:
-                raise RuntimeError("OBS WebSocket authentication failed. Check your password.") from None
-            if status == 0 or status >= 500:
-                raise RuntimeError(f"OBS WebSocket server error: {reason}. Is OBS Studio running?") from None
-            raise RuntimeError(f"OBS request failed: {reason}") from None
-        except httpx.RequestError as exc:
-            message = str(exc)
-            lowered = message.lower()
-            if "timeout" in lowered or "aborted" in lowered:
-                raise RuntimeError("OBS WebSocket connection timeout. Is OBS Studio running?") from None
-            raise RuntimeError(
-                "Cannot connect to OBS WebSocket server. Is OBS Studio running with WebSocket enabled on port 4455?"
-            ) from None
-
-        result = response.json()
-        status_info = result.get("requestStatus", {})
-        code = status_info.get("code")
-        if code != 100:
-            comment = status_info.get("comment") or "Unknown error"
-            if code == 404:
-                raise RuntimeError(f"OBS resource not found: {comment}") from None
-            if code == 400:
-                raise RuntimeError(f"OBS invalid request: {comment}") from None
-            raise RuntimeError(f"OBS request error (code {code}): {comment}") from None
+        results = []
+        for request in batch_request_items(requests):
+            result = self._post(request)
+            results.append(
+                batch_result(
+                    request["requestType"],
+                    result.get("requestStatus", {}),
+                    result.get("responseData"),
+                )
+            )
+            if halt_on_failure and not results[-1]["ok"]:
+                break
+        return results
 
-        return result.get("responseData", {})
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.breaker.allow():
+            raise RuntimeError(
+                f"OBS is unavailable (circuit open, retrying in {self.breaker.retry_in():.1f}s). "
+                "Is OBS Studio running?"
+            )
+        self._requests += 1
+        started = time.perf_counter()
+        try:
+            response = self._get_http().post("/api", json=payload, timeout=self.latency.timeout())
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            self._failures += 1
+            self.breaker.record_failure()
+            raise _transport_error(exc) from None
+        self.latency.observe(time.perf_counter() - started)
+        self.breaker.record_success()
+        return response.json()
+
+
+def _transport_error(exc: httpx.HTTPError) -> RuntimeError:
+    """User-facing error for a failed HTTP request to OBS."""
+    if isinstance(exc, httpx.TimeoutException):
+        return RuntimeError("OBS WebSocket connection timeout. Is OBS Studio running?")
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        reason = exc.response.reason_phrase
+        if status == 404:
+            return RuntimeError(
+                "OBS WebSocket server not found. Is OBS Studio running with WebSocket enabled?"
+            )
+        if status == 401:
+            return RuntimeError("OBS WebSocket authentication failed. Check your password.")
+        if status == 0 or status >= 500:
+            return RuntimeError(f"OBS WebSocket server error: {reason}. Is OBS Studio running?")
+        return RuntimeError(f"OBS request failed: {reason}")
+    lowered = str(exc).lower()
+    if "timeout" in lowered or "aborted" in lowered:
+        return RuntimeError("OBS WebSocket connection timeout. Is OBS Studio running?")
+    return RuntimeError(
+        "Cannot connect to OBS WebSocket server. "
+        "Is OBS Studio running with WebSocket enabled on port 4455?"
+    )
 
 
 def _require(payload: Dict[str, Any], *keys: str) -> None:
@@ -85,88 +228,266 @@ def _require(payload: Dict[str, Any], *keys: str) -> None:
         raise RuntimeError(f"Missing parameter(s) for OBS action: {', '.join(missing)}")
 
 
+class SceneItemCache:
+    """(sceneName, sourceName) -> sceneItemId, filled one scene at a time.
+
+    - a miss loads the whole scene with one ``GetSceneItemList``; later lookups in
+      that scene are free
+    - scene item, scene and input events drop the affected scenes (websocket
+      transport); a reconnect or scene collection change drops everything
+    - entries expire after ``ttl`` seconds as a fallback for missed events and for
+      the HTTP transport, which has no events; ``ttl <= 0`` disables caching
+    """
+
+    # Events that change a single scene's items (keyed by eventData.sceneName)
+    _SCENE_EVENTS = {
+        "SceneItemCreated",
+        "SceneItemRemoved",
+        "SceneItemListReindexed",
+        "SceneRemoved",
+    }
+    # Events after which every scene may be affected
+    _GLOBAL_EVENTS = {
+        "SceneNameChanged",
+        "InputNameChanged",
+        "InputRemoved",
+        "CurrentSceneCollectionChanging",
+        "CurrentSceneCollectionChanged",
+    }
+
+    def __init__(self, ttl: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._scenes: Dict[str, Tuple[float, Dict[str, int]]] = {}
+        # Bumped by every invalidation so a list fetched before it is not stored after it
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, scene_name: str, source_name: str) -> Optional[int]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._scenes.get(scene_name)
+            if entry is not None and self._clock() - entry[0] < self.ttl:
+                item_id = entry[1].get(source_name)
+                if item_id is not None:
+                    self._hits += 1
+                    return item_id
+            self._misses += 1
+            return None
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def store(self, scene_name: str, scene_items: Any, generation: int) -> None:
+        """Cache a ``GetSceneItemList`` result fetched while at ``generation``."""
+        if self.ttl <= 0:
+            return
+        ids = {
+            item["sourceName"]: item["sceneItemId"]
+            for item in scene_items or []
+            if isinstance(item, dict) and "sourceName" in item and "sceneItemId" in item
+        }
+        with self._lock:
+            if generation == self._generation:
+                self._scenes[scene_name] = (self._clock(), ids)
+
+    def invalidate(self, scene_name: Optional[str] = None) -> None:
+        """Drop one scene, or every scene when ``scene_name`` is None."""
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+            if scene_name is None:
+                self._scenes.clear()
+            else:
+                self._scenes.pop(scene_name, None)
+
+    def on_event(self, event_type: Optional[str], event_data: Dict[str, Any]) -> None:
+        """OBS event listener (see ``OBSWebSocketClient.add_event_listener``)."""
+        if event_type in self._SCENE_EVENTS and event_data.get("sceneName"):
+            self.invalidate(event_data["sceneName"])
+        elif event_type is None or event_type in self._GLOBAL_EVENTS:
+            self.invalidate()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "scenes": len(self._scenes),
+                "hits": self._hits,
+                "misses": self._misses,
+                "invalidations": self._invalidations,
+                "ttl": self.ttl,
+            }
+
+
 class OBSSourceManager:
-    def __init__(self, obs_client: OBSClient):
+    def __init__(self, obs_client: OBSRequestClient, cache: Optional[SceneItemCache] = None):
         self.obs_client = obs_client
+        if cache is None:
+            cache = SceneItemCache(settings.obs_scene_item_cache_ttl)
+            add_listener = getattr(obs_client, "add_event_listener", None)
+            if add_listener is not None:
+                add_listener(cache.on_event)
+        self.cache = cache
 
     def _get_source(self, scene_name: str, source_name: str) -> Dict[str, Any]:
+        generation = self.cache.generation
         sources = self.list_sources(scene_name)
-        for item in sources.get("sceneItems", []):
+        self.cache.store(scene_name, sources.get("sceneItems"), generation)
+        items: List[Dict[str, Any]] = sources.get("sceneItems", [])
+        for item in items:
             if item.get("sourceName") == source_name:
                 return item
         raise RuntimeError(f"Source not found: {source_name}")
 
+    def _with_item_id(self, scene_name: str, source_name: str, send: Callable[[int], T]) -> T:
+        """Run ``send(sceneItemId)``, retrying once with a fresh id if a cached one went stale."""
+        cached = self.cache.get(scene_name, source_name)
+        item_id = (
+            cached
+            if cached is not None
+            else self._get_source(scene_name, source_name)["sceneItemId"]
+        )
+        try:
+            return send(item_id)
+        except RuntimeError as exc:
+            if cached is None or "not found" not in str(exc):
+                raise
+            self.cache.invalidate(scene_name)
+        return send(self._get_source(scene_name, source_name)["sceneItemId"])
+
+    def _call_item(
+        self, request_type: str, scene_name: str, source_name: str, data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        return self._with_item_id(
+            scene_name,
+            source_name,
+            lambda item_id: self.obs_client.call(
+                request_type, {"sceneName": scene_name, "sceneItemId": item_id, **data}
+            ),
+        )
+
+    def update_source(
+        self, scene_name: str, source_name: str, changes: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """Apply several scene item changes in one RequestBatch.
+
+        ``changes`` may hold ``visible``, ``locked``, ``newIndex`` and the transform
+        fields ``x``, ``y``, ``width``, ``height``, ``rotation`` (merged into a single
+        SetSceneItemTransform).
+        """
+        _require({"sceneName": scene_name, "sourceName": source_name}, "sceneName", "sourceName")
+        fields: List[Tuple[str, Dict[str, Any]]] = []
+        if changes.get("visible") is not None:
+            fields.append(("SetSceneItemEnabled", {"sceneItemEnabled": bool(changes["visible"])}))
+        if changes.get("locked") is not None:
+            fields.append(("SetSceneItemLocked", {"sceneItemLocked": bool(changes["locked"])}))
+        if changes.get("newIndex") is not None:
+            fields.append(("SetSceneItemIndex", {"sceneItemIndex": int(changes["newIndex"])}))
+        transform = {
+            key: float(changes[name])
+            for name, key in (
+                ("x", "positionX"),
+                ("y", "positionY"),
+                ("width", "width"),
+                ("height", "height"),
+                ("rotation", "rotation"),
+            )
+            if changes.get(name) is not None
+        }
+        if transform:
+            fields.append(("SetSceneItemTransform", {"sceneItemTransform": transform}))
+        if not fields:
+            raise RuntimeError("No source changes given")
+
+        def send(item_id: int) -> List[Dict[str, Any]]:
+            requests = [
+                {
+                    "requestType": request_type,
+                    "requestData": {"sceneName": scene_name, "sceneItemId": item_id, **data},
+                }
+                for request_type, data in fields
+            ]
+            return raise_for_batch(self.obs_client.call_batch(requests, halt_on_failure=True))
+
+        return self._with_item_id(scene_name, source_name, send)
+
     def list_sources(self, scene_name: str) -> Dict[str, Any]:
         _require({"sceneName": scene_name}, "sceneName")
         return self.obs_client.call("GetSceneItemList", {"sceneName": scene_name})
 
-    def set_source_visibility(self, scene_name: str, source_name: str, visible: bool) -> Dict[str, Any]:
-        source = self._get_source(scene_name, source_name)
-        return self.obs_client.call(
-            "SetSceneItemEnabled",
-            {"sceneName": scene_name, "sceneItemId": source["sceneItemId"], "sceneItemEnabled": bool(visible)},
+    def set_source_visibility(
+        self, scene_name: str, source_name: str, visible: bool
+    ) -> Dict[str, Any]:
+        return self._call_item(
+            "SetSceneItemEnabled", scene_name, source_name, {"sceneItemEnabled": bool(visible)}
         )
 
     def set_source_locked(self, scene_name: str, source_name: str, locked: bool) -> Dict[str, Any]:
-        source = self._get_source(scene_name, source_name)
-        return self.obs_client.call(
-            "SetSceneItemLocked",
-            {"sceneName": scene_name, "sceneItemId": source["sceneItemId"], "sceneItemLocked": bool(locked)},
+        return self._call_item(
+            "SetSceneItemLocked", scene_name, source_name, {"sceneItemLocked": bool(locked)}
         )
 
     def set_source_index(self, scene_name: str, source_name: str, new_index: int) -> Dict[str, Any]:
-        source = self._get_source(scene_name, source_name)
-        return self.obs_client.call(
-            "SetSceneItemIndex",
-            {"sceneName": scene_name, "sceneItemId": source["sceneItemId"], "sceneItemIndex": int(new_index)},
+        return self._call_item(
+            "SetSceneItemIndex", scene_name, source_name, {"sceneItemIndex": int(new_index)}
         )
 
-    def set_source_position(self, scene_name: str, source_name: str, x: float, y: float) -> Dict[str, Any]:
-        source = self._get_source(scene_name, source_name)
-        return self.obs_client.call(
+    def set_source_position(
+        self, scene_name: str, source_name: str, x: float, y: float
+    ) -> Dict[str, Any]:
+        return self._call_item(
             "SetSceneItemTransform",
-            {
-                "sceneName": scene_name,
-                "sceneItemId": source["sceneItemId"],
-                "sceneItemTransform": {"positionX": float(x), "positionY": float(y)},
-            },
+            scene_name,
+            source_name,
+            {"sceneItemTransform": {"positionX": float(x), "positionY": float(y)}},
         )
 
-    def set_source_size(self, scene_name: str, source_name: str, width: float, height: float) -> Dict[str, Any]:
-        source = self._get_source(scene_name, source_name)
-        return self.obs_client.call(
+    def set_source_size(
+        self, scene_name: str, source_name: str, width: float, height: float
+    ) -> Dict[str, Any]:
+        return self._call_item(
             "SetSceneItemTransform",
-            {
-                "sceneName": scene_name,
-                "sceneItemId": source["sceneItemId"],
-                "sceneItemTransform": {"width": float(width), "height": float(height)},
-            },
+            scene_name,
+            source_name,
+            {"sceneItemTransform": {"width": float(width), "height": float(height)}},
         )
 
-    def set_source_rotation(self, scene_name: str, source_name: str, rotation: float) -> Dict[str, Any]:
-        source = self._get_source(scene_name, source_name)
-        return self.obs_client.call(
+    def set_source_rotation(
+        self, scene_name: str, source_name: str, rotation: float
+    ) -> Dict[str, Any]:
+        return self._call_item(
             "SetSceneItemTransform",
-            {
-                "sceneName": scene_name,
-                "sceneItemId": source["sceneItemId"],
-                "sceneItemTransform": {"rotation": float(rotation)},
-            },
+            scene_name,
+            source_name,
+            {"sceneItemTransform": {"rotation": float(rotation)}},
         )
 
 
 class OBSFilterManager:
-    def __init__(self, obs_client: OBSClient):
+    def __init__(self, obs_client: OBSRequestClient):
         self.obs_client = obs_client
 
-    def list_filters(self, source_name: str, source_type: str = "OBS_SOURCE_TYPE_INPUT") -> Dict[str, Any]:
+    def list_filters(
+        self, source_name: str, source_type: str = "OBS_SOURCE_TYPE_INPUT"
+    ) -> Dict[str, Any]:
         _require({"sourceName": source_name}, "sourceName")
         return self.obs_client.call(
             "GetSourceFilterList",
             {"sourceName": source_name, "sourceType": source_type},
         )
 
-    def add_filter(self, source_name: str, filter_name: str, filter_type: str, filter_settings: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    def add_filter(
+        self,
+        source_name: str,
+        filter_name: str,
+        filter_type: str,
+        filter_settings: Dict[str, Any] | None = None,
+    ) -> Dict[str, Any]:
         _require(
             {"sourceName": source_name, "filterName": filter_name, "filterType": filter_type},
             "sourceName",
@@ -192,16 +513,26 @@ class OBSFilterManager:
 
     def get_filter_settings(self, source_name: str, filter_name: str) -> Dict[str, Any]:
         _require({"sourceName": source_name, "filterName": filter_name}, "sourceName", "filterName")
-        return self.obs_client.call("GetSourceFilter", {"sourceName": source_name, "filterName": filter_name})
+        return self.obs_client.call(
+            "GetSourceFilter", {"sourceName": source_name, "filterName": filter_name}
+        )
 
-    def set_filter_settings(self, source_name: str, filter_name: str, filter_settings: Dict[str, Any]) -> Dict[str, Any]:
+    def set_filter_settings(
+        self, source_name: str, filter_name: str, filter_settings: Dict[str, Any]
+    ) -> Dict[str, Any]:
         _require({"sourceName": source_name, "filterName": filter_name}, "sourceName", "filterName")
         return self.obs_client.call(
             "SetSourceFilterSettings",
-            {"sourceName": source_name, "filterName": filter_name, "filterSettings": filter_settings or {}},
+            {
+                "sourceName": source_name,
+                "filterName": filter_name,
+                "filterSettings": filter_settings or {},
+            },
         )
 
-    def set_filter_enabled(self, source_name: str, filter_name: str, enabled: bool) -> Dict[str, Any]:
+    def set_filter_enabled(
+        self, source_name: str, filter_name: str, enabled: bool
+    ) -> Dict[str, Any]:
         _require({"sourceName": source_name, "filterName": filter_name}, "sourceName", "filterName")
         return self.obs_client.call(
             "SetSourceFilterEnabled",
@@ -210,7 +541,7 @@ class OBSFilterManager:
 
 
 class OBSTransitionManager:
-    def __init__(self, obs_client: OBSClient):
+    def __init__(self, obs_client: OBSRequestClient):
         self.obs_client = obs_client
 
     def list_transitions(self) -> Dict[str, Any]:
@@ -219,21 +550,54 @@ class OBSTransitionManager:
     def get_current_transition(self) -> Dict[str, Any]:
         return self.obs_client.call("GetCurrentSceneTransition")
 
-    def set_transition(self, transition_name: str, transition_duration: int | None = None) -> Dict[str, Any]:
-        _require({"transitionName": transition_name}, "transitionName")
-        params: Dict[str, Any] = {"transitionName": transition_name}
+    @staticmethod
+    def _transition_requests(
+        transition_name: str, transition_duration: int | None
+    ) -> List[Dict[str, Any]]:
+        requests: List[Dict[str, Any]] = [
+            {
+                "requestType": "SetCurrentSceneTransition",
+                "requestData": {"transitionName": transition_name},
+            }
+        ]
         if transition_duration is not None:
-            params["transitionDuration"] = int(transition_duration)
-        return self.obs_client.call("SetCurrentSceneTransition", params)
-
-    def trigger_transition(self, transition_name: str | None = None, transition_duration: int | None = None) -> Dict[str, Any]:
-        if transition_name:
-            self.set_transition(transition_name, transition_duration)
-        return self.obs_client.call("TriggerStudioModeTransition")
+            requests.append(
+                {
+                    "requestType": "SetCurrentSceneTransitionDuration",
+                    "requestData": {"transitionDuration": int(transition_duration)},
+                }
+            )
+        return requests
+
+    def _send_serial(self, requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Send dependent requests as one halting serial batch; returns the last response data."""
+        if len(requests) == 1:
+            return self.obs_client.call(requests[0]["requestType"], requests[0]["requestData"])
+        results = raise_for_batch(self.obs_client.call_batch(requests, halt_on_failure=True))
+        response_data: Dict[str, Any] = results[-1]["responseData"]
+        return response_data
+
+    def set_transition(
+        self, transition_name: str, transition_duration: int | None = None
+    ) -> Dict[str, Any]:
+        _require({"transitionName": transition_name}, "transitionName")
+        return self._send_serial(self._transition_requests(transition_name, transition_duration))
+
+    def trigger_transition(
+        self, transition_name: str | None = None, transition_duration: int | None = None
+    ) -> Dict[str, Any]:
+        requests = (
+            self._transition_requests(transition_name, transition_duration)
+            if transition_name
+            else []
+        )
+        return self._send_serial(
+            requests + [{"requestType": "TriggerStudioModeTransition", "requestData": {}}]
+        )
 
 
 class OBSStudioModeManager:
-    def __init__(self, obs_client: OBSClient):
+    def __init__(self, obs_client: OBSRequestClient):
         self.obs_client = obs_client
 
     def set_studio_mode_enabled(self, enabled: bool) -> Dict[str, Any]:
@@ -243,7 +607,7 @@ class OBSStudioModeManager:
         return self.obs_client.call("GetStudioModeEnabled")
 
     def get_preview_scene(self) -> Dict[str, Any]:
-        return self.obs_client.call("GetPreviewScene")
+        return self.obs_client.call("GetCurrentPreviewScene")
 
     def set_preview_scene(self, scene_name: str) -> Dict[str, Any]:
         _require({"sceneName": scene_name}, "sceneName")
@@ -252,100 +616,246 @@ class OBSStudioModeManager:
     def get_program_scene(self) -> Dict[str, Any]:
         return self.obs_client.call("GetCurrentProgramScene")
 
-    def trigger_transition(self, transition_name: str | None = None, transition_duration: int | None = None) -> Dict[str, Any]:
-        transition_manager = OBSTransitionManager(self.obs_client)
-        if transition_name:
-            transition_manager.set_transition(transition_name, transition_duration)
-        return self.obs_client.call("TriggerStudioModeTransition")
+    def trigger_transition(
+        self, transition_name: str | None = None, transition_duration: int | None = None
+    ) -> Dict[str, Any]:
+        return OBSTransitionManager(self.obs_client).trigger_transition(
+            transition_name, transition_duration
+        )
 
 
 class OBSAdvancedManager:
-    def __init__(self, obs_client: OBSClient):
+    def __init__(self, obs_client: OBSRequestClient):
         self.obs_client = obs_client
         self.sources = OBSSourceManager(obs_client)
         self.filters = OBSFilterManager(obs_client)
         self.transitions = OBSTransitionManager(obs_client)
         self.studio_mode = OBSStudioModeManager(obs_client)
 
-    def handle_advanced_action(self, action: str, payload: Dict[str, Any]) -> Any:
-        payload = payload or {}
-
-        if action == "list_sources":
-            _require(payload, "sceneName")
-            return self.sources.list_sources(payload["sceneName"])
-        if action == "get_source_info":
-            _require(payload, "sceneName", "sourceName")
-            return self.sources._get_source(payload["sceneName"], payload["sourceName"])
-        if action == "set_source_visibility":
-            _require(payload, "sceneName", "sourceName", "visible")
-            return self.sources.set_source_visibility(payload["sceneName"], payload["sourceName"], payload["visible"])
-        if action == "set_source_locked":
-            _require(payload, "sceneName", "sourceName", "locked")
-            return self.sources.set_source_locked(payload["sceneName"], payload["sourceName"], payload["locked"])
-        if action == "set_source_index":
-            _require(payload, "sceneName", "sourceName", "newIndex")
-            return self.sources.set_source_index(payload["sceneName"], payload["sourceName"], payload["newIndex"])
-        if action == "set_source_position":
-            _require(payload, "sceneName", "sourceName", "x", "y")
-            return self.sources.set_source_position(payload["sceneName"], payload["sourceName"], payload["x"], payload["y"])
-        if action == "set_source_size":
-            _require(payload, "sceneName", "sourceName", "width", "height")
-            return self.sources.set_source_size(payload["sceneName"], payload["sourceName"], payload["width"], payload["height"])
-        if action == "set_source_rotation":
-            _require(payload, "sceneName", "sourceName", "rotation")
-            return self.sources.set_source_rotation(payload["sceneName"], payload["sourceName"], payload["rotation"])
-
-        if action == "list_filters":
-            _require(payload, "sourceName")
-            return self.filters.list_filters(payload["sourceName"], payload.get("sourceType", "OBS_SOURCE_TYPE_INPUT"))
-        if action == "add_filter":
-            _require(payload, "sourceName", "filterName", "filterType")
-            return self.filters.add_filter(
-                payload["sourceName"], payload["filterName"], payload["filterType"], payload.get("filterSettings", {}),
+
+OBS_TRANSPORTS = ("websocket", "http")
+DEFAULT_INSTANCE = "default"
+
+
+def create_client(
+    transport: str | None = None, url: str | None = None, password: str | None = None
+) -> OBSClient | OBSWebSocketClient:
+    """Build an OBS client; unset arguments come from the ``obs_*`` settings."""
+    transport = (transport or settings.obs_transport).strip().lower()
+    url = url or settings.obs_ws_url
+    password = settings.obs_ws_password if password is None else password
+    if transport == "websocket":
+        return OBSWebSocketClient(
+            url,
+            password,
+            settings.obs_request_timeout,
+            reconnect_base=settings.obs_reconnect_base,
+            reconnect_max=settings.obs_reconnect_max,
+            timeout_min=settings.obs_request_timeout_min,
+            breaker_threshold=settings.obs_breaker_threshold,
+            breaker_reset=settings.obs_breaker_reset,
+        )
+    if transport == "http":
+        return OBSClient(
+            url,
+            password,
+            settings.obs_request_timeout,
+            max_connections=settings.obs_max_connections,
+            max_keepalive_connections=settings.obs_max_keepalive_connections,
+            keepalive_expiry=settings.obs_keepalive_expiry,
+            timeout_min=settings.obs_request_timeout_min,
+            breaker_threshold=settings.obs_breaker_threshold,
+            breaker_reset=settings.obs_breaker_reset,
+        )
+    raise ValueError(f"Unknown OBS transport {transport!r}, expected one of {OBS_TRANSPORTS}")
+
+
+def instance_configs() -> Dict[str, Dict[str, Any]]:
+    """``{name: {"url", "password", "transport"}}`` for the default and each ``obs_instances``."""
+    configs: Dict[str, Dict[str, Any]] = {
+        DEFAULT_INSTANCE: {
+            "url": settings.obs_ws_url,
+            "password": settings.obs_ws_password,
+            "transport": settings.obs_transport,
+        }
+    }
+    for name, config in (settings.obs_instances or {}).items():
+        if not isinstance(config, dict) or not (config.get("url") or name in configs):
+            logger.warning(f"Ignoring OBS instance {name!r}: a url is required")
+            continue
+        base = configs.get(name, {"password": "", "transport": settings.obs_transport})
+        configs[name] = {
+            **base,
+            **{key: config[key] for key in ("url", "password", "transport") if key in config},
+        }
+    return configs
+
+
+class OBSInstance:
+    """One OBS connection with its own transport, breaker, caches, state, meters and thumbnails."""
+
+    def __init__(
+        self,
+        name: str,
+        client: OBSClient | OBSWebSocketClient,
+        state: Optional[OBSStateMirror] = None,
+    ):
+        self.name = name
+        self.client = client
+        self.manager = OBSAdvancedManager(client)
+        self.state = state or OBSStateMirror(client)
+        self.meters = AudioMeterHub(client, settings.obs_meter_max_rate)
+        self.thumbnails = ThumbnailService(
+            client,
+            width=settings.obs_thumbnail_width,
+            image_format=settings.obs_thumbnail_format,
+            quality=settings.obs_thumbnail_quality,
+            interval=settings.obs_thumbnail_interval,
+            max_bytes=settings.obs_thumbnail_cache_bytes,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.client.stats(),
+            "sceneItemCache": self.manager.sources.cache.stats(),
+            "state": self.state.stats(),
+            "meters": self.meters.stats(),
+            "thumbnails": self.thumbnails.stats(),
+        }
+
+
+class OBSPool:
+    """Named OBS instances, each created on first use.
+
+    - actions pick an instance with an optional ``obs`` field (default: ``default``)
+    - ``run_many`` runs one command on several instances at once, so a slow or
+      missing instance doesn't hold up the others
+    - state and thumbnail listeners receive ``(instanceName, changes)`` for every
+      instance, including ones created later
+    """
+
+    def __init__(
+        self, configs: Dict[str, Dict[str, Any]], factory: Callable[..., Any] = create_client
+    ):
+        self.configs = configs
+        self.factory = factory
+        self._instances: Dict[str, OBSInstance] = {}
+        self._lock = threading.Lock()
+        # (instance attribute, listener) pairs bound to every instance
+        self._listeners: List[Tuple[str, Callable[[str, Any], None]]] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def names(self) -> List[str]:
+        return list(self.configs)
+
+    def get(self, name: Optional[str] = None) -> OBSInstance:
+        name = name or DEFAULT_INSTANCE
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                config = self.configs.get(name)
+                if config is None:
+                    raise ValueError(f"Unknown OBS instance: {name}")
+                instance = OBSInstance(
+                    name,
+                    self.factory(
+                        config.get("transport"), config["url"], config.get("password", "")
+                    ),
+                )
+                for source, listener in self._listeners:
+                    self._bind(instance, source, listener)
+                self._instances[name] = instance
+            return instance
+
+    @staticmethod
+    def _bind(instance: OBSInstance, source: str, listener: Callable[[str, Any], None]) -> None:
+        getattr(instance, source).add_listener(lambda changed: listener(instance.name, changed))
+
+    def _add_listener(self, source: str, listener: Callable[[str, Any], None]) -> None:
+        with self._lock:
+            self._listeners.append((source, listener))
+            for instance in self._instances.values():
+                self._bind(instance, source, listener)
+
+    def add_state_listener(self, listener: Callable[[str, set], None]) -> None:
+        self._add_listener("state", listener)
+
+    def add_thumbnail_listener(self, listener: Callable[[str, List[Thumbnail]], None]) -> None:
+        self._add_listener("thumbnails", listener)
+
+    def start(self) -> None:
+        """Connect every configured instance in the background (fills the state mirrors)."""
+        for name in self.names():
+            self.get(name).state.start()
+
+    def run_many(self, names: Sequence[str], fn: Callable[[OBSInstance], T]) -> Dict[str, T]:
+        """``fn(instance)`` for each named instance, concurrently; unknown names raise
+        ValueError."""
+        instances = [self.get(name) for name in dict.fromkeys(names)]
+        if len(instances) == 1:
+            return {instances[0].name: fn(instances[0])}
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(2, len(self.configs)), thread_name_prefix="obs-pool"
+                )
+            executor = self._executor
+        futures = {instance.name: executor.submit(fn, instance) for instance in instances}
+        return {name: future.result() for name, future in futures.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            instances, executor = list(self._instances.values()), self._executor
+            self._executor = None
+        for instance in instances:
+            instance.thumbnails.close()
+            instance.client.close()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: (
+                self._instances[name].stats()
+                if name in self._instances
+                else {"connected": False, "created": False}
             )
-        if action == "remove_filter":
-            _require(payload, "sourceName", "filterName")
-            return self.filters.remove_filter(payload["sourceName"], payload["filterName"])
-        if action == "get_filter_settings":
-            _require(payload, "sourceName", "filterName")
-            return self.filters.get_filter_settings(payload["sourceName"], payload["filterName"])
-        if action == "set_filter_settings":
-            _require(payload, "sourceName", "filterName", "filterSettings")
-            return self.filters.set_filter_settings(payload["sourceName"], payload["filterName"], payload.get("filterSettings", {}))
-        if action == "set_filter_enabled":
-            _require(payload, "sourceName", "filterName", "enabled")
-            return self.filters.set_filter_enabled(payload["sourceName"], payload["filterName"], payload["enabled"])
-
-        if action == "list_transitions":
-            return self.transitions.list_transitions()
-        if action == "get_current_transition":
-            return self.transitions.get_current_transition()
-        if action == "set_transition":
-            _require(payload, "transitionName")
-            return self.transitions.set_transition(payload["transitionName"], payload.get("transitionDuration"))
-        if action == "trigger_transition":
-            return self.transitions.trigger_transition(payload.get("transitionName"), payload.get("transitionDuration"))
-
-        if action == "set_studio_mode":
-            _require(payload, "enabled")
-            return self.studio_mode.set_studio_mode_enabled(payload["enabled"])
-        if action == "get_studio_mode":
-            return self.studio_mode.get_studio_mode_enabled()
-        if action == "get_preview_scene":
-            return self.studio_mode.get_preview_scene()
-        if action == "set_preview_scene":
-            _require(payload, "sceneName")
-            return self.studio_mode.set_preview_scene(payload["sceneName"])
-        if action == "get_program_scene":
-            return self.studio_mode.get_program_scene()
-        if action == "trigger_studio_transition":
-            return self.studio_mode.trigger_transition(payload.get("transitionName"), payload.get("transitionDuration"))
-
-        raise RuntimeError(f"Unknown OBS action: {action}")
-
-
-_client = OBSClient(settings.obs_ws_url, settings.obs_ws_password, settings.obs_request_timeout)
-_advanced_manager = OBSAdvancedManager(_client)
+            for name in self.names()
+        }
+
+
+_pool = OBSPool(instance_configs())
+
+
+def get_pool() -> OBSPool:
+    return _pool
+
+
+def get_client(name: Optional[str] = None) -> OBSClient | OBSWebSocketClient:
+    return _pool.get(name).client
+
+
+def get_scene_item_cache(name: Optional[str] = None) -> SceneItemCache:
+    return _pool.get(name).manager.sources.cache
+
+
+def get_state_mirror(name: Optional[str] = None) -> OBSStateMirror:
+    return _pool.get(name).state
+
+
+def get_meter_hub(name: Optional[str] = None) -> AudioMeterHub:
+    return _pool.get(name).meters
+
+
+def get_thumbnails(name: Optional[str] = None) -> ThumbnailService:
+    return _pool.get(name).thumbnails
+
+
+def close_client() -> None:
+    _pool.close()
 
 
 def _parse_action_and_payload(action: str, payload: Dict[str, Any] | str | None):
@@ -357,78 +867,109 @@ def _parse_action_and_payload(action: str, payload: Dict[str, Any] | str | None)
     return parsed_action, params if isinstance(params, dict) else {}
 
 
+def _parse_target(payload: Dict[str, Any] | str | None) -> str | List[str] | None:
+    """The optional ``obs`` instance field of an action (top level or inside ``params``)."""
+    if not isinstance(payload, dict):
+        return None
+    target = payload.get("obs")
+    params = payload.get("params") or payload.get("payload")
+    if target is None and isinstance(params, dict):
+        target = params.get("obs")
+    if isinstance(target, (list, tuple)):
+        return [str(name) for name in target]
+    return str(target) if target else None
+
+
+def state_binding(
+    payload: Dict[str, Any] | str | None,
+) -> Optional[Tuple[str, str, Callable[[Any], Any]]]:
+    """Instance, mirror state key and value function for an ``obs`` control's payload.
+
+    None for controls that show no state (see ``control_state``) or target several instances.
+    """
+    target = _parse_target(payload)
+    if isinstance(target, list):
+        return None
+    parsed_action, params = _parse_action_and_payload("", payload)
+    binding = control_state(parsed_action, params)
+    if binding is None:
+        return None
+    return (target or DEFAULT_INSTANCE, *binding)
+
+
+def _fan_out(target: List[str], run: Callable[[OBSInstance], dict]) -> dict:
+    try:
+        results = _pool.run_many(target, run)
+    except ValueError as exc:
+        return {"status": "error", "error": str(exc)}
+    failed = [name for name, result in results.items() if result.get("status") != "ok"]
+    response: Dict[str, Any] = {"status": "error" if failed else "ok", "results": results}
+    if failed:
+        response["error"] = f"OBS action failed on {', '.join(failed)}"
+    return response
+
+
 def handle_obs(action: str, payload: Dict[str, Any] | None = None) -> dict:
+    """Run an OBS deck action on the instance named by its ``obs`` field (or on each of a list)."""
+    target = _parse_target(payload)
+    if isinstance(target, list):
+        return _fan_out(target, lambda instance: _run_obs_action(instance, action, payload))
+    try:
+        instance = _pool.get(target)
+    except ValueError as exc:
+        return {"status": "error", "error": str(exc)}
+    return _run_obs_action(instance, action, payload)
+
+
+def _run_obs_action(instance: OBSInstance, action: str, payload: Dict[str, Any] | None) -> dict:
     parsed_action, params = _parse_action_and_payload(action, payload)
     if not parsed_action:
         return {"status": "error", "error": "action required"}
+    try:
+        execute = OBS_ACTIONS.get(parsed_action.upper())
+        if execute is None:
+            raise RuntimeError(f"Unknown OBS action: {parsed_action.lower()}")
+        return execute(instance, parsed_action, params)
+    except Exception as exc:  # noqa: BLE001
+        logger.error("OBS action failed", action=parsed_action, obs=instance.name, error=str(exc))
+        return {"status": "error", "error": str(exc), "action": parsed_action}
 
-    action_upper = parsed_action.upper()
 
+def handle_obs_batch(payload: Dict[str, Any] | None = None) -> dict:
+    """Send a list of raw OBS requests in one round trip (the ``obs:batch`` action).
+
+    Payload: ``{"requests": [{"requestType", "requestData"?}, ...],
+    "executionType": "serial"|"serial_frame"|"parallel", "haltOnFailure": bool,
+    "obs"?: instance(s)}``.
+    """
+    payload = payload if isinstance(payload, dict) else {}
+    requests = payload.get("requests")
+    if not isinstance(requests, list) or not requests:
+        return {"status": "error", "error": "requests required"}
+    if len(requests) > MAX_BATCH_REQUESTS:
+        return {"status": "error", "error": f"at most {MAX_BATCH_REQUESTS} requests per batch"}
+    target = _parse_target(payload)
+    if isinstance(target, list):
+        return _fan_out(target, lambda instance: _run_obs_batch(instance, payload))
     try:
-        if action_upper in {"STARTSTREAMING", "START_STREAMING"}:
-            _client.call("StartStream")
-            return {"status": "ok", "action": "start_streaming"}
-
-        if action_upper in {"STOPSTREAMING", "STOP_STREAMING"}:
-            _client.call("StopStream")
-            return {"status": "ok", "action": "stop_streaming"}
-
-        if action_upper == "START_RECORDING":
-            _client.call("StartRecord")
-            return {"status": "ok", "action": "start_recording"}
-
-        if action_upper == "STOP_RECORDING":
-            _client.call("StopRecord")
-            return {"status": "ok", "action": "stop_recording"}
-
-        if action_upper == "TOGGLE_STREAMING":
-            stream_status = _client.call("GetStreamStatus")
-            if stream_status.get("outputActive"):
-                _client.call("StopStream")
-                return {"status": "ok", "action": "stop_streaming"}
-            _client.call("StartStream")
-            return {"status": "ok", "action": "start_streaming"}
-
-        if action_upper == "TOGGLE_RECORDING":
-            record_status = _client.call("GetRecordStatus")
-            if record_status.get("outputActive"):
-                _client.call("StopRecord")
-                return {"status": "ok", "action": "stop_recording"}
-            _client.call("StartRecord")
-            return {"status": "ok", "action": "start_recording"}
-
-        if action_upper in {"SET_SCENE", "CHANGE_SCENE"}:
-            scene_name = params.get("sceneName")
-            _require({"sceneName": scene_name}, "sceneName")
-            _client.call("SetCurrentProgramScene", {"sceneName": scene_name})
-            return {"status": "ok", "sceneName": scene_name}
-
-        if action_upper in {"SET_VOLUME", "OBS_VOLUME"}:
-            input_name = params.get("sourceName") or params.get("inputName")
-            volume_db = params.get("volumeDb")
-            if volume_db is None:
-                volume_db = params.get("volume")
-            _require({"inputName": input_name, "volumeDb": volume_db}, "inputName", "volumeDb")
-            _client.call("SetInputVolume", {"inputName": input_name, "inputVolumeDb": float(volume_db)})
-            return {"status": "ok", "inputName": input_name, "volumeDb": float(volume_db)}
-
-        if action_upper == "MUTE":
-            input_name = params.get("sourceName") or params.get("inputName")
-            _require({"inputName": input_name}, "inputName")
-            _client.call("ToggleInputMute", {"inputName": input_name})
-            return {"status": "ok", "muted": True, "inputName": input_name}
-
-        if action_upper == "UNMUTE":
-            input_name = params.get("sourceName") or params.get("inputName")
-            _require({"inputName": input_name}, "inputName")
-            _client.call("SetInputMute", {"inputName": input_name, "inputMuted": False})
-            return {"status": "ok", "muted": False, "inputName": input_name}
-
-        # Advanced actions fallback (lowercase)
-        result = _advanced_manager.handle_advanced_action(parsed_action.lower(), params)
-        if result is None:
-            return {"status": "ok", "action": parsed_action.lower()}
-        return {"status": "ok", "action": parsed_action.lower(), "result": result}
+        instance = _pool.get(target)
+    except ValueError as exc:
+        return {"status": "error", "error": str(exc)}
+    return _run_obs_batch(instance, payload)
+
+
+def _run_obs_batch(instance: OBSInstance, payload: Dict[str, Any]) -> dict:
+    try:
+        results = instance.client.call_batch(
+            payload["requests"],
+            execution_type=str(payload.get("executionType") or "serial").lower(),
+            halt_on_failure=bool(payload.get("haltOnFailure", False)),
+        )
     except Exception as exc:  # noqa: BLE001
-        logger.error("OBS action failed", action=parsed_action, error=str(exc))
-        return {"status": "error", "error": str(exc), "action": parsed_action}
+        logger.error("OBS batch failed", obs=instance.name, error=str(exc))
+        return {"status": "error", "error": str(exc)}
+    try:
+        raise_for_batch(results)
+    except RuntimeError as exc:
+        return {"status": "error", "error": str(exc), "results": results}
+    return {"status": "ok", "results": results}
@@ -0,0 +1,336 @@
+"""Declarative table of the OBS deck actions, compiled once into a dispatch dict.
+
+Each ``OBSAction`` row names the action (with aliases), its parameters and either
+the OBS request it sends or a ``run`` function for actions that need more than one
+request. ``compile_actions`` turns the table into ``{ACTION_NAME: executor}``; an
+executor validates the payload with a parser generated from the row's ``Param``s,
+so dispatch costs one dict lookup however many actions there are.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# Result shapes
+RESULT_DATA = "data"  # {"action": name, "result": responseData} (no "result" when None)
+RESULT_ECHO = "echo"  # the validated params plus OBSAction.extra
+RESULT_ACTION = "action"  # {"action": label}; run() returns the label when it decides
+
+# executor(instance, actionName, payload) -> response dict; instance has client, state, manager
+ActionExecutor = Callable[[Any, str, Dict[str, Any]], Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class Param:
+    """One action parameter.
+
+    ``keys`` are the payload keys tried in order (default: ``name``); ``field`` is the
+    request field it fills (default: ``name``). Optional parameters that end up None
+    are left out of the request.
+    """
+
+    name: str
+    keys: Tuple[str, ...] = ()
+    field: Optional[str] = None
+    convert: Optional[Callable[[Any], Any]] = None
+    required: bool = True
+    default: Any = None
+
+
+def optional(name: str, default: Any = None, **kwargs: Any) -> Param:
+    return Param(name, required=False, default=default, **kwargs)
+
+
+@dataclass(frozen=True)
+class OBSAction:
+    """One row of the action table (see the module docstring).
+
+    ``data`` holds constant request fields; ``label`` and ``extra`` feed the result shapes.
+    """
+
+    names: Tuple[str, ...]
+    params: Tuple[Param, ...] = ()
+    request: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    run: Optional[Callable[[Any, Dict[str, Any]], Any]] = None
+    result: str = RESULT_DATA
+    label: Optional[str] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+def _compile_parser(params: Tuple[Param, ...]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    readers = tuple((p.name, p.keys or (p.name,), p.convert, p.required, p.default) for p in params)
+
+    def parse(payload: Dict[str, Any]) -> Dict[str, Any]:
+        args: Dict[str, Any] = {}
+        missing = []
+        for name, keys, convert, required, default in readers:
+            value = None
+            for key in keys:
+                value = payload.get(key)
+                if value is not None:
+                    break
+            if value is None:
+                if required:
+                    missing.append(name)
+                args[name] = default
+                continue
+            if convert is not None:
+                try:
+                    value = convert(value)
+                except (TypeError, ValueError):
+                    raise RuntimeError(f"Invalid parameter for OBS action: {name}") from None
+            args[name] = value
+        if missing:
+            raise RuntimeError(f"Missing parameter(s) for OBS action: {', '.join(missing)}")
+        return args
+
+    return parse
+
+
+def _compile(spec: OBSAction) -> ActionExecutor:
+    parse = _compile_parser(spec.params)
+    fields = tuple((p.name, p.field or p.name) for p in spec.params)
+    request, constants, run = spec.request, spec.data, spec.run
+    result, label, extra = spec.result, spec.label, spec.extra
+    if (request is None) == (run is None):
+        raise ValueError(f"OBS action {spec.names[0]} needs exactly one of request and run")
+
+    def execute(instance: Any, action: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        args = parse(payload)
+        if run is not None:
+            value = run(instance, args)
+        else:
+            data = {
+                **constants,
+                **{key: args[name] for name, key in fields if args[name] is not None},
+            }
+            value = instance.client.call(request, data)
+        if result == RESULT_ACTION:
+            return {"status": "ok", "action": value if run is not None else label}
+        if result == RESULT_ECHO:
+            return {"status": "ok", **extra, **args}
+        response = {"status": "ok", "action": action.lower()}
+        if value is not None:
+            response["result"] = value
+        return response
+
+    return execute
+
+
+def compile_actions(table: Iterable[OBSAction]) -> Dict[str, ActionExecutor]:
+    """``{NAME: executor}`` for every name and alias (upper case); duplicates are an error."""
+    actions: Dict[str, ActionExecutor] = {}
+    for spec in table:
+        executor = _compile(spec)
+        for name in spec.names:
+            key = name.upper()
+            if key in actions:
+                raise ValueError(f"Duplicate OBS action name: {name}")
+            actions[key] = executor
+    return actions
+
+
+def _toggle(
+    output: str, status: str, start: str, stop: str
+) -> Callable[[Any, Dict[str, Any]], str]:
+    """Start or stop an output depending on the mirrored (or fetched) state; returns the label."""
+
+    def run(instance: Any, args: Dict[str, Any]) -> str:
+        active = instance.state.get(output)
+        if active is None:
+            active = instance.client.call(status).get("outputActive")
+        request, action = (stop, f"stop_{output}") if active else (start, f"start_{output}")
+        instance.client.call(request)
+        return action
+
+    return run
+
+
+_SCENE = Param("sceneName")
+_SOURCE = Param("sourceName")
+_INPUT = Param("inputName", keys=("sourceName", "inputName"))
+_FILTER = Param("filterName")
+_TRANSITION = (optional("transitionName"), optional("transitionDuration"))
+
+OBS_ACTION_TABLE: Tuple[OBSAction, ...] = (
+    # Outputs
+    OBSAction(
+        ("START_STREAMING", "STARTSTREAMING"),
+        request="StartStream",
+        result=RESULT_ACTION,
+        label="start_streaming",
+    ),
+    OBSAction(
+        ("STOP_STREAMING", "STOPSTREAMING"),
+        request="StopStream",
+        result=RESULT_ACTION,
+        label="stop_streaming",
+    ),
+    OBSAction(
+        ("START_RECORDING",), request="StartRecord", result=RESULT_ACTION, label="start_recording"
+    ),
+    OBSAction(
+        ("STOP_RECORDING",), request="StopRecord", result=RESULT_ACTION, label="stop_recording"
+    ),
+    OBSAction(
+        ("TOGGLE_STREAMING",),
+        run=_toggle("streaming", "GetStreamStatus", "StartStream", "StopStream"),
+        result=RESULT_ACTION,
+    ),
+    OBSAction(
+        ("TOGGLE_RECORDING",),
+        run=_toggle("recording", "GetRecordStatus", "StartRecord", "StopRecord"),
+        result=RESULT_ACTION,
+    ),
+    # Scenes and inputs
+    OBSAction(
+        ("SET_SCENE", "CHANGE_SCENE"),
+        (_SCENE,),
+        request="SetCurrentProgramScene",
+        result=RESULT_ECHO,
+    ),
+    OBSAction(
+        ("SET_VOLUME", "OBS_VOLUME"),
+        (
+            _INPUT,
+            Param("volumeDb", keys=("volumeDb", "volume"), field="inputVolumeDb", convert=float),
+        ),
+        request="SetInputVolume",
+        result=RESULT_ECHO,
+    ),
+    OBSAction(
+        ("MUTE",), (_INPUT,), request="ToggleInputMute", result=RESULT_ECHO, extra={"muted": True}
+    ),
+    OBSAction(
+        ("UNMUTE",),
+        (_INPUT,),
+        request="SetInputMute",
+        data={"inputMuted": False},
+        result=RESULT_ECHO,
+        extra={"muted": False},
+    ),
+    # Scene items (resolved to sceneItemIds by the source manager)
+    OBSAction(("list_sources",), (_SCENE,), request="GetSceneItemList"),
+    OBSAction(
+        ("get_source_info",),
+        (_SCENE, _SOURCE),
+        run=lambda i, a: i.manager.sources._get_source(a["sceneName"], a["sourceName"]),
+    ),
+    OBSAction(
+        ("set_source_visibility",),
+        (_SCENE, _SOURCE, Param("visible")),
+        run=lambda i, a: i.manager.sources.set_source_visibility(
+            a["sceneName"], a["sourceName"], a["visible"]
+        ),
+    ),
+    OBSAction(
+        ("set_source_locked",),
+        (_SCENE, _SOURCE, Param("locked")),
+        run=lambda i, a: i.manager.sources.set_source_locked(
+            a["sceneName"], a["sourceName"], a["locked"]
+        ),
+    ),
+    OBSAction(
+        ("set_source_index",),
+        (_SCENE, _SOURCE, Param("newIndex")),
+        run=lambda i, a: i.manager.sources.set_source_index(
+            a["sceneName"], a["sourceName"], a["newIndex"]
+        ),
+    ),
+    OBSAction(
+        ("set_source_position",),
+        (_SCENE, _SOURCE, Param("x"), Param("y")),
+        run=lambda i, a: i.manager.sources.set_source_position(
+            a["sceneName"], a["sourceName"], a["x"], a["y"]
+        ),
+    ),
+    OBSAction(
+        ("set_source_size",),
+        (_SCENE, _SOURCE, Param("width"), Param("height")),
+        run=lambda i, a: i.manager.sources.set_source_size(
+            a["sceneName"], a["sourceName"], a["width"], a["height"]
+        ),
+    ),
+    OBSAction(
+        ("set_source_rotation",),
+        (_SCENE, _SOURCE, Param("rotation")),
+        run=lambda i, a: i.manager.sources.set_source_rotation(
+            a["sceneName"], a["sourceName"], a["rotation"]
+        ),
+    ),
+    OBSAction(
+        ("update_source",),
+        (
+            _SCENE,
+            _SOURCE,
+            *(
+                optional(name)
+                for name in (
+                    "visible",
+                    "locked",
+                    "newIndex",
+                    "x",
+                    "y",
+                    "width",
+                    "height",
+                    "rotation",
+                )
+            ),
+        ),
+        run=lambda i, a: i.manager.sources.update_source(a["sceneName"], a["sourceName"], a),
+    ),
+    # Filters
+    OBSAction(
+        ("list_filters",),
+        (_SOURCE, optional("sourceType", "OBS_SOURCE_TYPE_INPUT")),
+        request="GetSourceFilterList",
+    ),
+    OBSAction(
+        ("add_filter",),
+        (_SOURCE, _FILTER, Param("filterType"), optional("filterSettings", {})),
+        request="CreateSourceFilter",
+    ),
+    OBSAction(("remove_filter",), (_SOURCE, _FILTER), request="RemoveSourceFilter"),
+    OBSAction(("get_filter_settings",), (_SOURCE, _FILTER), request="GetSourceFilter"),
+    OBSAction(
+        ("set_filter_settings",),
+        (_SOURCE, _FILTER, Param("filterSettings")),
+        request="SetSourceFilterSettings",
+    ),
+    OBSAction(
+        ("set_filter_enabled",),
+        (_SOURCE, _FILTER, Param("enabled", field="filterEnabled", convert=bool)),
+        request="SetSourceFilterEnabled",
+    ),
+    # Transitions
+    OBSAction(("list_transitions",), request="GetTransitionList"),
+    OBSAction(("get_current_transition",), request="GetCurrentSceneTransition"),
+    OBSAction(
+        ("set_transition",),
+        (Param("transitionName"), optional("transitionDuration")),
+        run=lambda i, a: i.manager.transitions.set_transition(
+            a["transitionName"], a["transitionDuration"]
+        ),
+    ),
+    OBSAction(
+        ("trigger_transition", "trigger_studio_transition"),
+        _TRANSITION,
+        run=lambda i, a: i.manager.transitions.trigger_transition(
+            a["transitionName"], a["transitionDuration"]
+        ),
+    ),
+    # Studio mode
+    OBSAction(
+        ("set_studio_mode",),
+        (Param("enabled", field="studioModeEnabled", convert=bool),),
+        request="SetStudioModeEnabled",
+    ),
+    OBSAction(("get_studio_mode",), request="GetStudioModeEnabled"),
+    OBSAction(("get_preview_scene",), request="GetCurrentPreviewScene"),
+    OBSAction(("set_preview_scene",), (_SCENE,), request="SetCurrentPreviewScene"),
+    OBSAction(("get_program_scene",), request="GetCurrentProgramScene"),
+)
+
+OBS_ACTIONS: Dict[str, ActionExecutor] = compile_actions(OBS_ACTION_TABLE)
@@ -0,0 +1,188 @@
+"""Decimated OBS audio meters for deck VU meters."""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.actions.obs_ws import EVENT_SUBSCRIPTION_INPUT_VOLUME_METERS
+from app.constants import MESSAGE_TYPE_OBS_METERS
+
+# Quantized levels map METER_FLOOR_DB..0 dBFS onto 0..255
+METER_FLOOR_DB = -60.0
+
+
+def quantize(level_mul: float) -> int:
+    """A linear level (1.0 = 0 dBFS) as one byte on a dB scale."""
+    if level_mul <= 0:
+        return 0
+    db = 20 * math.log10(level_mul)
+    return max(0, min(255, round((db - METER_FLOOR_DB) * 255 / -METER_FLOOR_DB)))
+
+
+def reduce_levels(inputs: List[Dict[str, Any]]) -> List[Tuple[str, float, float]]:
+    """``(inputName, peak, meanSquare)`` per input of an InputVolumeMeters event, over all channels.
+
+    ``inputLevelsMul`` holds ``[magnitude, peak, inputPeak]`` per channel.
+    """
+    reduced = []
+    for item in inputs:
+        channels = item.get("inputLevelsMul") or []
+        name = item.get("inputName")
+        if not name or not channels:
+            continue
+        peak = max(channel[1] for channel in channels)
+        mean_square = math.fsum(channel[0] * channel[0] for channel in channels) / len(channels)
+        reduced.append((name, peak, mean_square))
+    return reduced
+
+
+class _Window:
+    """Peak and mean-square accumulators of one publishing rate since its last frame."""
+
+    __slots__ = ("peak", "sum_squares", "samples", "due")
+
+    def __init__(self, due: float):
+        self.peak: Dict[str, float] = {}
+        self.sum_squares: Dict[str, float] = {}
+        self.samples: Dict[str, int] = {}
+        self.due = due
+
+    def fold(self, levels: List[Tuple[str, float, float]]) -> None:
+        for name, peak, mean_square in levels:
+            if peak > self.peak.get(name, 0.0):
+                self.peak[name] = peak
+            self.sum_squares[name] = self.sum_squares.get(name, 0.0) + mean_square
+            self.samples[name] = self.samples.get(name, 0) + 1
+
+    def frame(self) -> Optional[Dict[str, Any]]:
+        if not self.samples:
+            return None
+        names = sorted(self.samples)
+        return {
+            "type": MESSAGE_TYPE_OBS_METERS,
+            "inputs": names,
+            "peak": [quantize(self.peak.get(name, 0.0)) for name in names],
+            "rms": [
+                quantize(math.sqrt(self.sum_squares[name] / self.samples[name])) for name in names
+            ],
+        }
+
+
+class AudioMeterHub:
+    """One InputVolumeMeters subscription shared by every deck that shows meters.
+
+    - OBS is only asked for meter events while at least one subscriber exists
+    - each event is reduced once (peak and RMS over channels), then folded into one
+      window per distinct subscriber rate; ``frames`` turns due windows into
+      quantized frames (one byte per level), so the work per event and per frame
+      doesn't grow with the number of decks
+    """
+
+    def __init__(self, client: Any, max_rate: int = 30, clock=time.monotonic):
+        self.client = client
+        self.max_rate = max(1, max_rate)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._subscribers: Dict[Any, int] = {}
+        self._windows: Dict[int, _Window] = {}
+        self._events = 0
+        self._frames = 0
+        self.enabled = hasattr(client, "add_event_listener") and hasattr(
+            client, "set_event_subscriptions"
+        )
+        if self.enabled:
+            client.add_event_listener(self.on_event)
+
+    def subscribe(self, subscriber: Any, rate: int) -> int:
+        """Add or update a subscriber; returns the rate it will get (1..max_rate frames/s)."""
+        if not self.enabled:
+            raise RuntimeError("OBS audio meters need the websocket transport")
+        if isinstance(rate, float) and not math.isfinite(rate):
+            raise ValueError(f"Invalid meter rate: {rate}")
+        rate = max(1, min(self.max_rate, int(rate)))
+        with self._lock:
+            first = not self._subscribers
+            self._subscribers[subscriber] = rate
+            self._drop_unused_windows()
+            self._windows.setdefault(rate, _Window(self._clock() + 1 / rate))
+        if first:
+            self.client.set_event_subscriptions(
+                self.client.event_subscriptions | EVENT_SUBSCRIPTION_INPUT_VOLUME_METERS
+            )
+            self.client.connect()
+        return rate
+
+    def unsubscribe(self, subscriber: Any) -> None:
+        with self._lock:
+            if self._subscribers.pop(subscriber, None) is None:
+                return
+            self._drop_unused_windows()
+            last = not self._subscribers
+        if last:
+            self.client.set_event_subscriptions(
+                self.client.event_subscriptions & ~EVENT_SUBSCRIPTION_INPUT_VOLUME_METERS
+            )
+
+    def _drop_unused_windows(self) -> None:
+        rates = set(self._subscribers.values())
+        for rate in [rate for rate in self._windows if rate not in rates]:
+            del self._windows[rate]
+
+    def subscribers(self, rate: Optional[int] = None) -> List[Any]:
+        with self._lock:
+            return [
+                subscriber
+                for subscriber, r in self._subscribers.items()
+                if rate is None or r == rate
+            ]
+
+    def on_event(self, event_type: Optional[str], data: Dict[str, Any]) -> None:
+        """OBS event listener; ignores everything but InputVolumeMeters."""
+        if event_type != "InputVolumeMeters" or not self._windows:
+            return
+        self._events += 1
+        try:
+            levels = reduce_levels(data.get("inputs") or [])
+        except (TypeError, IndexError, ValueError) as exc:
+            logger.debug(f"Ignoring malformed InputVolumeMeters event: {exc}")
+            return
+        with self._lock:
+            for window in self._windows.values():
+                window.fold(levels)
+
+    def frames(self, now: Optional[float] = None) -> Dict[int, Dict[str, Any]]:
+        """Frames of the rates that are due, by rate (rates without new levels are skipped)."""
+        now = self._clock() if now is None else now
+        frames = {}
+        with self._lock:
+            for rate, window in list(self._windows.items()):
+                if window.due > now:
+                    continue
+                frame = window.frame()
+                # Keep the cadence unless we fell behind by more than a period
+                self._windows[rate] = _Window(max(window.due + 1 / rate, now))
+                if frame is not None:
+                    frames[rate] = frame
+        self._frames += len(frames)
+        return frames
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            return min((window.due for window in self._windows.values()), default=None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rates = sorted(set(self._subscribers.values()))
+            subscribers = len(self._subscribers)
+        return {
+            "enabled": self.enabled,
+            "subscribers": subscribers,
+            "rates": rates,
+            "events": self._events,
+            "frames": self._frames,
+        }
@@ -0,0 +1,261 @@
+"""Server-side mirror of OBS state, kept current from obs-websocket events."""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+# Listener signature: the set of state keys that changed (see OBSStateMirror.snapshot)
+StateListener = Callable[[set], None]
+
+# outputState values that mean the output is (about to be) running
+_ACTIVE_OUTPUT_STATES = {
+    "OBS_WEBSOCKET_OUTPUT_STARTING",
+    "OBS_WEBSOCKET_OUTPUT_STARTED",
+    "OBS_WEBSOCKET_OUTPUT_RESUMED",
+    "OBS_WEBSOCKET_OUTPUT_PAUSED",
+}
+
+
+def input_key(input_name: str, field: str) -> str:
+    """State key of an input field (``muted`` or ``volumeDb``)."""
+    return f"input:{input_name}:{field}"
+
+
+class OBSStateMirror:
+    """Program/preview scene, stream/record status, studio mode and input mute/volume.
+
+    - filled by one batch of Get* requests when the OBS connection is (re)established,
+      then updated from OBS events only, so reading it costs no request
+    - ``get`` returns None while the mirror can't be trusted (HTTP transport without
+      events, disconnected, or not synced yet); callers then ask OBS directly
+    - listeners are told which keys changed; they run on the OBS transport thread
+    """
+
+    def __init__(self, client: Any):
+        self.client = client
+        self._state: Dict[str, Any] = {}
+        self._synced = False
+        self._lock = threading.Lock()
+        self._listeners: List[StateListener] = []
+        self._events = 0
+        self._resyncs = 0
+        add_listener = getattr(client, "add_event_listener", None)
+        self.enabled = add_listener is not None
+        if add_listener is not None:
+            add_listener(self.on_event)
+
+    def start(self) -> None:
+        """Open the OBS connection in the background so the mirror fills without a button press."""
+        connect = getattr(self.client, "connect", None)
+        if self.enabled and connect is not None:
+            connect()
+
+    @property
+    def live(self) -> bool:
+        return self._synced and bool(getattr(self.client, "connected", False))
+
+    def get(self, key: str) -> Any:
+        if not self.live:
+            return None
+        with self._lock:
+            return self._state.get(key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._state)
+
+    def add_listener(self, listener: StateListener) -> None:
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: StateListener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _update(self, changes: Iterable[Tuple[str, Any]]) -> None:
+        changed = set()
+        with self._lock:
+            for key, value in changes:
+                if self._state.get(key, object()) != value:
+                    self._state[key] = value
+                    changed.add(key)
+        if changed:
+            for listener in list(self._listeners):
+                try:
+                    listener(changed)
+                except Exception:
+                    logger.exception("OBS state listener failed")
+
+    def _drop_input(self, input_name: str) -> None:
+        with self._lock:
+            for field in ("muted", "volumeDb"):
+                self._state.pop(input_key(input_name, field), None)
+
+    @staticmethod
+    def _output_active(data: Dict[str, Any]) -> bool:
+        state = data.get("outputState")
+        if state:
+            return state in _ACTIVE_OUTPUT_STATES
+        return bool(data.get("outputActive"))
+
+    def on_event(self, event_type: Optional[str], data: Dict[str, Any]) -> None:
+        """OBS event listener (see ``OBSWebSocketClient.add_event_listener``)."""
+        self._events += 1
+        if event_type is None:
+            # (Re)connected: events may have been missed. Resync off the transport
+            # thread, which must not wait on its own requests.
+            self._synced = False
+            threading.Thread(target=self.resync, name="obs-state-resync", daemon=True).start()
+        elif event_type == "CurrentProgramSceneChanged":
+            self._update([("programScene", data.get("sceneName"))])
+        elif event_type == "CurrentPreviewSceneChanged":
+            self._update([("previewScene", data.get("sceneName"))])
+        elif event_type == "StudioModeStateChanged":
+            enabled = bool(data.get("studioModeEnabled"))
+            self._update([("studioMode", enabled)] + ([] if enabled else [("previewScene", None)]))
+        elif event_type == "StreamStateChanged":
+            self._update([("streaming", self._output_active(data))])
+        elif event_type == "RecordStateChanged":
+            self._update([("recording", self._output_active(data))])
+        elif event_type == "InputMuteStateChanged":
+            self._update(
+                [(input_key(data.get("inputName", ""), "muted"), bool(data.get("inputMuted")))]
+            )
+        elif event_type == "InputVolumeChanged":
+            self._update(
+                [(input_key(data.get("inputName", ""), "volumeDb"), data.get("inputVolumeDb"))]
+            )
+        elif event_type == "InputNameChanged":
+            old, new = data.get("oldInputName", ""), data.get("inputName", "")
+            snapshot = self.snapshot()
+            self._drop_input(old)
+            self._update(
+                (input_key(new, field), snapshot[input_key(old, field)])
+                for field in ("muted", "volumeDb")
+                if input_key(old, field) in snapshot
+            )
+        elif event_type == "InputRemoved":
+            self._drop_input(data.get("inputName", ""))
+
+    def resync(self) -> None:
+        """Reload the whole state from OBS (two batches)."""
+        self._resyncs += 1
+        try:
+            general = self.client.call_batch(
+                [
+                    {"requestType": "GetCurrentProgramScene"},
+                    {"requestType": "GetStudioModeEnabled"},
+                    {"requestType": "GetCurrentPreviewScene"},
+                    {"requestType": "GetStreamStatus"},
+                    {"requestType": "GetRecordStatus"},
+                    {"requestType": "GetInputList"},
+                ],
+                execution_type="parallel",
+            )
+            results = {result["requestType"]: result for result in general}
+
+            def data(request_type: str) -> Dict[str, Any]:
+                result = results.get(request_type)
+                return result["responseData"] if result and result["ok"] else {}
+
+            studio_mode = bool(data("GetStudioModeEnabled").get("studioModeEnabled"))
+            changes: List[Tuple[str, Any]] = [
+                ("programScene", data("GetCurrentProgramScene").get("currentProgramSceneName")),
+                ("studioMode", studio_mode),
+                (
+                    "previewScene",
+                    (
+                        data("GetCurrentPreviewScene").get("currentPreviewSceneName")
+                        if studio_mode
+                        else None
+                    ),
+                ),
+                ("streaming", bool(data("GetStreamStatus").get("outputActive"))),
+                ("recording", bool(data("GetRecordStatus").get("outputActive"))),
+            ]
+
+            names = [
+                item.get("inputName")
+                for item in data("GetInputList").get("inputs") or []
+                if item.get("inputName")
+            ]
+            if names:
+                requests = []
+                for name in names:
+                    requests.append(
+                        {"requestType": "GetInputMute", "requestData": {"inputName": name}}
+                    )
+                    requests.append(
+                        {"requestType": "GetInputVolume", "requestData": {"inputName": name}}
+                    )
+                inputs = self.client.call_batch(requests, execution_type="parallel")
+                # call_batch returns results in request order
+                for name, (mute, volume) in zip(names, zip(inputs[0::2], inputs[1::2])):
+                    if mute["ok"]:
+                        changes.append(
+                            (input_key(name, "muted"), bool(mute["responseData"].get("inputMuted")))
+                        )
+                    if volume["ok"]:
+                        changes.append(
+                            (
+                                input_key(name, "volumeDb"),
+                                volume["responseData"].get("inputVolumeDb"),
+                            )
+                        )
+
+            with self._lock:
+                self._state = {
+                    key: value for key, value in self._state.items() if not key.startswith("input:")
+                }
+            self._update(changes)
+            self._synced = True
+        except Exception as exc:  # noqa: BLE001
+            logger.warning(f"OBS state resync failed: {exc}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            inputs = sum(1 for key in self._state if key.startswith("input:"))
+        return {
+            "enabled": self.enabled,
+            "live": self.live,
+            "events": self._events,
+            "resyncs": self._resyncs,
+            "inputFields": inputs,
+        }
+
+
+def control_state(
+    action: str, params: Dict[str, Any]
+) -> Optional[Tuple[str, Callable[[Any], Any]]]:
+    """State key a deck control reflects and how to turn its value into ``control:state.value``.
+
+    ``action``/``params`` are an ``obs`` control's parsed action; None if it shows no state.
+    """
+    action_upper = (action or "").upper()
+    if action_upper in {
+        "STARTSTREAMING",
+        "START_STREAMING",
+        "STOPSTREAMING",
+        "STOP_STREAMING",
+        "TOGGLE_STREAMING",
+    }:
+        return "streaming", lambda value: 1 if value else 0
+    if action_upper in {"START_RECORDING", "STOP_RECORDING", "TOGGLE_RECORDING"}:
+        return "recording", lambda value: 1 if value else 0
+    if action_upper in {"SET_SCENE", "CHANGE_SCENE"} and params.get("sceneName"):
+        scene_name = params["sceneName"]
+        return "programScene", lambda value: 1 if value == scene_name else 0
+    if action_upper in {"MUTE", "UNMUTE"}:
+        input_name = params.get("sourceName") or params.get("inputName")
+        if input_name:
+            return input_key(input_name, "muted"), lambda value: 1 if value else 0
+    if action_upper in {"SET_VOLUME", "OBS_VOLUME"}:
+        input_name = params.get("sourceName") or params.get("inputName")
+        if input_name:
+            return input_key(input_name, "volumeDb"), lambda value: value
+    if action_upper == "SET_STUDIO_MODE":
+        return "studioMode", lambda value: 1 if value else 0
+    return None
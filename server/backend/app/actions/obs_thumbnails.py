@@ -0,0 +1,261 @@
+"""Scene thumbnails for deck buttons, refreshed in the background and cached by content."""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from loguru import logger
+
+# Listener signature: the thumbnails whose image changed since the last refresh
+ThumbnailListener = Callable[[List["Thumbnail"]], None]
+
+
+class Thumbnail:
+    __slots__ = ("scene", "data", "media_type", "etag", "updated_at")
+
+    def __init__(self, scene: str, data: bytes, media_type: str):
+        self.scene = scene
+        self.data = data
+        self.media_type = media_type
+        # Identical frames encode to identical bytes, so the hash doubles as ETag and dedupe key
+        self.etag = hashlib.blake2b(data, digest_size=12).hexdigest()
+        self.updated_at = time.time()
+
+
+class ThumbnailCache:
+    """LRU of thumbnails by scene, bounded by the total image size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, Thumbnail] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.unchanged = 0
+
+    def get(self, scene: str) -> Optional[Thumbnail]:
+        with self._lock:
+            thumbnail = self._entries.get(scene)
+            if thumbnail is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(scene)
+            self.hits += 1
+            return thumbnail
+
+    def put(self, thumbnail: Thumbnail) -> bool:
+        """Store a thumbnail; False if the scene's cached image is the same (nothing stored)."""
+        with self._lock:
+            current = self._entries.get(thumbnail.scene)
+            if current is not None and current.etag == thumbnail.etag:
+                self._entries.move_to_end(thumbnail.scene)
+                self.unchanged += 1
+                return False
+            if current is not None:
+                self._bytes -= len(current.data)
+            self._entries[thumbnail.scene] = thumbnail
+            self._entries.move_to_end(thumbnail.scene)
+            self._bytes += len(thumbnail.data)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.data)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, scene: Optional[str] = None) -> None:
+        with self._lock:
+            if scene is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                evicted = self._entries.pop(scene, None)
+                if evicted is not None:
+                    self._bytes -= len(evicted.data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "unchanged": self.unchanged,
+        }
+
+
+class ThumbnailService:
+    """Screenshots of the scenes decks are watching.
+
+    - while anything is watched, a daemon thread fetches every watched scene in one
+      parallel request batch each ``interval`` seconds
+    - a frame whose hash matches the cached one is dropped; listeners only hear
+      about thumbnails that actually changed
+    - ``get`` serves the cache and fetches on a miss (REST endpoint)
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        width: int = 320,
+        image_format: str = "jpg",
+        quality: int = 70,
+        interval: float = 2.0,
+        max_bytes: int = 8 * 1024 * 1024,
+    ):
+        self.client = client
+        self.width = width
+        self.image_format = image_format
+        self.quality = quality
+        self.interval = interval
+        self.cache = ThumbnailCache(max_bytes)
+        self._watchers: Dict[Any, Set[str]] = {}
+        self._listeners: List[ThumbnailListener] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._refreshes = 0
+        self._failures = 0
+        add_listener = getattr(client, "add_event_listener", None)
+        if add_listener is not None:
+            add_listener(self.on_event)
+
+    def _request(self, scene: str) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "sourceName": scene,
+            "imageFormat": self.image_format,
+            "imageWidth": self.width,
+        }
+        if self.quality >= 0:
+            data["imageCompressionQuality"] = self.quality
+        return {"requestType": "GetSourceScreenshot", "requestData": data}
+
+    def _decode(self, scene: str, response_data: Dict[str, Any]) -> Thumbnail:
+        image = response_data.get("imageData") or ""
+        header, _, encoded = image.partition(",")
+        if not encoded:
+            raise RuntimeError(f"OBS returned no screenshot for {scene}")
+        media_type = (
+            header[len("data:") :].split(";")[0]
+            if header.startswith("data:")
+            else f"image/{self.image_format}"
+        )
+        try:
+            data = base64.b64decode(encoded, validate=True)
+        except binascii.Error:
+            raise RuntimeError(f"OBS returned a malformed screenshot for {scene}") from None
+        return Thumbnail(scene, data, media_type)
+
+    def fetch(self, scenes: Iterable[str]) -> List[Thumbnail]:
+        """Screenshot ``scenes`` in one batch and cache them; returns the changed thumbnails."""
+        scenes = list(dict.fromkeys(scenes))
+        if not scenes:
+            return []
+        results = self.client.call_batch(
+            [self._request(scene) for scene in scenes], execution_type="parallel"
+        )
+        changed = []
+        for scene, result in zip(scenes, results):
+            if not result["ok"]:
+                logger.debug(
+                    f"Thumbnail of {scene} failed: {result.get('comment') or result.get('code')}"
+                )
+                continue
+            try:
+                thumbnail = self._decode(scene, result["responseData"] or {})
+            except RuntimeError as exc:
+                logger.debug(f"Thumbnail of {scene} failed: {exc}")
+                continue
+            if self.cache.put(thumbnail):
+                changed.append(thumbnail)
+        return changed
+
+    def get(self, scene: str) -> Thumbnail:
+        """Cached thumbnail, fetched on a miss; RuntimeError if OBS can't provide one."""
+        thumbnail = self.cache.get(scene)
+        if thumbnail is None:
+            result = self.client.call_batch([self._request(scene)])[0]
+            if not result["ok"]:
+                raise RuntimeError(f"OBS resource not found: {result.get('comment') or scene}")
+            thumbnail = self._decode(scene, result["responseData"] or {})
+            self.cache.put(thumbnail)
+        return thumbnail
+
+    def add_listener(self, listener: ThumbnailListener) -> None:
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def watch(self, watcher: Any, scenes: Iterable[str]) -> None:
+        """Keep ``scenes`` refreshed for ``watcher`` (replaces its previous scenes)."""
+        with self._lock:
+            self._watchers[watcher] = {str(scene) for scene in scenes if scene}
+            self._stop.clear()
+            thread = None
+            if self._thread is None:
+                thread = self._thread = threading.Thread(
+                    target=self._run, name="obs-thumbnails", daemon=True
+                )
+        if thread is not None:
+            thread.start()
+
+    def unwatch(self, watcher: Any) -> None:
+        with self._lock:
+            self._watchers.pop(watcher, None)
+            if not self._watchers:
+                self._stop.set()
+
+    def watched(self) -> Set[str]:
+        with self._lock:
+            return set().union(*self._watchers.values()) if self._watchers else set()
+
+    def refresh(self) -> List[Thumbnail]:
+        """Fetch the watched scenes once and notify listeners of the changed ones."""
+        self._refreshes += 1
+        try:
+            changed = self.fetch(sorted(self.watched()))
+        except Exception as exc:  # noqa: BLE001
+            self._failures += 1
+            logger.debug(f"Thumbnail refresh failed: {exc}")
+            return []
+        if changed:
+            for listener in list(self._listeners):
+                try:
+                    listener(changed)
+                except Exception:
+                    logger.exception("Thumbnail listener failed")
+        return changed
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._watchers:
+                    self._thread = None
+                    return
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def on_event(self, event_type: Optional[str], data: Dict[str, Any]) -> None:
+        """OBS event listener: forget thumbnails of renamed or removed scenes."""
+        if event_type in ("SceneRemoved", "SceneNameChanged"):
+            self.cache.invalidate(data.get("oldSceneName") or data.get("sceneName"))
+
+    def close(self) -> None:
+        with self._lock:
+            self._watchers.clear()
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            "watched": len(self.watched()),
+            "refreshes": self._refreshes,
+            "failures": self._failures,
+        }
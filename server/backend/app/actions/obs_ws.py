@@ -0,0 +1,559 @@
+"""Native obs-websocket v5 transport.
+
+One authenticated WebSocket is kept open on a dedicated event-loop thread;
+concurrent requests are multiplexed over it and matched to their responses by
+``requestId``. ``OBSWebSocketClient.call`` is a drop-in for ``OBSClient.call``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import threading
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Protocol, Sequence, TypeVar
+
+from loguru import logger
+from websockets.exceptions import ConnectionClosed
+
+from app.utils.circuit_breaker import HALF_OPEN, AdaptiveTimeout, CircuitBreaker
+
+try:
+    from websockets.asyncio.client import connect as ws_connect
+except ImportError:  # websockets < 13
+    from websockets import connect as ws_connect  # type: ignore[no-redef]
+
+T = TypeVar("T")
+
+# obs-websocket v5 opcodes
+OP_HELLO = 0
+OP_IDENTIFY = 1
+OP_IDENTIFIED = 2
+OP_REIDENTIFY = 3
+OP_EVENT = 5
+OP_REQUEST = 6
+OP_REQUEST_RESPONSE = 7
+OP_REQUEST_BATCH = 8
+OP_REQUEST_BATCH_RESPONSE = 9
+
+# RequestBatchExecutionType by name. "serial" runs the requests one after another as
+# fast as possible, "serial_frame" runs one per video frame, "parallel" runs them all
+# at once in no particular order.
+BATCH_EXECUTION_TYPES = {"serial": 0, "serial_frame": 1, "parallel": 2}
+
+RPC_VERSION = 1
+# EventSubscription.All (every low-volume event category)
+EVENT_SUBSCRIPTION_ALL = 0x7FF
+# High-volume InputVolumeMeters events (every 50 ms), only subscribed while someone listens
+EVENT_SUBSCRIPTION_INPUT_VOLUME_METERS = 1 << 16
+
+# Listener signature: (eventType, eventData). eventType is None when the connection
+# has just been (re)established and any locally mirrored OBS state should be resynced.
+EventListener = Callable[[Optional[str], Dict[str, Any]], None]
+
+_CANNOT_CONNECT = (
+    "Cannot connect to OBS WebSocket server. "
+    "Is OBS Studio running with WebSocket enabled on port 4455?"
+)
+
+# Close codes after which reconnecting can't help
+_FATAL_CLOSE_CODES = {4009: "authentication failed", 4010: "unsupported RPC version"}
+
+
+class _NotConnected(RuntimeError):
+    """No OBS connection to send on; the reconnect loop already counts this for the breaker."""
+
+
+class _RequestTimeout(RuntimeError):
+    """No response in time on a live connection: a slow request, not a dead OBS."""
+
+
+def auth_response(password: str, salt: str, challenge: str) -> str:
+    """Authentication string for Identify (obs-websocket v5 spec)."""
+    secret = base64.b64encode(hashlib.sha256((password + salt).encode()).digest()).decode()
+    return base64.b64encode(hashlib.sha256((secret + challenge).encode()).digest()).decode()
+
+
+def raise_for_request_status(status_info: Dict[str, Any]) -> None:
+    """Raise RuntimeError for a non-success ``requestStatus`` (code 100 is success)."""
+    code = status_info.get("code")
+    if code == 100:
+        return
+    comment = status_info.get("comment") or "Unknown error"
+    if code == 404 or code == 600:
+        raise RuntimeError(f"OBS resource not found: {comment}")
+    if code == 400 or code in range(300, 400):
+        raise RuntimeError(f"OBS invalid request: {comment}")
+    raise RuntimeError(f"OBS request error (code {code}): {comment}")
+
+
+class OBSRequestClient(Protocol):
+    """What the OBS managers need from a transport (``OBSClient`` or ``OBSWebSocketClient``)."""
+
+    def call(
+        self, request_type: str, request_data: Dict[str, Any] | None = None
+    ) -> Dict[str, Any]: ...
+
+    def call_batch(
+        self,
+        requests: Sequence[Dict[str, Any]],
+        execution_type: str = "serial",
+        halt_on_failure: bool = False,
+    ) -> List[Dict[str, Any]]: ...
+
+
+def batch_request_items(requests: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Normalize ``{"requestType", "requestData"?}`` dicts for a RequestBatch."""
+    items = []
+    for request in requests:
+        request_type = request.get("requestType") if isinstance(request, dict) else None
+        if not isinstance(request_type, str) or not request_type:
+            raise ValueError("Every batch request needs a requestType")
+        request_data = request.get("requestData") or {}
+        if not isinstance(request_data, dict):
+            raise ValueError(f"requestData of {request_type} must be an object")
+        items.append({"requestType": request_type, "requestData": request_data})
+    return items
+
+
+def batch_result(
+    request_type: str, status_info: Dict[str, Any], response_data: Any
+) -> Dict[str, Any]:
+    """One entry of a batch result list, the same for every transport."""
+    return {
+        "requestType": request_type,
+        "ok": status_info.get("code") == 100,
+        "code": status_info.get("code"),
+        "comment": status_info.get("comment"),
+        "responseData": response_data or {},
+    }
+
+
+def raise_for_batch(results: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Raise for the first failed batch entry; returns the results otherwise."""
+    for result in results:
+        if not result["ok"]:
+            raise_for_request_status({"code": result["code"], "comment": result["comment"]})
+    return list(results)
+
+
+class OBSWebSocketClient:
+    """obs-websocket v5 client with the same ``call`` API as the HTTP ``OBSClient``.
+
+    - the connection is opened lazily and re-established with exponential backoff
+    - ``call`` (sync, any thread) and ``call_async`` (any event loop) share the socket;
+      a command costs one request/response message exchange
+    - requests in flight when the socket drops fail immediately instead of timing out
+    - OBS events are passed to listeners registered with ``add_event_listener``; they
+      run on the transport thread and must not block or call back into the client
+    - failed connection attempts trip a circuit breaker, so calls fail immediately
+      while OBS is gone; the reconnect loop is the probe that closes it again. A
+      request that times out on a live socket is not counted against it
+    - request timeouts follow the observed latency (``timeout`` is the upper bound
+      per request; a batch gets it once per request it carries)
+    """
+
+    def __init__(
+        self,
+        url: str,
+        password: str = "",
+        timeout: float = 10.0,
+        reconnect_base: float = 0.5,
+        reconnect_max: float = 10.0,
+        event_subscriptions: int = EVENT_SUBSCRIPTION_ALL,
+        timeout_min: float = 1.0,
+        breaker_threshold: int = 3,
+        breaker_reset: float = 5.0,
+    ):
+        self.url = self._normalize_url(url)
+        self.password = password or ""
+        self.timeout = timeout
+        self.reconnect_base = reconnect_base
+        self.reconnect_max = reconnect_max
+        self.event_subscriptions = event_subscriptions
+        self._ids = itertools.count(1)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._ws: Any = None
+        self._connected: Optional[asyncio.Event] = None
+        # Set once the current connection attempt has succeeded or failed
+        self._settled: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._fatal: Optional[str] = None
+        self._last_error: Optional[str] = None
+        self._requests = 0
+        self._failures = 0
+        self._timeouts = 0
+        self._connects = 0
+        self._last_rtt: Optional[float] = None
+        self._listeners: List[EventListener] = []
+        self.breaker = CircuitBreaker("obs-websocket", breaker_threshold, breaker_reset)
+        self.latency = AdaptiveTimeout(timeout_min, timeout)
+
+    @staticmethod
+    def _normalize_url(url: str) -> str:
+        base = url or "ws://localhost:4455"
+        return base.replace("http://", "ws://").replace("https://", "wss://")
+
+    # Event-loop thread
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run() -> None:
+                    asyncio.set_event_loop(loop)
+                    self._connected = asyncio.Event()
+                    self._settled = asyncio.Event()
+                    self._runner = loop.create_task(self._maintain())
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="obs-websocket", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    async def _maintain(self) -> None:
+        assert self._connected is not None and self._settled is not None
+        delay = self.reconnect_base
+        while True:
+            identified = False
+            self._settled.clear()
+            try:
+                async with ws_connect(self.url, max_size=None, open_timeout=self.timeout) as ws:
+                    await self._identify(ws)
+                    identified = True
+                    self._ws = ws
+                    self._connects += 1
+                    self._last_error = None
+                    delay = self.reconnect_base
+                    self.breaker.record_success()
+                    self._connected.set()
+                    self._settled.set()
+                    logger.info(f"Connected to OBS WebSocket at {self.url}")
+                    self._emit(None, {})
+                    await self._read(ws)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                self._last_error = str(exc) or type(exc).__name__
+                code = getattr(getattr(exc, "rcvd", None), "code", None)
+                if code in _FATAL_CLOSE_CODES:
+                    self._fatal = f"OBS WebSocket {_FATAL_CLOSE_CODES[code]}"
+            finally:
+                self._ws = None
+                self._connected.clear()
+                self._fail_pending(RuntimeError("OBS WebSocket connection lost"))
+            if identified:
+                # Dropped after a good connection: callers wait for the next attempt
+                self._settled.clear()
+            else:
+                self.breaker.record_failure()
+                self._settled.set()
+            if self._fatal:
+                logger.error(f"{self._fatal}; not reconnecting")
+                return
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max)
+
+    async def _identify(self, ws: Any) -> None:
+        hello = json.loads(await asyncio.wait_for(ws.recv(), self.timeout))
+        if hello.get("op") != OP_HELLO:
+            raise RuntimeError("OBS WebSocket did not send Hello")
+        identify: Dict[str, Any] = {
+            "rpcVersion": RPC_VERSION,
+            "eventSubscriptions": self.event_subscriptions,
+        }
+        challenge = hello.get("d", {}).get("authentication")
+        if challenge:
+            identify["authentication"] = auth_response(
+                self.password, challenge["salt"], challenge["challenge"]
+            )
+        await ws.send(json.dumps({"op": OP_IDENTIFY, "d": identify}))
+        identified = json.loads(await asyncio.wait_for(ws.recv(), self.timeout))
+        if identified.get("op") != OP_IDENTIFIED:
+            raise RuntimeError("OBS WebSocket identification failed")
+
+    async def _read(self, ws: Any) -> None:
+        async for raw in ws:
+            message = json.loads(raw)
+            op = message.get("op")
+            data = message.get("d") or {}
+            if op in (OP_REQUEST_RESPONSE, OP_REQUEST_BATCH_RESPONSE):
+                future = self._pending.pop(str(data.get("requestId")), None)
+                if future is not None and not future.done():
+                    future.set_result(data)
+            elif op == OP_EVENT:
+                self._emit(data.get("eventType"), data.get("eventData") or {})
+
+    def _emit(self, event_type: Optional[str], event_data: Dict[str, Any]) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(event_type, event_data)
+            except Exception:
+                logger.exception(f"OBS event listener failed for {event_type}")
+
+    def _fail_pending(self, exc: Exception) -> None:
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    async def _request(self, op: int, data: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        assert self._connected is not None and self._settled is not None
+        assert self._loop is not None
+        started = time.perf_counter()
+        deadline = started + timeout
+        request_id = str(next(self._ids))
+        future = self._loop.create_future()
+        try:
+            while True:
+                if not self._connected.is_set():
+                    if self._fatal:
+                        raise RuntimeError(self._fatal)
+                    if self._last_error is not None:
+                        # The last connection attempt failed: don't wait for the next one
+                        raise _NotConnected(_CANNOT_CONNECT)
+                    assert self._settled is not None
+                    try:
+                        await asyncio.wait_for(
+                            self._settled.wait(), max(0.0, deadline - time.perf_counter())
+                        )
+                    except asyncio.TimeoutError:
+                        raise _NotConnected(_CANNOT_CONNECT) from None
+                    continue
+                self._pending[request_id] = future
+                try:
+                    await self._ws.send(
+                        json.dumps({"op": op, "d": {**data, "requestId": request_id}})
+                    )
+                    sent = time.perf_counter()
+                    break
+                except ConnectionClosed:
+                    # Closed before the reader noticed; nothing was sent, so wait for the
+                    # reconnect and retry
+                    self._pending.pop(request_id, None)
+                    self._connected.clear()
+                    self._settled.clear()
+            response: Dict[str, Any] = await asyncio.wait_for(
+                future, max(0.0, deadline - time.perf_counter())
+            )
+        except asyncio.TimeoutError:
+            raise _RequestTimeout(
+                "OBS WebSocket connection timeout. Is OBS Studio running?"
+            ) from None
+        finally:
+            self._pending.pop(request_id, None)
+        self._last_rtt = time.perf_counter() - sent
+        return response
+
+    # Public API
+
+    def connect(self) -> None:
+        """Start connecting in the background (calls connect lazily anyway)."""
+        self._ensure_started()
+
+    def add_event_listener(self, listener: EventListener) -> None:
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_event_listener(self, listener: EventListener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def set_event_subscriptions(self, event_subscriptions: int) -> None:
+        """Change the subscribed event categories (Reidentify on a live connection)."""
+        if event_subscriptions == self.event_subscriptions:
+            return
+        self.event_subscriptions = event_subscriptions
+        loop = self._loop
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._reidentify(), loop)
+
+    async def _reidentify(self) -> None:
+        ws = self._ws
+        if ws is None:
+            return  # the next Identify sends the new mask
+        try:
+            await ws.send(
+                json.dumps(
+                    {"op": OP_REIDENTIFY, "d": {"eventSubscriptions": self.event_subscriptions}}
+                )
+            )
+        except ConnectionClosed:
+            pass
+
+    def _submit(self, coro: Coroutine[Any, Any, T]) -> concurrent.futures.Future[T]:
+        loop = self._ensure_started()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("OBS call from the OBS WebSocket thread would deadlock")
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def _check_breaker(self) -> None:
+        if not self.breaker.allow():
+            raise RuntimeError(
+                f"OBS is unavailable (circuit open, retrying in {self.breaker.retry_in():.1f}s). "
+                "Is OBS Studio running?"
+            )
+
+    async def _send(self, op: int, data: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """``_request`` with request counting, breaker bookkeeping and latency sampling."""
+        self._requests += 1
+        try:
+            response = await self._request(op, data, timeout)
+        except _NotConnected:
+            self._failures += 1
+            if self.breaker.state == HALF_OPEN:
+                # The trial call found no connection: stay open until the reconnect succeeds
+                self.breaker.record_failure()
+            raise
+        except _RequestTimeout:
+            # The socket is up, so one slow request (or batch) says nothing about OBS
+            # being gone; only a half-open trial must settle the breaker either way
+            self._failures += 1
+            self._timeouts += 1
+            if self.breaker.state == HALF_OPEN:
+                self.breaker.record_failure()
+            raise
+        except Exception:
+            self._failures += 1
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        if self._last_rtt is not None and op == OP_REQUEST:
+            self.latency.observe(self._last_rtt)
+        return response
+
+    async def _call(
+        self, request_type: str, request_data: Optional[Dict[str, Any]], timeout: float
+    ) -> Dict[str, Any]:
+        response = await self._send(
+            OP_REQUEST, {"requestType": request_type, "requestData": request_data or {}}, timeout
+        )
+        raise_for_request_status(response.get("requestStatus") or {})
+        return response.get("responseData") or {}
+
+    def call(self, request_type: str, request_data: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        """Blocking request, drop-in for ``OBSClient.call``."""
+        self._check_breaker()
+        return self._submit(self._call(request_type, request_data, self.latency.timeout())).result()
+
+    async def _call_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        execution_type: str,
+        halt_on_failure: bool,
+        timeout: float,
+    ) -> List[Dict[str, Any]]:
+        data: Dict[str, Any] = {
+            "executionType": BATCH_EXECUTION_TYPES[execution_type],
+            "haltOnFailure": halt_on_failure,
+            # Per-request ids put parallel results (which arrive as they finish) back in order
+            "requests": [
+                {**request, "requestId": str(index)} for index, request in enumerate(requests)
+            ],
+        }
+        response = await self._send(OP_REQUEST_BATCH, data, timeout)
+        items = response.get("results") or []
+        if all(str(item.get("requestId", "")).isdigit() for item in items):
+            items = sorted(items, key=lambda item: int(item["requestId"]))
+        return [
+            batch_result(
+                item.get("requestType", ""),
+                item.get("requestStatus") or {},
+                item.get("responseData"),
+            )
+            for item in items
+        ]
+
+    def call_batch(
+        self,
+        requests: Sequence[Dict[str, Any]],
+        execution_type: str = "serial",
+        halt_on_failure: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Send ``{"requestType", "requestData"}`` requests as one RequestBatch.
+
+        Returns one :func:`batch_result` per executed request, in request order
+        (with ``halt_on_failure`` the list stops at the first failure).
+        """
+        if execution_type not in BATCH_EXECUTION_TYPES:
+            raise ValueError(
+                f"Unknown batch execution type {execution_type!r}, "
+                f"expected one of {tuple(BATCH_EXECUTION_TYPES)}"
+            )
+        items = batch_request_items(requests)
+        if not items:
+            return []
+        self._check_breaker()
+        # Each request may take up to the single-request timeout: OBS runs "parallel"
+        # batches on a bounded worker pool, so they can take as long as serial ones
+        timeout = self.latency.timeout() * len(items)
+        return self._submit(
+            self._call_batch(items, execution_type, halt_on_failure, timeout)
+        ).result()
+
+    async def call_async(
+        self, request_type: str, request_data: Dict[str, Any] | None = None
+    ) -> Dict[str, Any]:
+        """Awaitable request usable from any event loop."""
+        self._check_breaker()
+        return await asyncio.wrap_future(
+            self._submit(self._call(request_type, request_data, self.latency.timeout()))
+        )
+
+    def close(self) -> None:
+        """Close the socket and stop the transport thread."""
+        with self._start_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+
+        async def shutdown() -> None:
+            if self._runner is not None:
+                self._runner.cancel()
+                try:
+                    await self._runner
+                except (asyncio.CancelledError, Exception):  # noqa: BLE001
+                    pass
+            self._fail_pending(RuntimeError("OBS client closed"))
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=5)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            if thread is not None:
+                thread.join(timeout=5)
+            loop.close()
+            self._fatal = None
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "transport": "websocket",
+            "connected": self.connected,
+            "requests": self._requests,
+            "failures": self._failures,
+            "timeouts": self._timeouts,
+            "connects": self._connects,
+            "pending": len(self._pending),
+            "lastRttMs": round(self._last_rtt * 1000, 3) if self._last_rtt is not None else None,
+            "lastError": self._last_error,
+            "breaker": self.breaker.stats(),
+            "latency": self.latency.stats(),
+        }
@@ -1,14 +1,27 @@
 from __future__ import annotations
 
+import asyncio
+import codecs
+import concurrent.futures
 import os
-import subprocess
+import signal
+import threading
+from collections import deque
 from pathlib import Path
-from typing import Sequence
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+from loguru import logger
 
 from ..config import get_settings
 
 settings = get_settings()
 
+# on_output(stream, text): "stdout"/"stderr" and the decoded text read since the last call
+OutputCallback = Callable[[str, str], None]
+
+# Bytes read from a pipe at once (a chatty script's output is passed on in chunks this big)
+READ_CHUNK = 64 * 1024
+
 # Whitelist of allowed script directories (configurable via env)
 ALLOWED_SCRIPT_DIRS = [
     settings.deck_data_dir / "scripts",
@@ -51,21 +64,206 @@ def _validate_script_path(script_path: str) -> Path:
 
     # Check file extension
     if resolved.suffix.lower() not in ALLOWED_EXTENSIONS:
-        raise ValueError(
-            f"Script extension not allowed. Allowed: {ALLOWED_EXTENSIONS}"
-        )
+        raise ValueError(f"Script extension not allowed. Allowed: {ALLOWED_EXTENSIONS}")
 
     return resolved
 
 
-def run_script(cmd: Sequence[str]) -> dict:
+class OutputBuffer:
+    """The last ``limit`` characters of a stream; older output is dropped."""
+
+    def __init__(self, limit: int):
+        self.limit = max(0, limit)
+        self._chunks: Deque[str] = deque()
+        self._size = 0
+        self.dropped = 0
+
+    def append(self, text: str) -> None:
+        self._chunks.append(text)
+        self._size += len(text)
+        while self._size > self.limit:
+            excess = self._size - self.limit
+            head = self._chunks[0]
+            if len(head) <= excess:
+                self._chunks.popleft()
+                cut = len(head)
+            else:
+                self._chunks[0] = head[excess:]
+                cut = excess
+            self._size -= cut
+            self.dropped += cut
+
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+
+class ScriptRunner:
+    """Runs scripts as asyncio subprocesses on a ``scripts`` event loop thread.
+
+    - at most ``max_concurrent`` scripts run at once; the others wait their turn
+    - stdout and stderr are read as they arrive: every chunk goes to ``on_output``
+      and into an ``OutputBuffer`` keeping the last ``output_limit`` characters
+    - a script still running after ``timeout`` seconds, or whose run is cancelled,
+      is killed along with its process group and reaped
+    """
+
+    def __init__(
+        self, max_concurrent: int = 4, timeout: float = 30.0, output_limit: int = 64 * 1024
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.timeout = timeout
+        self.output_limit = output_limit
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._started = 0
+        self._killed = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._semaphore = asyncio.Semaphore(self.max_concurrent)
+                threading.Thread(target=loop.run_forever, name="scripts", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(
+        self, cmd: Sequence[str], on_output: Optional[OutputCallback] = None
+    ) -> concurrent.futures.Future[Dict[str, Any]]:
+        """Run ``cmd`` (already validated) on the scripts loop; the future gets the result dict."""
+        return asyncio.run_coroutine_threadsafe(self.run(list(cmd), on_output), self._ensure_loop())
+
+    async def run(
+        self, cmd: List[str], on_output: Optional[OutputCallback] = None
+    ) -> Dict[str, Any]:
+        assert self._semaphore is not None
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._running += 1
+        try:
+            return await self._execute(cmd, on_output)
+        finally:
+            self._running -= 1
+            self._semaphore.release()
+
+    async def _execute(self, cmd: List[str], on_output: Optional[OutputCallback]) -> Dict[str, Any]:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            shell=False,  # Never use shell=True
+            start_new_session=os.name != "nt",  # own process group, so children die with it
+        )
+        self._started += 1
+        stdout, stderr = OutputBuffer(self.output_limit), OutputBuffer(self.output_limit)
+        pumps = [
+            asyncio.ensure_future(self._pump(process.stdout, "stdout", stdout, on_output)),
+            asyncio.ensure_future(self._pump(process.stderr, "stderr", stderr, on_output)),
+        ]
+        timed_out = False
+        try:
+            await asyncio.wait_for(asyncio.gather(process.wait(), *pumps), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+        finally:
+            if process.returncode is None:
+                self._kill(process)
+                await process.wait()
+            for pump in pumps:
+                pump.cancel()
+
+        result: Dict[str, Any] = {"status": "ok", "stdout": stdout.text(), "stderr": stderr.text()}
+        if stdout.dropped or stderr.dropped:
+            result["truncated"] = {"stdout": stdout.dropped, "stderr": stderr.dropped}
+        if timed_out:
+            result.update(status="error", error="Script execution timeout")
+        elif process.returncode != 0:
+            result.update(status="error", code=process.returncode)
+        return result
+
+    def _kill(self, process: asyncio.subprocess.Process) -> None:
+        self._killed += 1
+        try:
+            if os.name == "nt":
+                process.kill()
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass  # exited in the meantime
+
+    @staticmethod
+    async def _pump(
+        stream: Optional[asyncio.StreamReader],
+        name: str,
+        buffer: OutputBuffer,
+        on_output: Optional[OutputCallback],
+    ) -> None:
+        if stream is None:
+            return
+        # Incremental: a UTF-8 character split across two reads is decoded whole
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            data = await stream.read(READ_CHUNK)
+            text = decoder.decode(data, final=not data)
+            if text:
+                buffer.append(text)
+                if on_output is not None:
+                    try:
+                        on_output(name, text)
+                    except Exception:
+                        logger.exception("Script output callback failed")
+            if not data:
+                return
+
+    def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "maxConcurrent": self.max_concurrent,
+            "running": self._running,
+            "waiting": self._waiting,
+            "started": self._started,
+            "killed": self._killed,
+        }
+
+
+_runner: Optional[ScriptRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> ScriptRunner:
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = ScriptRunner(
+                    settings.script_max_concurrent,
+                    settings.script_timeout,
+                    settings.script_output_limit,
+                )
+    return _runner
+
+
+def run_script(cmd: Sequence[str], on_output: Optional[OutputCallback] = None) -> dict:
     """Run a script with security validation.
 
     Args:
         cmd: Command as a sequence [script_path, arg1, arg2, ...]
+        on_output: Called with ("stdout"/"stderr", text) as output arrives
 
     Returns:
-        Dict with status, stdout, stderr
+        Dict with status, stdout, stderr (the last ``script_output_limit`` characters of each)
     """
     if not isinstance(cmd, (list, tuple)) or len(cmd) == 0:
         return {"status": "error", "error": "Invalid command format"}
@@ -75,25 +273,13 @@ def run_script(cmd: Sequence[str]) -> dict:
         script_path = _validate_script_path(cmd[0])
 
         # Rebuild command with validated path
-        validated_cmd = [str(script_path)] + list(cmd[1:])
-
-        # Run with shell=False for security
-        completed = subprocess.run(
-            validated_cmd,
-            check=True,
-            capture_output=True,
-            text=True,
-            timeout=30,  # 30 second timeout
-            shell=False,  # Never use shell=True
-        )
-        return {"status": "ok", "stdout": completed.stdout, "stderr": completed.stderr}
+        validated_cmd = [str(script_path)] + [str(arg) for arg in cmd[1:]]
+
+        # Blocks this (worker) thread only; the script runs on the scripts loop
+        return get_runner().submit(validated_cmd, on_output).result()
 
     except ValueError as exc:
         # Validation error
         return {"status": "error", "error": str(exc)}
-    except subprocess.TimeoutExpired:
-        return {"status": "error", "error": "Script execution timeout"}
-    except subprocess.CalledProcessError as exc:
-        return {"status": "error", "code": exc.returncode, "stdout": exc.stdout, "stderr": exc.stderr}
     except Exception as exc:
         return {"status": "error", "error": f"Unexpected error: {str(exc)}"}
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import secrets
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from functools import lru_cache
 from pydantic import Field
@@ -16,12 +16,30 @@ class Settings(BaseSettings):
     port: int = 4455
     obs_ws_url: str = "ws://localhost:4455"
     obs_ws_password: str = ""
-    obs_request_timeout: float = 10.0
+    obs_request_timeout: float = 10.0  # upper bound; adapts to observed OBS latency
+    obs_request_timeout_min: float = 1.0
+    obs_breaker_threshold: int = 3  # consecutive OBS failures before calls fail fast
+    obs_breaker_reset: float = 5.0  # seconds before OBS is probed again
+    obs_transport: str = "websocket"  # "websocket" (obs-websocket v5) or "http" (HTTP bridge)
+    obs_reconnect_base: float = 0.5  # first reconnect delay, doubled up to obs_reconnect_max
+    obs_reconnect_max: float = 10.0
+    obs_scene_item_cache_ttl: float = 30.0  # seconds; 0 disables the sceneItemId cache
+    obs_meter_rate: int = 15  # audio-meter frames per second when a deck doesn't ask for a rate
+    obs_meter_max_rate: int = 30
+    obs_thumbnail_width: int = 320  # pixels; OBS keeps the aspect ratio
+    obs_thumbnail_format: str = "jpg"
+    obs_thumbnail_quality: int = 70  # -1 = OBS default
+    obs_thumbnail_interval: float = 2.0  # seconds between refreshes of watched scenes
+    obs_thumbnail_cache_bytes: int = 8 * 1024 * 1024  # per OBS instance
+    obs_max_connections: int = 4
+    obs_max_keepalive_connections: int = 2
+    obs_keepalive_expiry: float = 30.0  # seconds an idle OBS connection is kept open
+    # Extra named OBS connections, {"name": {"url", "password"?, "transport"?}};
+    # actions pick one with "obs"
+    obs_instances: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
     deck_token: str = Field(default_factory=lambda: secrets.token_hex(32))
     handshake_secret: Optional[str] = None
-    deck_data_dir: Path = Field(
-        default_factory=lambda: Path(__file__).resolve().parents[2]
-    )
+    deck_data_dir: Path = Field(default_factory=lambda: Path(__file__).resolve().parents[2])
     log_level: str = "info"
     tls_key_path: Optional[Path] = None
     tls_cert_path: Optional[Path] = None
@@ -31,6 +49,31 @@ class Settings(BaseSettings):
     max_message_size: int = 102400  # 100KB
     rate_limit_requests: int = 100
     rate_limit_window: int = 60  # seconds
+    # When False, clients may only trigger actions stored in a profile (control:press)
+    allow_raw_actions: bool = True
+
+    # Seconds between checks of the action mapping files for changes (0 disables reload)
+    mappings_poll_interval: float = 1.0
+
+    # Keyboard input
+    keyboard_backend: str = "auto"  # "auto" (pynput, else pyautogui), "pynput", "pyautogui", "null"
+    keyboard_key_delay: float = 0.0  # seconds between synthetic key events
+    keyboard_type_rate: float = 300.0  # keyboard:type characters per second (0 = no limit)
+    keyboard_type_chunk: int = 16  # characters typed per input-thread job
+    # Held keys are released this long after a client's last message/ping
+    keyboard_hold_timeout: float = 35.0
+
+    # Scripts
+    script_max_concurrent: int = 4  # scripts running at once; more wait for a free slot
+    script_timeout: float = 30.0  # seconds before a script is killed
+    script_output_limit: int = 64 * 1024  # stdout/stderr characters kept per script (the last)
+
+    # Profile persistence
+    profile_write_delay: float = 0.05  # seconds, write-behind coalescing window
+    profile_io_workers: int = 4  # threads serving profile disk I/O off the event loop
+    profile_store: str = "json"  # "json" (one file per profile) or "sqlite" (profiles.sqlite3)
+    profile_history_keep: int = 50  # versions kept per profile, 0 disables history
+    profile_history_max_age_days: float = 30.0  # older versions are dropped, 0 keeps them
 
     class Config:
         env_prefix = "DECK_"
@@ -44,6 +87,14 @@ class Settings(BaseSettings):
     def profiles_dir(self) -> Path:
         return self.deck_data_dir / "profiles"
 
+    @property
+    def profiles_db_path(self) -> Path:
+        return self.deck_data_dir / "profiles.sqlite3"
+
+    @property
+    def history_dir(self) -> Path:
+        return self.deck_data_dir / "history"
+
     @property
     def logs_dir(self) -> Path:
         return self.deck_data_dir / "logs"
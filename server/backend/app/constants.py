@@ -1,4 +1,5 @@
 """Application-wide constants for Control Deck backend."""
+
 from __future__ import annotations
 
 # WebSocket Configuration
@@ -37,8 +38,13 @@ HTTP_INTERNAL_ERROR = 500
 # Action Types (for validation)
 ACTION_TYPES = {
     "keyboard",
+    "keyboard:down",
+    "keyboard:up",
+    "keyboard:type",
+    "keyboard:type:cancel",
     "audio",
     "obs",
+    "obs:batch",
     "scripts",
     "system",
     "clipboard:copy",
@@ -65,6 +71,18 @@ MESSAGE_TYPE_ERROR = "error"
 MESSAGE_TYPE_PROFILE_SELECT = "profile:select"
 MESSAGE_TYPE_PROFILE_SELECT_ACK = "profile:select:ack"
 MESSAGE_TYPE_CONTROL_STATE = "control:state"
+MESSAGE_TYPE_CONTROL_PRESS = "control:press"
+MESSAGE_TYPE_MAPPING_TRIGGER = "mapping:trigger"
+MESSAGE_TYPE_PROFILE_CHANGED = "profile:changed"
+MESSAGE_TYPE_PROFILE_DELETED = "profile:deleted"
+MESSAGE_TYPE_OBS_METERS = "obs:meters"
+MESSAGE_TYPE_OBS_METERS_SUBSCRIBE = "obs:meters:subscribe"
+MESSAGE_TYPE_OBS_METERS_UNSUBSCRIBE = "obs:meters:unsubscribe"
+MESSAGE_TYPE_OBS_THUMBNAIL = "obs:thumbnail"
+MESSAGE_TYPE_OBS_THUMBNAILS_SUBSCRIBE = "obs:thumbnails:subscribe"
+MESSAGE_TYPE_OBS_THUMBNAILS_UNSUBSCRIBE = "obs:thumbnails:unsubscribe"
+MESSAGE_TYPE_KEYBOARD_TYPED = "keyboard:typed"
+MESSAGE_TYPE_SCRIPT_OUTPUT = "script:output"
 
 # Status Values
 STATUS_OK = "ok"
@@ -1,4 +1,5 @@
 """Custom exceptions for Control Deck backend."""
+
 from __future__ import annotations
 
 
@@ -49,6 +50,18 @@ class ProfileNotFoundError(ControlDeckException):
         self.profile_id = profile_id
 
 
+class ProfileVersionConflictError(ControlDeckException):
+    """Raised when a profile update targets a version that is no longer current."""
+
+    def __init__(self, profile_id: str, current_version: int):
+        super().__init__(
+            f"Profile {profile_id} is at version {current_version}",
+            code="PROFILE_VERSION_CONFLICT",
+        )
+        self.profile_id = profile_id
+        self.current_version = current_version
+
+
 class ScriptExecutionError(ControlDeckException):
     """Raised when script execution fails."""
 
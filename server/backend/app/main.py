@@ -1,25 +1,36 @@
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
+from .actions import obs
 from .config import get_settings
-from .routes import discovery, health, plugins, profiles, tokens
+from .routes import discovery, health, plugins, profiles, thumbnails, tokens
 from .utils.logger import setup_logger
 from .websocket import websocket_router
 
 settings = get_settings()
 setup_logger(settings)
-app = FastAPI(title="Control Deck", version="0.0.1")
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    yield
+    # Release pooled connections held by long-lived clients
+    obs.close_client()
+
+
+app = FastAPI(title="Control Deck", version="0.0.1", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins.split(",") if settings.allowed_origins else ["*"],
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type", "X-Deck-Token"],
 )
 
@@ -29,6 +40,7 @@ app.include_router(discovery.router, prefix="/discovery", tags=["discovery"])
 app.include_router(tokens.router, prefix="/tokens", tags=["tokens"])
 app.include_router(profiles.router, prefix="/profiles", tags=["profiles"])
 app.include_router(plugins.router, prefix="/plugins", tags=["plugins"])
+app.include_router(thumbnails.router, prefix="/obs/thumbnails", tags=["obs"])
 
 # WebSocket
 app.include_router(websocket_router, tags=["websocket"])
@@ -1,9 +1,10 @@
-from . import discovery, health, plugins, profiles, tokens
+from . import discovery, health, plugins, profiles, thumbnails, tokens
 
 __all__ = [
     "discovery",
     "health",
     "plugins",
     "profiles",
+    "thumbnails",
     "tokens",
 ]
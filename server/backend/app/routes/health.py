@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 
+from ..actions import obs
+from ..config import get_settings
 from ..utils.cache_manager import CacheManager
 from ..utils.rate_limiter import RateLimiter
 from ..utils.token_manager import get_token_manager
@@ -8,7 +10,7 @@ import time
 router = APIRouter()
 cache = CacheManager()
 rate_limiter = RateLimiter()
-token_manager = get_token_manager()
+token_manager = get_token_manager(default_token=get_settings().deck_token)
 started_at = time.time()
 
 
@@ -23,6 +25,7 @@ async def diagnostics():
         "tokens": token_manager.stats(),
         "rateLimiter": rate_limiter.stats(),
         "cache": cache.stats(),
+        "obs": obs.get_pool().stats(),
     }
 
 
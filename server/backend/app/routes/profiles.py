@@ -1,19 +1,113 @@
-from fastapi import APIRouter, HTTPException
+import tempfile
+from typing import AsyncIterator, Iterator, Optional
 
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from ..exceptions import ProfileNotFoundError, ProfileVersionConflictError
 from ..utils.profile_manager import ProfileManager
+from ..utils.profile_transfer import (
+    EXPORT_FORMATS,
+    MAX_IMPORT_ITEM_BYTES,
+    NdjsonSplitter,
+    ProfileImporter,
+    iter_ndjson,
+    iter_zip,
+)
+from ..utils.profile_validation import ProfileValidationError
 
 router = APIRouter()
 profiles = ProfileManager()
 
 
 @router.get("/")
-async def list_profiles():
-    return {"profiles": profiles.list_profiles()}
+async def list_profiles(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """List profiles.
+
+    Without query parameters every profile's id and name is returned (legacy aliases
+    included). ``limit``/``cursor``/``sort``/``fields`` switch to paginated metadata,
+    e.g. ``?limit=50&sort=-updatedAt&fields=id,name,rows,cols,controlCount,updatedAt``.
+    """
+    if limit is None and cursor is None and sort is None and fields is None:
+        return {"profiles": await profiles.list_profiles_async()}
+    try:
+        return await profiles.query_profiles_async(
+            limit,
+            cursor,
+            sort or "id",
+            [field.strip() for field in fields.split(",") if field.strip()] if fields else None,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+async def _stream_on_io(iterator: Iterator[bytes]) -> AsyncIterator[bytes]:
+    # Each chunk is produced on the profile I/O pool, one profile at a time
+    while True:
+        chunk = await profiles.run_io(next, iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+@router.get("/export")
+async def export_profiles(format: str = "ndjson"):
+    """Stream every profile as NDJSON (one profile per line) or as a zip of ``<id>.json`` files."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"format must be one of {sorted(EXPORT_FORMATS)}"
+        )
+    iterator = iter_zip(profiles) if format == "zip" else iter_ndjson(profiles)
+    return StreamingResponse(
+        _stream_on_io(iterator),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="profiles.{format}"'},
+    )
+
+
+@router.post("/import")
+async def import_profiles(request: Request, format: str = ""):
+    """Import an export stream, validating and saving each profile as it arrives.
+
+    The format comes from ``?format=`` or the Content-Type (zip vs NDJSON). Invalid
+    items are reported individually and don't stop the import.
+    """
+    content_type = request.headers.get("content-type", "")
+    if not format:
+        format = "zip" if "zip" in content_type else "ndjson"
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"format must be one of {sorted(EXPORT_FORMATS)}"
+        )
+
+    importer = ProfileImporter(profiles)
+    if format == "ndjson":
+        splitter = NdjsonSplitter()
+        async for chunk in request.stream():
+            lines = splitter.feed(chunk)
+            if lines:
+                await profiles.run_io(importer.import_lines, lines)
+        await profiles.run_io(importer.import_lines, splitter.close())
+    else:
+        # Zip members are located through the central directory at the end of the
+        # archive, so spool the upload (to disk past the threshold) before reading it
+        with tempfile.SpooledTemporaryFile(max_size=MAX_IMPORT_ITEM_BYTES) as spool:
+            async for chunk in request.stream():
+                spool.write(chunk)
+            spool.seek(0)
+            await profiles.run_io(importer.import_zip, spool)
+    await profiles.run_io(importer.finish)
+    return importer.summary()
 
 
 @router.get("/{profile_id}")
 async def get_profile(profile_id: str):
-    data = profiles.get_profile(profile_id)
+    data = await profiles.get_profile_async(profile_id)
     if not data:
         raise HTTPException(status_code=404, detail="Profile not found")
     return data
@@ -22,15 +116,81 @@ async def get_profile(profile_id: str):
 @router.post("/{profile_id}")
 async def save_profile(profile_id: str, payload: dict):
     try:
-        profile = profiles.save_profile(profile_id, payload)
+        profile = await profiles.save_profile_async(profile_id, payload)
+    except ProfileValidationError as exc:
+        raise HTTPException(
+            status_code=400, detail={"error": "invalid profile", "errors": exc.errors}
+        )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
     return {"status": "saved", "profileId": profile.id, "version": profile.version}
 
 
+@router.patch("/{profile_id}")
+async def patch_profile(profile_id: str, payload: dict):
+    """Apply RFC 6902 operations against a specific profile version.
+
+    Body::
+
+        {"version": <int>, "operations": [{"op": "replace", "path": "/controls/0/col", "value": 2}]}
+    """
+    version = payload.get("version")
+    if not isinstance(version, int) or isinstance(version, bool):
+        raise HTTPException(status_code=400, detail="version required")
+    operations = payload.get("operations")
+    if not isinstance(operations, list):
+        raise HTTPException(status_code=400, detail="operations must be a list")
+    try:
+        profile = await profiles.patch_profile_async(profile_id, version, operations)
+    except ProfileNotFoundError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    except ProfileVersionConflictError as exc:
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "version conflict", "currentVersion": exc.current_version},
+        )
+    except ProfileValidationError as exc:
+        raise HTTPException(
+            status_code=400, detail={"error": "invalid profile", "errors": exc.errors}
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"status": "patched", "profileId": profile_id, "version": profile["version"]}
+
+
+@router.get("/{profile_id}/versions")
+async def list_profile_versions(profile_id: str):
+    return {"profileId": profile_id, "versions": await profiles.list_versions_async(profile_id)}
+
+
+@router.get("/{profile_id}/versions/{version}")
+async def get_profile_version(profile_id: str, version: int):
+    data = await profiles.get_version_async(profile_id, version)
+    if not data:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return data
+
+
+@router.post("/{profile_id}/versions/{version}/rollback")
+async def rollback_profile(profile_id: str, version: int):
+    """Restore ``version`` by saving its content as a new version."""
+    try:
+        profile = await profiles.rollback_profile_async(profile_id, version)
+    except ProfileNotFoundError:
+        raise HTTPException(status_code=404, detail="Version not found")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {
+        "status": "rolled back",
+        "profileId": profile_id,
+        "version": profile.version,
+        "restoredVersion": version,
+    }
+
+
 @router.delete("/{profile_id}")
 async def delete_profile(profile_id: str):
-    ok = profiles.delete_profile(profile_id)
+    ok = await profiles.delete_profile_async(profile_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Profile not found")
     return {"status": "deleted", "profileId": profile_id}
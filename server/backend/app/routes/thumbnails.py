@@ -0,0 +1,41 @@
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from ..actions import obs
+
+router = APIRouter()
+
+
+def thumbnail_url(scene: str, instance: Optional[str] = None) -> str:
+    url = f"/obs/thumbnails/{quote(scene, safe='')}"
+    return (
+        f"{url}?obs={quote(instance, safe='')}"
+        if instance and instance != obs.DEFAULT_INSTANCE
+        else url
+    )
+
+
+@router.get("/{scene:path}")
+async def get_thumbnail(
+    scene: str, request: Request, instance: Optional[str] = Query(None, alias="obs")
+):
+    """Scene screenshot from the thumbnail cache (fetched from OBS on a miss).
+
+    Responses carry an ``ETag`` (the image hash); ``If-None-Match`` gets a 304.
+    """
+    try:
+        service = obs.get_thumbnails(instance)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    try:
+        thumbnail = await run_in_threadpool(service.get, scene)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=404 if "not found" in str(exc) else 503, detail=str(exc))
+    etag = f'"{thumbnail.etag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(thumbnail.data, media_type=thumbnail.media_type, headers=headers)
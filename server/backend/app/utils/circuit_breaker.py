@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Fails calls fast after ``threshold`` consecutive failures.
+
+    - closed: calls pass; a success resets the failure count
+    - open: ``allow()`` is False until the service is seen again. With a ``probe``
+      a daemon thread calls it every ``reset_timeout`` seconds (doubling up to
+      ``max_reset_timeout``) and closes the breaker on the first success;
+      otherwise one trial call is let through per ``reset_timeout`` (half-open)
+    - ``record_success`` from anywhere (e.g. a reconnected socket) closes it
+    """
+
+    def __init__(
+        self,
+        name: str,
+        threshold: int = 3,
+        reset_timeout: float = 5.0,
+        max_reset_timeout: float = 60.0,
+        probe: Optional[Callable[[], Any]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.threshold = max(1, threshold)
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max(max_reset_timeout, reset_timeout)
+        self.probe = probe
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._retry_at = 0.0
+        self._trips = 0
+        self._rejected = 0
+        self._probe_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (counts rejections)."""
+        if self._state == CLOSED:
+            return True
+        with self._lock:
+            if self._state == OPEN and self.probe is None and self._clock() >= self._retry_at:
+                self._state = HALF_OPEN
+                return True
+            self._rejected += 1
+            return False
+
+    def retry_in(self) -> float:
+        return max(0.0, self._retry_at - self._clock()) if self._state != CLOSED else 0.0
+
+    def record_success(self) -> None:
+        if self._state == CLOSED and self._failures == 0:
+            return
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"{self.name} circuit closed")
+            self._state = CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        start_probe = False
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (
+                self._state == CLOSED and self._failures >= self.threshold
+            ):
+                self._state = OPEN
+                self._trips += 1
+                self._opened_at = self._clock()
+                self._retry_at = self._opened_at + self.reset_timeout
+                logger.warning(f"{self.name} circuit open after {self._failures} failures")
+                start_probe = self.probe is not None and (
+                    self._probe_thread is None or not self._probe_thread.is_alive()
+                )
+                if start_probe:
+                    self._stop.clear()
+                    self._probe_thread = threading.Thread(
+                        target=self._run_probe, name=f"{self.name}-probe", daemon=True
+                    )
+        if start_probe:
+            assert self._probe_thread is not None
+            self._probe_thread.start()
+
+    def _run_probe(self) -> None:
+        delay = self.reset_timeout
+        while self._state != CLOSED and not self._stop.wait(delay):
+            try:
+                assert self.probe is not None
+                self.probe()
+            except Exception:
+                delay = min(delay * 2, self.max_reset_timeout)
+                with self._lock:
+                    self._retry_at = self._clock() + delay
+                continue
+            self.record_success()
+
+    def close(self) -> None:
+        """Stop the probe thread."""
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self._state,
+            "consecutiveFailures": self._failures,
+            "trips": self._trips,
+            "rejected": self._rejected,
+            "retryInSeconds": round(self.retry_in(), 3),
+        }
+
+
+class AdaptiveTimeout:
+    """Request timeout from an EWMA of observed latency (RFC 6298 style).
+
+    ``timeout = srtt + deviations * rttvar``, clamped to ``[minimum, maximum]``;
+    ``maximum`` until the first sample.
+    """
+
+    def __init__(
+        self,
+        minimum: float,
+        maximum: float,
+        alpha: float = 0.125,
+        beta: float = 0.25,
+        deviations: float = 4.0,
+    ):
+        self.minimum = min(minimum, maximum)
+        self.maximum = maximum
+        self.alpha = alpha
+        self.beta = beta
+        self.deviations = deviations
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = seconds
+                self.rttvar = seconds / 2
+            else:
+                self.rttvar = (1 - self.beta) * self.rttvar + self.beta * abs(self.srtt - seconds)
+                self.srtt = (1 - self.alpha) * self.srtt + self.alpha * seconds
+
+    def timeout(self) -> float:
+        if self.srtt is None:
+            return self.maximum
+        return min(self.maximum, max(self.minimum, self.srtt + self.deviations * self.rttvar))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "srttMs": round(self.srtt * 1000, 3) if self.srtt is not None else None,
+            "rttvarMs": round(self.rttvar * 1000, 3),
+            "timeoutSeconds": round(self.timeout(), 3),
+        }
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from ..constants import MESSAGE_TYPE_PROFILE_CHANGED, MESSAGE_TYPE_PROFILE_DELETED
+from .logger import get_logger
+from .profile_manager import PROFILE_ALIASES, ProfileManager
+
+logger = get_logger(__name__)
+
+# Action names used by clients that differ from the server handler keys
+ACTION_NAME_ALIASES = {
+    "script": "scripts",
+}
+
+
+@dataclass(frozen=True)
+class ResolvedAction:
+    """A control's action, validated and bound to its handler ahead of time."""
+
+    action: str
+    handler: Callable[[Any], Dict[str, Any]]
+    payload: Any
+
+
+def compile_action(
+    action: Any, handlers: Mapping[str, Callable[[Any], Dict[str, Any]]]
+) -> Optional[ResolvedAction]:
+    """Bind an ``{"type"|"action": name, "payload": ...}`` dict to its handler (None if unknown)."""
+    if not isinstance(action, dict):
+        return None
+    name = action.get("type") or action.get("action")
+    if not isinstance(name, str):
+        return None
+    name = name.strip().lower()
+    name = ACTION_NAME_ALIASES.get(name, name)
+    handler = handlers.get(name)
+    if handler is None:
+        return None
+    return ResolvedAction(action=name, handler=handler, payload=action.get("payload"))
+
+
+class ControlIndex:
+    """(profileId, controlId) -> ResolvedAction lookup built from the stored profiles.
+
+    - built once from every stored profile, then kept current from profile change events
+    - only controls whose action maps to a known handler are indexed, so clients can
+      only trigger actions that exist in a saved profile
+    """
+
+    def __init__(
+        self, manager: ProfileManager, handlers: Mapping[str, Callable[[Any], Dict[str, Any]]]
+    ):
+        self.manager = manager
+        self.handlers = handlers
+        self._entries: Dict[Tuple[str, str], ResolvedAction] = {}
+        self._controls: Dict[str, set] = {}
+        self._lock = threading.RLock()
+        self._built = False
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def compile_action(self, action: Any) -> Optional[ResolvedAction]:
+        return compile_action(action, self.handlers)
+
+    def ensure_built(self) -> None:
+        if not self._built:
+            self.rebuild()
+
+    async def ensure_built_async(self) -> None:
+        if not self._built:
+            await self.manager.run_io(self.rebuild)
+
+    def rebuild(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._controls.clear()
+            for item in self.manager.list_profiles():
+                profile_id = item["id"]
+                if profile_id in PROFILE_ALIASES:
+                    continue
+                try:
+                    document = self.manager.get_profile(profile_id)
+                except Exception:
+                    logger.warning(f"Skipping unreadable profile {profile_id} in control index")
+                    continue
+                if document:
+                    self._index_controls(profile_id, document.get("controls") or [])
+            self._built = True
+
+    def _index_controls(self, profile_id: str, controls: Any) -> None:
+        known = self._controls.setdefault(profile_id, set())
+        for control in controls:
+            if not isinstance(control, dict) or not control.get("id"):
+                continue
+            key = (profile_id, control["id"])
+            resolved = self.compile_action(control.get("action"))
+            if resolved is None:
+                self._entries.pop(key, None)
+                known.discard(control["id"])
+            else:
+                self._entries[key] = resolved
+                known.add(control["id"])
+
+    def remove_profile(self, profile_id: str) -> None:
+        with self._lock:
+            for control_id in self._controls.pop(profile_id, set()):
+                self._entries.pop((profile_id, control_id), None)
+
+    def resolve(self, profile_id: Any, control_id: Any) -> Optional[ResolvedAction]:
+        if not isinstance(profile_id, str) or not isinstance(control_id, str):
+            return None
+        self.ensure_built()
+        profile_id = PROFILE_ALIASES.get(profile_id, profile_id)
+        return self._entries.get((profile_id, control_id))
+
+    def controls(
+        self, profile_id: str, action: Optional[str] = None
+    ) -> List[Tuple[str, ResolvedAction]]:
+        """``(controlId, ResolvedAction)`` pairs of a profile, optionally of one action."""
+        self.ensure_built()
+        profile_id = PROFILE_ALIASES.get(profile_id, profile_id)
+        with self._lock:
+            return [
+                (control_id, self._entries[(profile_id, control_id)])
+                for control_id in sorted(self._controls.get(profile_id, ()))
+                if action is None or self._entries[(profile_id, control_id)].action == action
+            ]
+
+    def on_profile_event(self, event: Dict[str, Any]) -> None:
+        """Apply a profile change event (see app.utils.profile_events)."""
+        profile_id = event.get("profileId")
+        if not isinstance(profile_id, str):
+            return
+        with self._lock:
+            if not self._built:
+                # The initial build reads the current state anyway
+                return
+            if event.get("type") == MESSAGE_TYPE_PROFILE_DELETED:
+                self.remove_profile(profile_id)
+                return
+            if event.get("type") != MESSAGE_TYPE_PROFILE_CHANGED:
+                return
+            diff = event.get("diff") or {}
+            known = self._controls.setdefault(profile_id, set())
+            for control_id in diff.get("removed", []):
+                self._entries.pop((profile_id, control_id), None)
+                known.discard(control_id)
+            self._index_controls(profile_id, diff.get("upserted", []))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "built": self._built,
+            "profiles": len(self._controls),
+            "controls": len(self._entries),
+        }
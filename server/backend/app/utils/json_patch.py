@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, List, Sequence, Tuple
+
+
+class JsonPatchError(ValueError):
+    """Raised when a JSON Patch (RFC 6902) operation cannot be applied."""
+
+
+def parse_pointer(pointer: Any) -> List[str]:
+    """Split an RFC 6901 JSON Pointer into unescaped reference tokens."""
+    if not isinstance(pointer, str):
+        raise JsonPatchError("path must be a string")
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _index(container: List[Any], token: str, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise JsonPatchError(f"invalid array index: {token!r}")
+    index = int(token)
+    limit = len(container) if allow_end else len(container) - 1
+    if index > limit:
+        raise JsonPatchError(f"array index out of range: {index}")
+    return index
+
+
+def _resolve_parent(document: Any, tokens: Sequence[str]) -> Tuple[Any, str]:
+    target = document
+    for token in tokens[:-1]:
+        target = _get_child(target, token)
+    return target, tokens[-1]
+
+
+def _get_child(container: Any, token: str) -> Any:
+    if isinstance(container, dict):
+        if token not in container:
+            raise JsonPatchError(f"path not found: {token!r}")
+        return container[token]
+    if isinstance(container, list):
+        return container[_index(container, token)]
+    raise JsonPatchError(f"cannot traverse into {type(container).__name__}")
+
+
+def _get(document: Any, tokens: Sequence[str]) -> Any:
+    target = document
+    for token in tokens:
+        target = _get_child(target, token)
+    return target
+
+
+def _add(document: Any, tokens: Sequence[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    parent, key = _resolve_parent(document, tokens)
+    if isinstance(parent, dict):
+        parent[key] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, key, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"cannot add to {type(parent).__name__}")
+    return document
+
+
+def _remove(document: Any, tokens: Sequence[str]) -> Tuple[Any, Any]:
+    if not tokens:
+        raise JsonPatchError("cannot remove the document root")
+    parent, key = _resolve_parent(document, tokens)
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise JsonPatchError(f"path not found: {key!r}")
+        return document, parent.pop(key)
+    if isinstance(parent, list):
+        return document, parent.pop(_index(parent, key))
+    raise JsonPatchError(f"cannot remove from {type(parent).__name__}")
+
+
+def apply_operation(document: Any, operation: Dict[str, Any]) -> Any:
+    """Apply a single operation in place and return the (possibly new) document root."""
+    if not isinstance(operation, dict):
+        raise JsonPatchError("operation must be an object")
+    op = operation.get("op")
+    tokens = parse_pointer(operation.get("path"))
+
+    if op in {"add", "replace", "test"} and "value" not in operation:
+        raise JsonPatchError(f"'{op}' operation requires a value")
+
+    if op == "add":
+        return _add(document, tokens, operation["value"])
+    if op == "remove":
+        return _remove(document, tokens)[0]
+    if op == "replace":
+        if not tokens:
+            return operation["value"]
+        _get(document, tokens)
+        parent, key = _resolve_parent(document, tokens)
+        parent[_index(parent, key) if isinstance(parent, list) else key] = operation["value"]
+        return document
+    if op in {"move", "copy"}:
+        source = parse_pointer(operation.get("from"))
+        if op == "move":
+            if tokens[: len(source)] == source and tokens != source:
+                raise JsonPatchError("cannot move a value into one of its children")
+            document, value = _remove(document, source)
+        else:
+            value = copy.deepcopy(_get(document, source))
+        return _add(document, tokens, value)
+    if op == "test":
+        if _get(document, tokens) != operation["value"]:
+            raise JsonPatchError(f"test failed at {operation.get('path')!r}")
+        return document
+    raise JsonPatchError(f"unsupported operation: {op!r}")
+
+
+def apply_patch(document: Any, operations: Sequence[Dict[str, Any]]) -> Any:
+    """Apply RFC 6902 operations in place. Callers should discard ``document`` on error."""
+    if not isinstance(operations, (list, tuple)):
+        raise JsonPatchError("patch must be a list of operations")
+    for operation in operations:
+        document = apply_operation(document, operation)
+    return document
@@ -40,3 +40,8 @@ def setup_logger(settings: Optional[Settings] = None) -> None:
         diagnose=False,
         format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {message}",
     )
+
+
+def get_logger(name: str):
+    """Return the shared Loguru logger bound to a module name."""
+    return logger.bind(name=name)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .control_index import ResolvedAction, compile_action
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# server/config, shipped with the backend (mappings.json and mappings/*.json)
+BUNDLED_CONFIG_DIR = Path(__file__).resolve().parents[3] / "config"
+
+# (path, mtime_ns, size) of every mapping file, used to detect changes
+_Signature = Tuple[Tuple[str, int, int], ...]
+
+
+def mapping_files(config_dirs: Sequence[Path]) -> List[Path]:
+    """Mapping files in load order; later files override earlier mapping ids.
+
+    Per config dir: ``mappings/default.json``, the other ``mappings/*.json`` by name,
+    then ``mappings.json``. Later config dirs override earlier ones.
+    """
+    files: List[Path] = []
+    for config_dir in config_dirs:
+        directory = config_dir / "mappings"
+        if directory.is_dir():
+            default = directory / "default.json"
+            if default.is_file():
+                files.append(default)
+            files += sorted(p for p in directory.glob("*.json") if p.name != "default.json")
+        legacy = config_dir / "mappings.json"
+        if legacy.is_file():
+            files.append(legacy)
+    return files
+
+
+class MappingTable:
+    """Immutable mapping id -> ResolvedAction dispatch table."""
+
+    def __init__(
+        self,
+        entries: Mapping[str, ResolvedAction],
+        sources: Sequence[str] = (),
+        generation: int = 0,
+    ):
+        self.entries = MappingProxyType(dict(entries))
+        self.sources = tuple(sources)
+        self.generation = generation
+        self.loaded_at = time.time()
+
+    def resolve(self, mapping_id: Any) -> Optional[ResolvedAction]:
+        return self.entries.get(mapping_id) if isinstance(mapping_id, str) else None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class MappingLoader:
+    """Compiles the mapping files into a MappingTable and hot-swaps it on change.
+
+    - every entry is validated and bound to its handler at load time, so resolving a
+      mapping id is a single dict lookup
+    - a daemon thread polls the files' mtime/size; a changed set is recompiled and
+      published with one attribute assignment, so readers see either the old or the
+      new table, never a mix
+    - a file that fails to parse keeps the previous table in place
+    """
+
+    def __init__(
+        self,
+        config_dirs: Sequence[Path],
+        handlers: Mapping[str, Callable[[Any], Dict[str, Any]]],
+        poll_interval: float = 1.0,
+    ):
+        self.config_dirs = list(dict.fromkeys(config_dirs))
+        self.handlers = handlers
+        self.poll_interval = poll_interval
+        self.table = MappingTable({})
+        self._signature: Optional[_Signature] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _current_signature(self) -> Tuple[List[Path], _Signature]:
+        files = mapping_files(self.config_dirs)
+        signature = []
+        for file in files:
+            try:
+                stat = file.stat()
+            except OSError:
+                continue
+            signature.append((str(file), stat.st_mtime_ns, stat.st_size))
+        return files, tuple(signature)
+
+    def reload(self, force: bool = False) -> bool:
+        """Recompile when the files changed (or ``force``); True if a new table was published."""
+        with self._lock:
+            files, signature = self._current_signature()
+            if not force and signature == self._signature:
+                return False
+            entries: Dict[str, ResolvedAction] = {}
+            for file in files:
+                try:
+                    data = json.loads(file.read_text(encoding="utf-8"))
+                except (OSError, ValueError) as exc:
+                    logger.error(f"Keeping previous mappings, failed to load {file}: {exc}")
+                    return False
+                if not isinstance(data, dict):
+                    logger.error(f"Keeping previous mappings, {file} is not an object")
+                    return False
+                for mapping_id, action in data.items():
+                    resolved = compile_action(action, self.handlers)
+                    if resolved is None:
+                        logger.warning(
+                            f"Skipping mapping {mapping_id!r} in {file.name}: unknown action"
+                        )
+                        entries.pop(mapping_id, None)
+                        continue
+                    entries[mapping_id] = resolved
+            self._signature = signature
+            self.table = MappingTable(
+                entries, [str(file) for file in files], self.table.generation + 1
+            )
+            logger.info(f"Loaded {len(entries)} action mappings from {len(files)} files")
+            return True
+
+    def resolve(self, mapping_id: Any) -> Optional[ResolvedAction]:
+        return self.table.resolve(mapping_id)
+
+    @property
+    def started(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        """Load the mappings and start watching the files (idempotent)."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._watch, name="mapping-watcher", daemon=True)
+        self.reload()
+        if self.poll_interval > 0:
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception:
+                logger.exception("Mapping reload failed")
+
+    def stats(self) -> Dict[str, Any]:
+        table = self.table
+        return {
+            "mappings": len(table),
+            "generation": table.generation,
+            "sources": list(table.sources),
+            "loadedAt": table.loaded_at,
+        }
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import copy
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from ..constants import MESSAGE_TYPE_PROFILE_CHANGED, MESSAGE_TYPE_PROFILE_DELETED
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+ProfileListener = Callable[[Dict[str, Any]], None]
+
+
+def diff_profiles(previous: Optional[Dict], current: Dict) -> Dict[str, Any]:
+    """Compute a control-level diff that turns ``previous`` into ``current``.
+
+    The diff is keyed by control id:
+    - ``profile``: changed top-level fields (except controls/version)
+    - ``upserted``: full controls that are new or changed
+    - ``removed``: ids of controls that no longer exist
+    - ``order``: final control id order, only when it can't be inferred
+    """
+    previous = previous or {}
+    header = {
+        key: value
+        for key, value in current.items()
+        if key not in {"controls", "version"} and previous.get(key) != value
+    }
+    old_controls = {control.get("id"): control for control in previous.get("controls") or []}
+    new_ids: List[Any] = []
+    upserted: List[Dict] = []
+    for control in current.get("controls") or []:
+        new_ids.append(control.get("id"))
+        if old_controls.get(control.get("id")) != control:
+            upserted.append(control)
+    new_set = set(new_ids)
+    removed = [control_id for control_id in old_controls if control_id not in new_set]
+
+    diff: Dict[str, Any] = {}
+    if header:
+        diff["profile"] = header
+    if upserted:
+        diff["upserted"] = upserted
+    if removed:
+        diff["removed"] = removed
+    # Applying the diff keeps surviving controls in place and appends new ones
+    implied = [cid for cid in old_controls if cid in new_set]
+    implied += [cid for cid in new_ids if cid not in old_controls]
+    if implied != new_ids:
+        diff["order"] = new_ids
+    return diff
+
+
+def apply_profile_diff(document: Dict, diff: Dict[str, Any], version: Optional[int] = None) -> Dict:
+    """Apply a diff from :func:`diff_profiles` (reference for client implementations)."""
+    result = copy.deepcopy(document)
+    result.update(diff.get("profile", {}))
+    removed = set(diff.get("removed", []))
+    controls = [
+        control for control in result.get("controls", []) if control.get("id") not in removed
+    ]
+    positions = {control.get("id"): index for index, control in enumerate(controls)}
+    for control in diff.get("upserted", []):
+        index = positions.get(control.get("id"))
+        if index is None:
+            positions[control.get("id")] = len(controls)
+            controls.append(control)
+        else:
+            controls[index] = control
+    if "order" in diff:
+        by_id = {control.get("id"): control for control in controls}
+        controls = [by_id[control_id] for control_id in diff["order"]]
+    result["controls"] = controls
+    if version is not None:
+        result["version"] = version
+    return result
+
+
+class ProfileEvents:
+    """Fan-out of profile change events to registered listeners.
+
+    Listeners are keyed so a reloaded module replaces its previous registration.
+    They may be called from any thread and must not block.
+    """
+
+    def __init__(self) -> None:
+        self._listeners: Dict[str, ProfileListener] = {}
+        self._lock = threading.Lock()
+
+    def add_listener(self, key: str, listener: ProfileListener) -> None:
+        with self._lock:
+            self._listeners[key] = listener
+
+    def remove_listener(self, key: str) -> None:
+        with self._lock:
+            self._listeners.pop(key, None)
+
+    def has_listeners(self) -> bool:
+        return bool(self._listeners)
+
+    def publish_saved(self, profile_id: str, previous: Optional[Dict], current: Dict) -> None:
+        if not self._listeners:
+            return
+        self._emit(
+            {
+                "type": MESSAGE_TYPE_PROFILE_CHANGED,
+                "profileId": profile_id,
+                "version": current.get("version"),
+                "previousVersion": previous.get("version") if previous else None,
+                "diff": diff_profiles(previous, current),
+            }
+        )
+
+    def publish_deleted(self, profile_id: str, previous: Optional[Dict]) -> None:
+        if not self._listeners:
+            return
+        self._emit(
+            {
+                "type": MESSAGE_TYPE_PROFILE_DELETED,
+                "profileId": profile_id,
+                "previousVersion": previous.get("version") if previous else None,
+            }
+        )
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            listeners = list(self._listeners.values())
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception(f"Profile listener failed for {event.get('profileId')}")
+
+
+_singleton: Optional[ProfileEvents] = None
+
+
+def get_profile_events() -> ProfileEvents:
+    global _singleton
+    if _singleton is None:
+        _singleton = ProfileEvents()
+    return _singleton
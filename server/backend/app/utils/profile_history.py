@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .logger import get_logger
+from .profile_writer import write_atomic
+
+logger = get_logger(__name__)
+
+# (header blob hash, {control id: control blob hash} in control order)
+_State = Tuple[str, Dict[str, str]]
+# (profile id, {blob hash: content} to store, log entry to append)
+_Job = Tuple[str, Dict[str, str], Dict[str, Any]]
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+class ProfileHistory:
+    """Content-addressed version history for profiles.
+
+    - the profile header (everything but controls/version) and every control are
+      stored as blobs named by the SHA-256 of their canonical JSON, so identical
+      content is stored once
+    - each profile has an append-only log (``logs/<id>.jsonl``); an entry only
+      references the blobs that changed since the previous version, so storage
+      grows with the size of the changes rather than the number of saves
+    - the oldest kept entry is a full base; pruning folds dropped entries into it and
+      a background sweep deletes blobs no log references anymore
+    - ``record`` only diffs against the in-memory head; blobs and log entries are
+      written by a background thread, so saves don't wait for the history disk I/O
+    """
+
+    def __init__(
+        self, root: Path, keep: int = 50, max_age: float = 0.0, gc_interval: float = 300.0
+    ):
+        self.root = root
+        self.blobs_dir = root / "blobs"
+        self.logs_dir = root / "logs"
+        self.keep = max(1, keep)
+        self.max_age = max_age
+        self.gc_interval = gc_interval
+        # Guards the in-memory heads and counters
+        self._lock = threading.RLock()
+        # Held while touching blobs and logs so writes, prunes and sweeps serialize
+        self._io_lock = threading.RLock()
+        self._cond = threading.Condition()
+        self._queue: Deque[_Job] = deque()
+        self._busy = False
+        self._writer: Optional[threading.Thread] = None
+        self._heads: Dict[str, _State] = {}
+        # Per profile: (entry count, savedAt of the oldest entry)
+        self._meta: Dict[str, Tuple[int, float]] = {}
+        self._gc_thread: Optional[threading.Thread] = None
+        self._last_gc = 0.0
+        self.logs_dir.mkdir(parents=True, exist_ok=True)
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+
+    def _log_path(self, profile_id: str) -> Path:
+        return self.logs_dir / f"{profile_id}.jsonl"
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blobs_dir / digest[:2] / digest[2:]
+
+    def _put(self, digest: str, content: str) -> None:
+        path = self._blob_path(digest)
+        if path.exists():
+            # Refresh the mtime so a concurrent sweep won't collect a blob we reuse
+            with suppress(OSError):
+                os.utime(path)
+        else:
+            write_atomic(path, content, durable=False)
+
+    def _get(self, digest: str) -> Any:
+        return json.loads(self._blob_path(digest).read_text(encoding="utf-8"))
+
+    def _entries(self, profile_id: str) -> List[Dict[str, Any]]:
+        path = self._log_path(profile_id)
+        if not path.exists():
+            return []
+        entries = []
+        for line in path.read_text(encoding="utf-8").splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn last line after a crash; everything before it is intact
+                logger.warning(f"Skipping corrupt history entry for {profile_id}")
+        return entries
+
+    @staticmethod
+    def _replay(entries: List[Dict[str, Any]]) -> Optional[_State]:
+        header: Optional[str] = None
+        controls: Dict[str, str] = {}
+        for entry in entries:
+            if entry.get("base"):
+                controls = {}
+            header = entry.get("header", header)
+            for control_id in entry.get("removed", []):
+                controls.pop(control_id, None)
+            controls.update(entry.get("upserted", {}))
+            if "order" in entry:
+                # Ids the log never stored (a hand-edited or damaged log) are skipped
+                controls = {
+                    control_id: controls[control_id]
+                    for control_id in entry["order"]
+                    if control_id in controls
+                }
+        return (header, controls) if header is not None else None
+
+    def _head(self, profile_id: str) -> Optional[_State]:
+        if profile_id not in self._heads:
+            entries = self._entries(profile_id)
+            state = self._replay(entries)
+            if state is None:
+                return None
+            self._heads[profile_id] = state
+            self._meta[profile_id] = (len(entries), entries[0].get("savedAt", 0.0))
+        return self._heads[profile_id]
+
+    def record(self, profile_id: str, document: Dict[str, Any]) -> None:
+        """Queue ``document`` (a saved profile with its new version) for the log."""
+        header_content = _canonical(
+            {k: v for k, v in document.items() if k not in {"controls", "version"}}
+        )
+        control_contents = [
+            (control.get("id"), _canonical(control)) for control in document.get("controls") or []
+        ]
+        with self._lock:
+            head = self._head(profile_id)
+            entry: Dict[str, Any] = {"version": document.get("version"), "savedAt": time.time()}
+            blobs: Dict[str, str] = {}
+            previous_header, previous = head if head else (None, {})
+            header = hashlib.sha256(header_content.encode("utf-8")).hexdigest()
+            if head is None:
+                entry["base"] = True
+            if header != previous_header:
+                entry["header"] = header
+                blobs[header] = header_content
+
+            controls: Dict[str, str] = {}
+            upserted: Dict[str, str] = {}
+            for control_id, content in control_contents:
+                digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+                controls[control_id] = digest
+                if previous.get(control_id) != digest:
+                    upserted[control_id] = digest
+                    blobs[digest] = content
+            if upserted:
+                entry["upserted"] = upserted
+            removed = [control_id for control_id in previous if control_id not in controls]
+            if removed:
+                entry["removed"] = removed
+            # Replay keeps surviving controls in place and appends new ones
+            implied = [control_id for control_id in previous if control_id in controls]
+            implied += [control_id for control_id in controls if control_id not in previous]
+            if implied != list(controls):
+                entry["order"] = list(controls)
+
+            self._heads[profile_id] = (header, controls)
+            self._enqueue((profile_id, blobs, entry))
+
+    def _enqueue(self, job: _Job) -> None:
+        with self._cond:
+            self._queue.append(job)
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._run_writer, name="profile-history-writer", daemon=True
+                )
+                self._writer.start()
+            self._cond.notify_all()
+
+    def _run_writer(self) -> None:
+        while True:
+            with self._io_lock:
+                with self._cond:
+                    if not self._queue:
+                        self._writer = None
+                        self._cond.notify_all()
+                        return
+                    profile_id, blobs, entry = self._queue.popleft()
+                    self._busy = True
+                try:
+                    self._append(profile_id, blobs, entry)
+                except Exception:
+                    logger.exception(f"Failed to record history for {profile_id}")
+                    with self._lock, self._cond:
+                        # Later queued entries are deltas on the lost one: drop them and
+                        # let the next save start over from what the log really holds
+                        self._heads.pop(profile_id, None)
+                        self._meta.pop(profile_id, None)
+                        self._queue = deque(job for job in self._queue if job[0] != profile_id)
+                finally:
+                    with self._cond:
+                        self._busy = False
+                        self._cond.notify_all()
+
+    def _append(self, profile_id: str, blobs: Dict[str, str], entry: Dict[str, Any]) -> None:
+        # Blobs first, so a log entry never references content that isn't on disk
+        for digest, content in blobs.items():
+            self._put(digest, content)
+        with self._log_path(profile_id).open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        with self._lock:
+            count, oldest = self._meta.get(profile_id, (0, entry["savedAt"]))
+            self._meta[profile_id] = (count + 1, oldest)
+        if self._needs_prune(count + 1, oldest):
+            self.prune(profile_id)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued version is in the log; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _needs_prune(self, count: int, oldest: float) -> bool:
+        # Some slack so the log isn't rewritten on every save once it is full
+        if count > self.keep + max(1, self.keep // 4):
+            return True
+        return bool(self.max_age) and count > 1 and oldest < time.time() - self.max_age
+
+    def _flushed_entries(self, profile_id: str) -> List[Dict[str, Any]]:
+        self.flush()
+        return self._entries(profile_id)
+
+    def versions(self, profile_id: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "version": entry.get("version"),
+                "savedAt": entry.get("savedAt"),
+                "changedControls": len(entry.get("upserted", {})),
+                "removedControls": len(entry.get("removed", [])),
+            }
+            for entry in self._flushed_entries(profile_id)
+        ]
+
+    def get(self, profile_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """Rebuild the profile as it was saved at ``version`` (None if not retained)."""
+        entries = self._flushed_entries(profile_id)
+        for index, entry in enumerate(entries):
+            if entry.get("version") == version:
+                state = self._replay(entries[: index + 1])
+                break
+        else:
+            return None
+        if state is None:
+            return None
+        header, controls = state
+        return {
+            **self._get(header),
+            "version": version,
+            "controls": [self._get(digest) for digest in controls.values()],
+        }
+
+    def prune(self, profile_id: str) -> int:
+        """Apply the retention policy to one profile; returns the number of dropped versions."""
+        with self._io_lock:
+            entries = self._entries(profile_id)
+            start = max(0, len(entries) - self.keep)
+            if self.max_age:
+                cutoff = time.time() - self.max_age
+                while start < len(entries) - 1 and entries[start].get("savedAt", 0.0) < cutoff:
+                    start += 1
+            if start == 0:
+                return 0
+            header, controls = self._replay(entries[: start + 1]) or (None, {})
+            saved_at = float(entries[start].get("savedAt") or 0.0)
+            base: Dict[str, Any] = {
+                "version": entries[start].get("version"),
+                "savedAt": saved_at,
+                "base": True,
+                "header": header,
+                "upserted": controls,
+            }
+            kept = [base] + entries[start + 1 :]
+            write_atomic(
+                self._log_path(profile_id),
+                "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in kept),
+            )
+            with self._lock:
+                self._meta[profile_id] = (len(kept), saved_at)
+        self._schedule_gc()
+        return start
+
+    def forget(self, profile_id: str) -> None:
+        """Drop a profile's history (its blobs are collected by the next sweep)."""
+        with self._io_lock:
+            with self._lock, self._cond:
+                self._heads.pop(profile_id, None)
+                self._meta.pop(profile_id, None)
+                self._queue = deque(job for job in self._queue if job[0] != profile_id)
+            with suppress(FileNotFoundError):
+                self._log_path(profile_id).unlink()
+        self._schedule_gc()
+
+    def _schedule_gc(self) -> None:
+        with self._lock:
+            if self._gc_thread is not None or time.monotonic() - self._last_gc < self.gc_interval:
+                return
+            self._last_gc = time.monotonic()
+            self._gc_thread = threading.Thread(
+                target=self._run_gc, name="profile-history-gc", daemon=True
+            )
+            self._gc_thread.start()
+
+    def _run_gc(self) -> None:
+        try:
+            self.collect_garbage()
+        except Exception:
+            logger.exception("Profile history garbage collection failed")
+        finally:
+            with self._lock:
+                self._gc_thread = None
+
+    def collect_garbage(self) -> int:
+        """Delete blobs that no version log references; returns the number removed."""
+        self.flush()
+        started = time.time()
+        referenced = set()
+        for log in self.logs_dir.glob("*.jsonl"):
+            for entry in self._entries(log.stem):
+                if "header" in entry:
+                    referenced.add(entry["header"])
+                referenced.update(entry.get("upserted", {}).values())
+
+        removed = 0
+        for blob in self.blobs_dir.glob("*/*"):
+            if blob.name.startswith("."):
+                continue
+            if blob.parent.name + blob.name in referenced:
+                continue
+            with self._io_lock:
+                # Blobs written or reused after the mark phase started are kept
+                with suppress(FileNotFoundError):
+                    if blob.stat().st_mtime < started:
+                        blob.unlink()
+                        removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "profiles": len(list(self.logs_dir.glob("*.jsonl"))),
+            "keep": self.keep,
+            "maxAge": self.max_age,
+        }
+
+
+# One history per directory so every manager shares its locks and caches
+_histories: Dict[Path, ProfileHistory] = {}
+_histories_lock = threading.Lock()
+
+
+def get_profile_history(root: Path, keep: int = 50, max_age: float = 0.0) -> ProfileHistory:
+    key = root.resolve()
+    with _histories_lock:
+        history = _histories.get(key)
+        if history is None:
+            history = ProfileHistory(root, keep, max_age)
+            _histories[key] = history
+        return history
+
+
+@atexit.register
+def _flush_all_histories() -> None:
+    for history in list(_histories.values()):
+        history.flush(timeout=5.0)
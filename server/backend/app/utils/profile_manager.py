@@ -1,12 +1,24 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import copy
+import functools
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
 
 from pydantic import BaseModel, Field
 
 from ..config import Settings, get_settings
+from ..exceptions import ProfileNotFoundError, ProfileVersionConflictError
+from .json_patch import JsonPatchError, apply_operation, parse_pointer
+from .profile_events import get_profile_events
+from .profile_history import ProfileHistory, get_profile_history
+from .profile_validation import ProfileValidationError, check_grid, get_profile_validator
+from .profile_store import METADATA_FIELDS, METADATA_SORT_KEYS, get_profile_store
 
 
 class Control(BaseModel):
@@ -14,6 +26,8 @@ class Control(BaseModel):
     type: str
     row: int
     col: int
+    rowSpan: int = Field(default=1, ge=1)
+    colSpan: int = Field(default=1, ge=1)
     label: Optional[str] = None
     colorHex: Optional[str] = None
     action: Optional[Dict] = None
@@ -25,68 +39,386 @@ class Profile(BaseModel):
     rows: int
     cols: int
     version: int = 1
+    checksum: Optional[str] = None
     controls: List[Control] = Field(default_factory=list)
 
 
+T = TypeVar("T")
+
+# Paginated listing (GET /profiles/?limit=...)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _cursor_value_ok(key: str, value: Any) -> bool:
+    """Whether a decoded cursor value has the type of the ``key`` sort field."""
+    if key in {"id", "name"}:
+        return isinstance(value, str)
+    if key == "controlCount":
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# Dedicated pool so profile disk I/O never runs on (or starves) the event loop
+_io_executor: Optional[ThreadPoolExecutor] = None
+_io_executor_lock = threading.Lock()
+
+
+def _get_io_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _io_executor
+    with _io_executor_lock:
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(
+                max_workers=max(1, max_workers), thread_name_prefix="profile-io"
+            )
+        return _io_executor
+
+
+# Simple alias mapping to keep backward compatibility with legacy profile IDs
+PROFILE_ALIASES = {
+    "audio": "profile_default_mixer",
+    "streaming": "profile_default_streaming",
+    "macros": "profile_default_user",
+}
+
+
 class ProfileManager:
     def __init__(self, settings: Optional[Settings] = None):
         self.settings = settings or get_settings()
-        self.settings.profiles_dir.mkdir(parents=True, exist_ok=True)
-        # Simple alias mapping to keep backward compatibility with legacy profile IDs
-        self.aliases = {
-            "audio": "profile_default_mixer",
-            "streaming": "profile_default_streaming",
-            "macros": "profile_default_user",
-        }
+        self.store = get_profile_store(self.settings)
+        self.aliases = dict(PROFILE_ALIASES)
+        self.events = get_profile_events()
+        self.validator = get_profile_validator(self.settings.config_dir)
+        self.history: Optional[ProfileHistory] = None
+        if self.settings.profile_history_keep > 0:
+            self.history = get_profile_history(
+                self.settings.history_dir,
+                keep=self.settings.profile_history_keep,
+                max_age=self.settings.profile_history_max_age_days * 86400,
+            )
+
+    def _read(self, profile_id: str) -> Optional[Dict]:
+        return self.store.read(profile_id)
+
+    def _read_quiet(self, profile_id: str) -> Optional[Dict]:
+        try:
+            return self._read(profile_id)
+        except Exception:
+            return None
+
+    def profile_ids(self) -> List[str]:
+        """Ids of every stored profile, sorted (aliases excluded)."""
+        return self.store.ids()
+
+    def iter_profiles(self) -> Iterator[Tuple[str, Dict]]:
+        """Yield ``(id, document)`` one profile at a time, skipping unreadable ones."""
+        for profile_id in self.profile_ids():
+            document = self._read_quiet(profile_id)
+            if document is not None:
+                yield profile_id, document
 
     def list_profiles(self) -> List[Dict]:
-        profiles = []
-        for file in self.settings.profiles_dir.glob("*.json"):
-            try:
-                data = json.loads(file.read_text(encoding="utf-8"))
-                profiles.append({"id": data.get("id", file.stem), "name": data.get("name", file.stem)})
-            except Exception:
-                continue
+        profiles = self.store.summaries()
+        ids = {profile["id"] for profile in profiles}
 
-        # Inject legacy aliases when target files exist (so UI tabs match expected labels)
+        # Inject legacy aliases when target profiles exist (so UI tabs match expected labels)
         for alias, target in self.aliases.items():
-            target_file = self.settings.profiles_dir / f"{target}.json"
-            if not target_file.exists():
+            if target not in ids or alias in ids:
                 continue
-            if any(p["id"] == alias for p in profiles):
+            data = self._read_quiet(target)
+            if data is None:
                 continue
+            profiles.append({"id": alias, "name": data.get("name", alias)})
+        return profiles
+
+    def query_profiles(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        sort: str = "id",
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """One page of profile metadata from the store's metadata index.
+
+        ``sort`` is one of METADATA_SORT_KEYS, prefixed with ``-`` for descending order.
+        ``fields`` projects each item onto METADATA_FIELDS (``id`` is always included).
+        Pages are keyset-based: ``nextCursor`` resumes after the last item, so inserts
+        and deletes between requests never repeat or skip surviving profiles.
+        Legacy aliases are not listed.
+
+        Raises:
+            ValueError: On an unknown sort key or field, or a malformed cursor
+        """
+        descending = sort.startswith("-")
+        key = sort[1:] if descending else sort
+        if key not in METADATA_SORT_KEYS:
+            raise ValueError(f"sort must be one of {list(METADATA_SORT_KEYS)}")
+        fields = list(fields or METADATA_FIELDS)
+        unknown = [field for field in fields if field not in METADATA_FIELDS]
+        if unknown:
+            raise ValueError(f"unknown fields: {unknown}")
+        if "id" not in fields:
+            fields.insert(0, "id")
+        limit = min(max(1, limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+
+        after = None
+        if cursor:
             try:
-                data = json.loads(target_file.read_text(encoding="utf-8"))
-                profiles.append({"id": alias, "name": data.get("name", alias)})
+                decoded = base64.urlsafe_b64decode(cursor.encode("ascii"))
+                cursor_sort, value, last_id = json.loads(decoded)
             except Exception:
-                continue
-        return profiles
+                raise ValueError("invalid cursor")
+            if cursor_sort != sort:
+                raise ValueError("cursor does not match sort")
+            if not _cursor_value_ok(key, value) or not isinstance(last_id, str):
+                raise ValueError("invalid cursor")
+            after = (value, last_id)
+
+        items = self.store.query_metadata(key, descending, after, limit + 1)
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = base64.urlsafe_b64encode(
+                json.dumps([sort, last[key], last["id"]]).encode("utf-8")
+            ).decode("ascii")
+        return {
+            "profiles": [{field: item[field] for field in fields} for item in items],
+            "nextCursor": next_cursor,
+        }
+
+    def find_profiles_by_action(self, kind: str) -> List[str]:
+        """Ids of profiles whose controls use the ``kind`` action (e.g. "obs")."""
+        return self.store.find_by_action(kind)
 
     def get_profile(self, profile_id: str) -> Optional[Dict]:
-        file = self.settings.profiles_dir / f"{profile_id}.json"
-        if not file.exists():
+        data = self._read(profile_id)
+        if data is None:
             alias = self.aliases.get(profile_id)
             if alias:
-                aliased_file = self.settings.profiles_dir / f"{alias}.json"
-                if aliased_file.exists():
-                    return json.loads(aliased_file.read_text(encoding="utf-8"))
-            return None
-        return json.loads(file.read_text(encoding="utf-8"))
+                return self._read(alias)
+        return data
 
     def save_profile(self, profile_id: str, payload: Dict) -> Profile:
+        """Validate and store a profile.
+
+        Overwriting an existing profile bumps its version. With the JSON store this
+        returns as soon as the save is queued; call ``flush()`` to wait for the disk.
+        """
+        self.validator.validate(payload)
         profile = Profile(**payload)
         if profile.id != profile_id:
             raise ValueError("id mismatch")
-        file = self.settings.profiles_dir / f"{profile_id}.json"
-        file.write_text(profile.model_dump_json(indent=2), encoding="utf-8")
+        with self.store.update_lock:
+            previous = self._read_quiet(profile_id)
+            if previous is not None:
+                profile.version = previous.get("version", 1) + 1
+            document = profile.model_dump()
+            self.store.write(profile_id, document)
+            if self.history is not None:
+                self.history.record(profile_id, document)
+        self.events.publish_saved(profile_id, previous, document)
         return profile
 
+    def patch_profile(
+        self, profile_id: str, version: int, operations: List[Dict[str, Any]]
+    ) -> Dict:
+        """Apply RFC 6902 operations to a stored profile with optimistic concurrency.
+
+        ``version`` must match the stored version; the patched profile gets version + 1.
+        Only the controls touched by the patch are re-validated.
+
+        Raises:
+            ProfileNotFoundError: If the profile does not exist
+            ProfileVersionConflictError: If ``version`` is stale
+            ValueError: If the patch cannot be applied or produces an invalid profile
+        """
+        with self.store.update_lock:
+            previous = self._read(profile_id)
+            if previous is None:
+                raise ProfileNotFoundError(profile_id)
+            current = previous.get("version", 1)
+            if version != current:
+                raise ProfileVersionConflictError(profile_id, current)
+            # The previous document is only kept intact when someone wants the diff
+            working = copy.deepcopy(previous) if self.events.has_listeners() else previous
+            document = self._apply_patch(working, operations)
+            if document.get("id") != profile_id:
+                raise ValueError("id mismatch")
+            document["version"] = current + 1
+            self.store.write(profile_id, document)
+            if self.history is not None:
+                self.history.record(profile_id, document)
+        self.events.publish_saved(profile_id, previous, document)
+        return document
+
+    def _apply_patch(self, document: Dict, operations: List[Dict[str, Any]]) -> Dict:
+        if not isinstance(operations, list):
+            raise JsonPatchError("patch must be a list of operations")
+
+        touched: List[Any] = []
+        full = False
+        header = False
+        for operation in operations:
+            if not isinstance(operation, dict):
+                raise JsonPatchError("operation must be an object")
+            op = operation.get("op")
+            target = parse_pointer(operation.get("path"))
+            source = parse_pointer(operation.get("from")) if op == "move" else None
+            for tokens in (target, source):
+                if tokens and tokens[0] in {"id", "version"}:
+                    raise ValueError(f"'{tokens[0]}' cannot be patched")
+            if op == "test":
+                apply_operation(document, operation)
+                continue
+
+            # A control losing one of its fields by a move is resolved before it shifts
+            if source and source[0] == "controls" and len(source) > 2:
+                touched.append(ProfileManager._control_at(document, source[1]))
+            document = apply_operation(document, operation)
+
+            for tokens in (target, source):
+                if tokens is None:
+                    continue
+                if not tokens or tokens == ["controls"]:
+                    full = True
+                elif tokens[0] != "controls":
+                    header = True
+                elif tokens is target and (len(tokens) > 2 or op != "remove"):
+                    touched.append(ProfileManager._control_at(document, tokens[1]))
+
+        if not isinstance(document, dict) or full:
+            self.validator.validate(document)
+            return Profile.model_validate(document).model_dump()
+
+        errors: List[str] = []
+        if header:
+            errors += self.validator.errors({**document, "controls": []})
+        controls = document["controls"]
+        positions: Dict[int, int] = {}
+        if touched:
+            positions = {id(control): index for index, control in enumerate(controls)}
+        changed: List[int] = []
+        for control in touched:
+            index = positions.get(id(control))
+            if index is None:
+                # Removed again by a later operation
+                continue
+            errors += self.validator.control_errors(control, index)
+            changed.append(index)
+        if errors:
+            raise ProfileValidationError(errors)
+
+        if header:
+            validated = Profile.model_validate({**document, "controls": []})
+            document = {**validated.model_dump(exclude={"controls"}), "controls": controls}
+        for index in changed:
+            controls[index] = Control.model_validate(controls[index]).model_dump()
+        if header or changed:
+            errors = check_grid(document["rows"], document["cols"], controls)
+            if errors:
+                raise ProfileValidationError(errors)
+        return document
+
+    @staticmethod
+    def _control_at(document: Dict, token: str) -> Any:
+        controls = document.get("controls")
+        if not isinstance(controls, list):
+            raise ValueError("controls must be a list")
+        if token == "-":
+            index = len(controls) - 1
+        elif token.isdigit() and (len(token) == 1 or not token.startswith("0")):
+            index = int(token)
+        else:
+            raise JsonPatchError(f"invalid array index: {token!r}")
+        if not 0 <= index < len(controls):
+            raise JsonPatchError(f"array index out of range: {token}")
+        return controls[index]
+
     def delete_profile(self, profile_id: str) -> bool:
-        file = self.settings.profiles_dir / f"{profile_id}.json"
-        if not file.exists():
-            return False
-        try:
-            file.unlink()
-        except Exception:
-            return False
-        return True
+        with self.store.update_lock:
+            previous = self._read_quiet(profile_id)
+            deleted = self.store.delete(profile_id)
+            if deleted and self.history is not None:
+                self.history.forget(profile_id)
+        if deleted:
+            self.events.publish_deleted(profile_id, previous)
+        return deleted
+
+    def list_versions(self, profile_id: str) -> List[Dict[str, Any]]:
+        """Retained versions of a profile, oldest first (empty when history is disabled)."""
+        if self.history is None:
+            return []
+        return self.history.versions(profile_id)
+
+    def get_version(self, profile_id: str, version: int) -> Optional[Dict]:
+        if self.history is None:
+            return None
+        return self.history.get(profile_id, version)
+
+    def rollback_profile(self, profile_id: str, version: int) -> Profile:
+        """Save the content of ``version`` as a new version of the profile.
+
+        Raises:
+            ProfileNotFoundError: If the version is not retained
+        """
+        document = self.get_version(profile_id, version)
+        if document is None:
+            raise ProfileNotFoundError(profile_id)
+        return self.save_profile(profile_id, document)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued save has been written to disk.
+
+        False on timeout or while saves are failing to write (see ``store.write_failures()``).
+        Queued version history entries are waited for as well.
+        """
+        flushed = self.store.flush(timeout)
+        if self.history is not None:
+            flushed = self.history.flush(timeout) and flushed
+        return flushed
+
+    # Async API: same operations, executed on the profile I/O thread pool
+
+    async def run_io(self, func: Callable[..., T], *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        executor = _get_io_executor(self.settings.profile_io_workers)
+        return await loop.run_in_executor(executor, functools.partial(func, *args))
+
+    async def list_profiles_async(self) -> List[Dict]:
+        return await self.run_io(self.list_profiles)
+
+    async def query_profiles_async(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        sort: str = "id",
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        return await self.run_io(self.query_profiles, limit, cursor, sort, fields)
+
+    async def get_profile_async(self, profile_id: str) -> Optional[Dict]:
+        return await self.run_io(self.get_profile, profile_id)
+
+    async def save_profile_async(self, profile_id: str, payload: Dict) -> Profile:
+        return await self.run_io(self.save_profile, profile_id, payload)
+
+    async def patch_profile_async(
+        self, profile_id: str, version: int, operations: List[Dict[str, Any]]
+    ) -> Dict:
+        return await self.run_io(self.patch_profile, profile_id, version, operations)
+
+    async def delete_profile_async(self, profile_id: str) -> bool:
+        return await self.run_io(self.delete_profile, profile_id)
+
+    async def list_versions_async(self, profile_id: str) -> List[Dict[str, Any]]:
+        return await self.run_io(self.list_versions, profile_id)
+
+    async def get_version_async(self, profile_id: str, version: int) -> Optional[Dict]:
+        return await self.run_io(self.get_version, profile_id, version)
+
+    async def rollback_profile_async(self, profile_id: str, version: int) -> Profile:
+        return await self.run_io(self.rollback_profile, profile_id, version)
+
+    async def flush_async(self, timeout: Optional[float] = None) -> bool:
+        return await self.run_io(self.flush, timeout)
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .logger import get_logger
+from .profile_store import ProfileStore, action_kinds
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    control_count INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS profiles_name ON profiles (name);
+CREATE INDEX IF NOT EXISTS profiles_updated_at ON profiles (updated_at);
+CREATE TABLE IF NOT EXISTS profile_actions (
+    kind TEXT NOT NULL,
+    profile_id TEXT NOT NULL,
+    PRIMARY KEY (kind, profile_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS profile_actions_profile ON profile_actions (profile_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_MIGRATED_KEY = "json_dir_migrated"
+
+
+class SqliteProfileStore(ProfileStore):
+    """All profiles in one SQLite database (WAL mode).
+
+    - one connection per thread; WAL lets readers run while a write commits
+    - writes are serialized and committed synchronously, so there is no write-behind
+      queue to flush
+    - id, name and updated time are indexed, and action kinds live in their own
+      table so "which profiles use OBS" is an index lookup
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: Path):
+        super().__init__()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit; writes open explicit transactions
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def read(self, profile_id: str) -> Optional[Dict]:
+        row = (
+            self._connection()
+            .execute("SELECT document FROM profiles WHERE id = ?", (profile_id,))
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def ids(self) -> List[str]:
+        return [row[0] for row in self._connection().execute("SELECT id FROM profiles ORDER BY id")]
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        return [
+            {"id": row[0], "name": row[1]}
+            for row in self._connection().execute("SELECT id, name FROM profiles ORDER BY id")
+        ]
+
+    def write(self, profile_id: str, document: Dict) -> None:
+        self.write_many([(profile_id, document)])
+
+    def write_many(self, items: Iterable[tuple], meta: Optional[Dict[str, str]] = None) -> int:
+        """Upsert ``(profile_id, document)`` pairs and set ``meta`` keys in one transaction."""
+        connection = self._connection()
+        count = 0
+        with self._write_lock:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for profile_id, document in items:
+                    self._upsert(connection, profile_id, document)
+                    count += 1
+                for key, value in (meta or {}).items():
+                    connection.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return count
+
+    @staticmethod
+    def _row(profile_id: str, document: Dict) -> tuple:
+        """Column values of a profile; TypeError/ValueError if its header fields are malformed."""
+        return (
+            profile_id,
+            str(document.get("name", profile_id)),
+            int(document.get("version") or 1),
+            int(document.get("rows") or 0),
+            int(document.get("cols") or 0),
+            len(document.get("controls") or []),
+            time.time(),
+            json.dumps(document, separators=(",", ":")),
+        )
+
+    @classmethod
+    def _upsert(cls, connection: sqlite3.Connection, profile_id: str, document: Dict) -> None:
+        connection.execute(
+            "INSERT INTO profiles"
+            " (id, name, version, rows, cols, control_count, updated_at, document)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(id) DO UPDATE SET name = excluded.name, version = excluded.version,"
+            " rows = excluded.rows, cols = excluded.cols, control_count = excluded.control_count,"
+            " updated_at = excluded.updated_at, document = excluded.document",
+            cls._row(profile_id, document),
+        )
+        connection.execute("DELETE FROM profile_actions WHERE profile_id = ?", (profile_id,))
+        connection.executemany(
+            "INSERT INTO profile_actions (kind, profile_id) VALUES (?, ?)",
+            [(kind, profile_id) for kind in sorted(action_kinds(document))],
+        )
+
+    def delete(self, profile_id: str) -> bool:
+        connection = self._connection()
+        with self._write_lock:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = connection.execute(
+                    "DELETE FROM profiles WHERE id = ?", (profile_id,)
+                ).rowcount
+                connection.execute(
+                    "DELETE FROM profile_actions WHERE profile_id = ?", (profile_id,)
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return deleted > 0
+
+    def find_by_action(self, kind: str) -> List[str]:
+        return [
+            row[0]
+            for row in self._connection().execute(
+                "SELECT profile_id FROM profile_actions WHERE kind = ? ORDER BY profile_id",
+                (kind.strip().lower(),),
+            )
+        ]
+
+    # Metadata index columns (see profile_store.METADATA_FIELDS)
+    _COLUMNS = {
+        "id": "id",
+        "name": "name",
+        "updatedAt": "updated_at",
+        "controlCount": "control_count",
+    }
+
+    def metadata(self) -> List[Dict[str, Any]]:
+        return self.query_metadata(limit=-1)
+
+    def query_metadata(
+        self,
+        sort: str = "id",
+        descending: bool = False,
+        after: Optional[Tuple[Any, str]] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        column = self._COLUMNS[sort]
+        direction = "DESC" if descending else "ASC"
+        sql = "SELECT id, name, version, rows, cols, control_count, updated_at FROM profiles"
+        params: List[Any] = []
+        if after is not None:
+            sql += f" WHERE ({column}, id) {'<' if descending else '>'} (?, ?)"
+            params += list(after)
+        sql += f" ORDER BY {column} {direction}, id {direction} LIMIT ?"
+        params.append(limit)
+        return [
+            {
+                "id": row[0],
+                "name": row[1],
+                "version": row[2],
+                "rows": row[3],
+                "cols": row[4],
+                "controlCount": row[5],
+                "updatedAt": row[6],
+            }
+            for row in self._connection().execute(sql, params)
+        ]
+
+    def migrate_json_dir(self, directory: Path) -> int:
+        """Copy ``<id>.json`` profiles into the database, once.
+
+        Runs the first time a database is opened next to a JSON profile directory;
+        the JSON files are left in place as a backup. Returns the number of profiles
+        imported (0 if the migration already ran).
+        """
+        connection = self._connection()
+        if connection.execute("SELECT 1 FROM meta WHERE key = ?", (_MIGRATED_KEY,)).fetchone():
+            return 0
+
+        def documents():
+            for file in sorted(directory.glob("*.json")) if directory.exists() else []:
+                try:
+                    document = json.loads(file.read_text(encoding="utf-8"))
+                except Exception:
+                    logger.warning(f"Skipping unreadable profile {file.name} during migration")
+                    continue
+                if not isinstance(document, dict):
+                    continue
+                try:
+                    self._row(file.stem, document)
+                except (TypeError, ValueError):
+                    logger.warning(f"Skipping malformed profile {file.name} during migration")
+                    continue
+                yield file.stem, document
+
+        # The marker commits with the rows: a crash can't leave a migration that re-runs
+        return self.write_many(documents(), meta={_MIGRATED_KEY: str(time.time())})
+
+    def stats(self) -> Dict[str, Any]:
+        count = self._connection().execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+        return {"backend": self.backend, "profiles": count, "path": str(self.path)}
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..config import Settings
+from .logger import get_logger
+from .profile_writer import get_profile_writer
+
+logger = get_logger(__name__)
+
+PROFILE_STORE_BACKENDS = ("json", "sqlite")
+
+# Fields served by the metadata index (GET /profiles/?fields=...)
+METADATA_FIELDS = ("id", "name", "version", "rows", "cols", "controlCount", "updatedAt")
+# Fields the listing can be sorted by; ties are broken by id
+METADATA_SORT_KEYS = ("id", "name", "updatedAt", "controlCount")
+
+
+def profile_metadata(
+    profile_id: str, document: Dict[str, Any], updated_at: float
+) -> Dict[str, Any]:
+    """Listing metadata for one profile (see METADATA_FIELDS)."""
+    return {
+        "id": profile_id,
+        "name": str(document.get("name", profile_id)),
+        "version": int(document.get("version") or 1),
+        "rows": int(document.get("rows") or 0),
+        "cols": int(document.get("cols") or 0),
+        "controlCount": len(document.get("controls") or []),
+        "updatedAt": updated_at,
+    }
+
+
+def action_kinds(document: Dict[str, Any]) -> Set[str]:
+    """Lowercased action names used by a profile's controls (e.g. ``{"keyboard", "obs"}``)."""
+    kinds = set()
+    for control in document.get("controls") or []:
+        action = control.get("action") if isinstance(control, dict) else None
+        if not isinstance(action, dict):
+            continue
+        name = action.get("type") or action.get("action")
+        if isinstance(name, str) and name.strip():
+            kinds.add(name.strip().lower())
+    return kinds
+
+
+class ProfileStore(ABC):
+    """Storage backend behind ProfileManager.
+
+    - ``read`` returns the stored document (or None) and may raise on corrupt data
+    - ``write`` makes the document visible to subsequent reads immediately
+    - ``update_lock`` serializes read-modify-write updates across managers
+    """
+
+    backend = ""
+
+    def __init__(self) -> None:
+        self.update_lock = threading.RLock()
+
+    @abstractmethod
+    def read(self, profile_id: str) -> Optional[Dict]: ...
+
+    @abstractmethod
+    def ids(self) -> List[str]:
+        """Every stored profile id, sorted."""
+
+    @abstractmethod
+    def summaries(self) -> List[Dict[str, Any]]:
+        """``{"id", "name"}`` for every readable profile, sorted by id."""
+
+    @abstractmethod
+    def write(self, profile_id: str, document: Dict) -> None: ...
+
+    @abstractmethod
+    def delete(self, profile_id: str) -> bool: ...
+
+    @abstractmethod
+    def find_by_action(self, kind: str) -> List[str]:
+        """Ids of profiles with at least one control using the ``kind`` action."""
+
+    @abstractmethod
+    def metadata(self) -> List[Dict[str, Any]]:
+        """Metadata (see :func:`profile_metadata`) of every profile, in no particular order."""
+
+    def query_metadata(
+        self,
+        sort: str = "id",
+        descending: bool = False,
+        after: Optional[Tuple[Any, str]] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """One page of metadata ordered by ``(sort, id)``, starting after the ``after`` key."""
+        items = sorted(
+            self.metadata(), key=lambda item: (item[sort], item["id"]), reverse=descending
+        )
+        if after is not None:
+            after = tuple(after)
+            if descending:
+                items = [item for item in items if (item[sort], item["id"]) < after]
+            else:
+                items = [item for item in items if (item[sort], item["id"]) > after]
+        return items[:limit]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return True
+
+    def backlog(self) -> int:
+        """Writes accepted but not yet durable."""
+        return 0
+
+    def write_failures(self) -> Dict[str, str]:
+        """Last error of every accepted write that hasn't reached storage yet (being retried)."""
+        return {}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend}
+
+
+class JsonProfileStore(ProfileStore):
+    """One ``<id>.json`` file per profile, written through the write-behind ProfileWriter."""
+
+    backend = "json"
+
+    def __init__(self, directory: Path, delay: float = 0.05):
+        super().__init__()
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.writer = get_profile_writer(directory, delay)
+        # Shared with every store of the same directory
+        self.update_lock = self.writer.update_lock
+        # id -> metadata, built by one directory scan on first use, kept current by
+        # write()/delete() and reconciled with the directory whenever its mtime moves
+        # (files added, removed or replaced behind our back)
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        # id -> file mtime the entry was read at (None: indexed from a queued save)
+        self._index_mtimes: Dict[str, Optional[float]] = {}
+        self._index_signature: Optional[int] = None
+        self._index_lock = threading.Lock()
+
+    def read(self, profile_id: str) -> Optional[Dict]:
+        # Queued saves win over the file on disk (read-your-writes)
+        pending = self.writer.pending(profile_id)
+        file = self.writer.path_for(profile_id)
+        if pending is None and not file.exists():
+            return None
+        document: Dict = json.loads(
+            pending if pending is not None else file.read_text(encoding="utf-8")
+        )
+        return document
+
+    def _read_quiet(self, profile_id: str) -> Optional[Dict]:
+        try:
+            return self.read(profile_id)
+        except Exception:
+            return None
+
+    def ids(self) -> List[str]:
+        stems = {file.stem for file in self.directory.glob("*.json")}
+        stems.update(self.writer.pending_ids())
+        return sorted(stems)
+
+    def _metadata_index(self) -> Dict[str, Dict[str, Any]]:
+        with self._index_lock:
+            try:
+                signature: Optional[int] = self.directory.stat().st_mtime_ns
+            except OSError:
+                signature = None
+            index = self._index
+            if index is None or signature != self._index_signature:
+                index = self._reconcile_index()
+                self._index_signature = signature
+            return index
+
+    def _reconcile_index(self) -> Dict[str, Dict[str, Any]]:
+        """Sync the index with the directory, re-reading only new or changed files."""
+        index = self._index if self._index is not None else {}
+        pending = set(self.writer.pending_ids())
+        stems = set(self.ids())
+        for stem in [stem for stem in index if stem not in stems]:
+            del index[stem]
+            self._index_mtimes.pop(stem, None)
+        for stem in stems:
+            mtime: Optional[float] = None
+            if stem in pending:
+                if stem in index:
+                    continue  # write() already indexed the queued document
+            else:
+                try:
+                    mtime = self.writer.path_for(stem).stat().st_mtime
+                except OSError:
+                    index.pop(stem, None)
+                    continue
+                if stem in index and self._index_mtimes.get(stem) == mtime:
+                    continue
+            data = self._read_quiet(stem)
+            if data is None:
+                index.pop(stem, None)
+                continue
+            index[stem] = profile_metadata(stem, data, time.time() if mtime is None else mtime)
+            self._index_mtimes[stem] = mtime
+        self._index = index
+        return index
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        index = self._metadata_index()
+        with self._index_lock:
+            return [{"id": item["id"], "name": item["name"]} for _, item in sorted(index.items())]
+
+    def metadata(self) -> List[Dict[str, Any]]:
+        index = self._metadata_index()
+        with self._index_lock:
+            return list(index.values())
+
+    def write(self, profile_id: str, document: Dict) -> None:
+        self.writer.enqueue(profile_id, json.dumps(document, indent=2))
+        with self._index_lock:
+            if self._index is not None:
+                self._index[profile_id] = profile_metadata(profile_id, document, time.time())
+                self._index_mtimes[profile_id] = None
+
+    def delete(self, profile_id: str) -> bool:
+        deleted = self.writer.delete(profile_id)
+        with self._index_lock:
+            if self._index is not None:
+                self._index.pop(profile_id, None)
+                self._index_mtimes.pop(profile_id, None)
+        return deleted
+
+    def find_by_action(self, kind: str) -> List[str]:
+        kind = kind.strip().lower()
+        return [stem for stem in self.ids() if kind in action_kinds(self._read_quiet(stem) or {})]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return self.writer.flush(timeout)
+
+    def backlog(self) -> int:
+        return len(self.writer.pending_ids())
+
+    def write_failures(self) -> Dict[str, str]:
+        return self.writer.failures()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, **self.writer.stats()}
+
+
+# One store per backend location so every manager shares locks and connections
+_stores: Dict[Tuple[str, Path], ProfileStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_profile_store(settings: Settings) -> ProfileStore:
+    backend = settings.profile_store.strip().lower()
+    if backend not in PROFILE_STORE_BACKENDS:
+        raise ValueError(
+            f"Unknown profile store {settings.profile_store!r}, "
+            f"expected one of {PROFILE_STORE_BACKENDS}"
+        )
+    path = settings.profiles_db_path if backend == "sqlite" else settings.profiles_dir
+    key = (backend, path.resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if backend == "sqlite":
+                from .profile_sqlite import SqliteProfileStore
+
+                sqlite_store = SqliteProfileStore(path)
+                migrated = sqlite_store.migrate_json_dir(settings.profiles_dir)
+                if migrated:
+                    logger.info(f"Migrated {migrated} JSON profiles into {path}")
+                store = sqlite_store
+            else:
+                store = JsonProfileStore(path, settings.profile_write_delay)
+            _stores[key] = store
+        return store
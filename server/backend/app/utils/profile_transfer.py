@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import json
+import zipfile
+from typing import IO, Any, Dict, Iterator, List, Optional, Set
+
+from .profile_manager import ProfileManager
+from .profile_validation import ProfileValidationError
+
+# Export formats and their media types
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "zip": "application/zip",
+}
+
+# Largest single profile accepted by an import (one NDJSON line or zip member)
+MAX_IMPORT_ITEM_BYTES = 1024 * 1024
+
+# Per-item errors kept in the import report; further failures are only counted
+MAX_IMPORT_ERRORS = 1000
+
+# Queued writes an import may run ahead of the disk before waiting for the writer
+IMPORT_WRITE_BACKLOG = 64
+
+
+def iter_ndjson(manager: ProfileManager) -> Iterator[bytes]:
+    """Yield every stored profile as one compact JSON line, reading one profile at a time."""
+    for _, document in manager.iter_profiles():
+        yield json.dumps(document, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object that hands written bytes back to the caller."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(manager: ProfileManager) -> Iterator[bytes]:
+    """Yield a zip archive with one ``<id>.json`` member per profile.
+
+    The archive is written to an unseekable sink, so zipfile emits data descriptors
+    and every member can be streamed out as soon as it is compressed.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for profile_id, document in manager.iter_profiles():
+            archive.writestr(f"{profile_id}.json", json.dumps(document, indent=2))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    # Central directory
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+class NdjsonSplitter:
+    """Incrementally split a byte stream into lines without buffering past one line."""
+
+    def __init__(self, max_line_bytes: int = MAX_IMPORT_ITEM_BYTES):
+        self.max_line_bytes = max_line_bytes
+        self._buffer = bytearray()
+        self._skipping = False
+
+    def feed(self, chunk: bytes) -> List[Optional[bytes]]:
+        """Return complete lines; ``None`` stands for a line that exceeded the limit."""
+        lines: List[Optional[bytes]] = []
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            if self._skipping:
+                self._skipping = False
+            else:
+                self._buffer += chunk[start:end]
+                lines.append(self._take())
+            start = end + 1
+        if not self._skipping:
+            self._buffer += chunk[start:]
+            if len(self._buffer) > self.max_line_bytes:
+                # Drop the rest of the oversized line instead of buffering it
+                self._buffer.clear()
+                self._skipping = True
+                lines.append(None)
+        return lines
+
+    def close(self) -> List[Optional[bytes]]:
+        if self._skipping or not self._buffer:
+            return []
+        return [self._take()]
+
+    def _take(self) -> Optional[bytes]:
+        line = bytes(self._buffer)
+        self._buffer.clear()
+        return line if len(line) <= self.max_line_bytes else None
+
+
+class ProfileImporter:
+    """Validates and saves imported profiles one at a time, collecting per-item errors.
+
+    Writes go through the regular write-behind queue; the importer waits for the
+    writer whenever the backlog grows, so memory stays bounded by
+    ``IMPORT_WRITE_BACKLOG`` profiles regardless of the import size.
+    """
+
+    def __init__(self, manager: ProfileManager):
+        self.manager = manager
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._line = 0
+        # Ids this import saved, and those of them whose write failed (reported once)
+        self._saved: Set[str] = set()
+        self._unwritten: Set[str] = set()
+
+    def import_lines(self, lines: List[Optional[bytes]]) -> None:
+        for line in lines:
+            self._line += 1
+            if line is None:
+                self._fail({"line": self._line}, f"line exceeds {MAX_IMPORT_ITEM_BYTES} bytes")
+                continue
+            if not line.strip():
+                continue
+            self.import_item(line, {"line": self._line})
+
+    def import_zip(self, file: IO[bytes]) -> None:
+        try:
+            archive = zipfile.ZipFile(file)
+        except zipfile.BadZipFile as exc:
+            self._fail({}, f"invalid zip archive: {exc}")
+            return
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.endswith(".json"):
+                    continue
+                where = {"entry": info.filename}
+                if info.file_size > MAX_IMPORT_ITEM_BYTES:
+                    self._fail(where, f"entry exceeds {MAX_IMPORT_ITEM_BYTES} bytes")
+                    continue
+                try:
+                    data = archive.read(info)
+                except (zipfile.BadZipFile, OSError) as exc:
+                    self._fail(where, str(exc))
+                    continue
+                self.import_item(data, where)
+
+    def import_item(self, raw: bytes, where: Dict[str, Any]) -> None:
+        try:
+            document = json.loads(raw)
+        except ValueError as exc:
+            self._fail(where, f"invalid JSON: {exc}")
+            return
+        profile_id = document.get("id") if isinstance(document, dict) else None
+        if not isinstance(profile_id, str) or not profile_id:
+            self._fail(where, "profile id required")
+            return
+        if profile_id.startswith(".") or "/" in profile_id or "\\" in profile_id:
+            # The id becomes a file name in the profiles directory
+            self._fail(where, f"invalid profile id: {profile_id!r}")
+            return
+        where = {**where, "profileId": profile_id}
+        try:
+            self.manager.save_profile(profile_id, document)
+        except ProfileValidationError as exc:
+            self._fail(where, "invalid profile", exc.errors)
+            return
+        except ValueError as exc:
+            self._fail(where, str(exc))
+            return
+        self.imported += 1
+        self._saved.add(profile_id)
+        if self.manager.store.backlog() >= IMPORT_WRITE_BACKLOG:
+            self._flush()
+
+    def finish(self) -> None:
+        """Wait for the imported profiles to be written; saves that fail count as failed."""
+        self._flush()
+
+    def _flush(self) -> None:
+        if self.manager.flush():
+            return
+        for profile_id, error in self.manager.store.write_failures().items():
+            if profile_id in self._saved and profile_id not in self._unwritten:
+                self._unwritten.add(profile_id)
+                self.imported -= 1
+                self._fail({"profileId": profile_id}, f"write failed: {error}")
+
+    def _fail(self, where: Dict[str, Any], error: str, details: Optional[List[str]] = None) -> None:
+        self.failed += 1
+        if len(self.errors) >= MAX_IMPORT_ERRORS:
+            return
+        item: Dict[str, Any] = {**where, "error": error}
+        if details:
+            item["errors"] = details
+        self.errors.append(item)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "status": "imported",
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# server/config/profile.schema.json, shipped with the backend
+BUNDLED_SCHEMA_PATH = Path(__file__).resolve().parents[3] / "config" / "profile.schema.json"
+
+# Upper bound per grid axis; keeps occupancy checks bounded for hostile payloads
+MAX_GRID_SIZE = 256
+
+# (value, JSON pointer, error sink)
+Validator = Callable[[Any, str, List[str]], None]
+
+# Generated-code conditions for each JSON Schema type ({v} is the value expression)
+_TYPE_CONDITIONS: Dict[str, str] = {
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+    "string": "isinstance({v}, str)",
+    "integer": "(isinstance({v}, int) and not isinstance({v}, bool))",
+    "number": "(isinstance({v}, (int, float)) and not isinstance({v}, bool))",
+    "boolean": "isinstance({v}, bool)",
+    "null": "{v} is None",
+}
+
+
+class ProfileValidationError(ValueError):
+    """Raised when a profile violates the schema or its grid layout."""
+
+    def __init__(self, errors: Sequence[str]):
+        self.errors = list(errors)
+        super().__init__("; ".join(self.errors))
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """Compile the JSON Schema subset used by profile.schema.json into Python code.
+
+    Supports type, required, properties, items and minimum. The schema is turned into
+    the source of one straight-line function (nested loops for arrays) and exec'd
+    once, so validating a document runs no schema interpretation at all. Error paths
+    are only formatted on failure. Optional properties set to null count as absent,
+    since stored profiles dump unset optional fields as null.
+    """
+    compiler = _SchemaCompiler()
+    compiler.node(schema, "value", "path", 1)
+    source = "def validate(value, path, errors):\n" + "\n".join(compiler.lines or ["    pass"])
+    namespace: Dict[str, Any] = {}
+    # Only called for the schema shipped with the package (get_profile_validator
+    # interprets user overrides instead); schema keys and values are embedded with repr()
+    exec(compile(source, "<profile-schema>", "exec"), namespace)  # nosec B102
+    validate: Validator = namespace["validate"]
+    return validate
+
+
+def interpret_schema(schema: Dict[str, Any]) -> Validator:
+    """Validator that walks ``schema`` on every call.
+
+    Same subset and error messages as :func:`compile_schema`, but nothing from the
+    schema is turned into code, so it is safe for user-editable schema files.
+    """
+
+    def validate(value: Any, path: str, errors: List[str]) -> None:
+        _check(schema, value, path, errors)
+
+    return validate
+
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+
+def _check(schema: Dict[str, Any], value: Any, path: str, errors: List[str]) -> None:
+    expected = schema.get("type")
+    if expected is not None:
+        names = [expected] if isinstance(expected, str) else list(expected)
+        if not any(_TYPE_CHECKS[name](value) for name in names):
+            errors.append((path or "/") + f": expected {' or '.join(names)}")
+            return
+    minimum = schema.get("minimum")
+    if minimum is not None and _TYPE_CHECKS["number"](value) and value < minimum:
+        errors.append((path or "/") + f": must be >= {minimum}")
+
+    required = list(schema.get("required", ()))
+    properties = schema.get("properties", {})
+    if (required or properties) and isinstance(value, dict):
+        for key in required:
+            if key not in value:
+                errors.append(f"{path}/{_escape(key)}: required")
+        for key, sub in properties.items():
+            if key in required:
+                if key in value:
+                    _check(sub, value[key], f"{path}/{_escape(key)}", errors)
+            elif value.get(key) is not None:
+                _check(sub, value[key], f"{path}/{_escape(key)}", errors)
+
+    if "items" in schema and isinstance(value, list):
+        for index, item in enumerate(value):
+            _check(schema["items"], item, f"{path}/{index}", errors)
+
+
+class _SchemaCompiler:
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+        self._counter = 0
+
+    def _var(self, prefix: str) -> str:
+        self._counter += 1
+        return f"{prefix}{self._counter}"
+
+    def _emit(self, indent: int, line: str) -> None:
+        self.lines.append("    " * indent + line)
+
+    def _error(self, indent: int, path: str, message: str) -> None:
+        # The document root is reported as "/"
+        self._emit(indent, f"errors.append(({path} or '/') + {message!r})")
+
+    def _child_error(self, indent: int, path: str, key: str, message: str) -> None:
+        self._emit(indent, f"errors.append({path} + {'/' + _escape(key) + message!r})")
+
+    def node(self, schema: Dict[str, Any], value: str, path: str, indent: int) -> None:
+        expected = schema.get("type")
+        if expected is not None:
+            names = [expected] if isinstance(expected, str) else list(expected)
+            condition = " or ".join(_TYPE_CONDITIONS[name].format(v=value) for name in names)
+            self._emit(indent, f"if not ({condition}):")
+            self._error(indent + 1, path, f": expected {' or '.join(names)}")
+            self._emit(indent, "else:")
+            indent += 1
+            mark = len(self.lines)
+            self._body(schema, value, path, indent)
+            if len(self.lines) == mark:
+                self._emit(indent, "pass")
+        else:
+            self._body(schema, value, path, indent)
+
+    def _body(self, schema: Dict[str, Any], value: str, path: str, indent: int) -> None:
+        if "minimum" in schema:
+            number = _TYPE_CONDITIONS["number"].format(v=value)
+            self._emit(indent, f"if {number} and {value} < {schema['minimum']!r}:")
+            self._error(indent + 1, path, f": must be >= {schema['minimum']}")
+
+        required = list(schema.get("required", ()))
+        properties = schema.get("properties", {})
+        if required or properties:
+            self._emit(indent, f"if isinstance({value}, dict):")
+            inner = indent + 1
+            for key in required:
+                self._emit(inner, f"if {key!r} not in {value}:")
+                self._child_error(inner + 1, path, key, ": required")
+            for key, sub in properties.items():
+                child = self._var("v")
+                child_path = f"{path} + {'/' + _escape(key)!r}"
+                if key in required:
+                    self._emit(inner, f"if {key!r} in {value}:")
+                    self._emit(inner + 1, f"{child} = {value}[{key!r}]")
+                else:
+                    self._emit(inner, f"{child} = {value}.get({key!r})")
+                    self._emit(inner, f"if {child} is not None:")
+                mark = len(self.lines)
+                self.node(sub, child, child_path, inner + 1)
+                if len(self.lines) == mark or self.lines[-1].endswith(":"):
+                    self._emit(inner + 1, "pass")
+
+        if "items" in schema:
+            index = self._var("i")
+            item = self._var("v")
+            self._emit(indent, f"if isinstance({value}, list):")
+            self._emit(indent + 1, f"for {index}, {item} in enumerate({value}):")
+            mark = len(self.lines)
+            self.node(schema["items"], item, f"{path} + '/' + str({index})", indent + 2)
+            if len(self.lines) == mark:
+                self._emit(indent + 2, "pass")
+
+
+def _escape(key: str) -> str:
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def check_grid(rows: int, cols: int, controls: Sequence[Dict[str, Any]]) -> List[str]:
+    """Check that controls fit the grid, don't overlap and have unique ids.
+
+    Occupancy is tracked as one int bitmask per row, so the cost is bounded by the
+    number of occupied cells (O(rows x cols)) instead of comparing controls pairwise.
+    """
+    if rows > MAX_GRID_SIZE or cols > MAX_GRID_SIZE:
+        return [f"/: grid {rows}x{cols} exceeds {MAX_GRID_SIZE}x{MAX_GRID_SIZE}"]
+    errors: List[str] = []
+    occupied = [0] * rows
+    seen_ids: Dict[Any, int] = {}
+    for index, control in enumerate(controls):
+        control_id = control.get("id")
+        first = seen_ids.setdefault(control_id, index)
+        if first != index:
+            errors.append(f"/controls/{index}: duplicate id {control_id!r} (see /controls/{first})")
+        row = control.get("row")
+        col = control.get("col")
+        row_span = control.get("rowSpan") or 1
+        col_span = control.get("colSpan") or 1
+        if (
+            type(row) is not int
+            or type(col) is not int
+            or type(row_span) is not int
+            or type(col_span) is not int
+        ):
+            # Type errors are reported by the schema validator
+            continue
+        bottom = row + row_span
+        if row < 0 or col < 0 or bottom > rows or col + col_span > cols:
+            errors.append(
+                f"/controls/{index}: {control_id!r} at row {row}, col {col} "
+                f"(span {row_span}x{col_span}) does not fit the {rows}x{cols} grid"
+            )
+            continue
+        mask = ((1 << col_span) - 1) << col
+        if row_span == 1:
+            if occupied[row] & mask:
+                errors.append(_overlap_error(controls, index, row, occupied[row] & mask))
+            else:
+                occupied[row] |= mask
+            continue
+        for r in range(row, bottom):
+            if occupied[r] & mask:
+                errors.append(_overlap_error(controls, index, r, occupied[r] & mask))
+                # Undo the rows already marked for the rejected control
+                for marked in range(row, r):
+                    occupied[marked] &= ~mask
+                break
+            occupied[r] |= mask
+    return errors
+
+
+def _overlap_error(controls: Sequence[Dict[str, Any]], index: int, row: int, overlap: int) -> str:
+    col = (overlap & -overlap).bit_length() - 1
+    other = _owner(controls, index, row, col)
+    return (
+        f"/controls/{index}: {controls[index].get('id')!r} overlaps /controls/{other} "
+        f"({controls[other].get('id')!r}) at row {row}, col {col}"
+    )
+
+
+def _owner(controls: Sequence[Dict[str, Any]], before: int, row: int, col: int) -> int:
+    # Only runs on the error path
+    for index in range(before):
+        control = controls[index]
+        top, left = control.get("row"), control.get("col")
+        if not isinstance(top, int) or not isinstance(left, int):
+            continue
+        bottom = top + (control.get("rowSpan") or 1)
+        right = left + (control.get("colSpan") or 1)
+        if top <= row < bottom and left <= col < right:
+            return index
+    return -1
+
+
+class ProfileValidator:
+    """Profile schema validator plus grid occupancy checks.
+
+    ``compiled`` generates code from the schema (trusted, bundled schema only);
+    otherwise the schema is interpreted.
+    """
+
+    def __init__(self, schema: Dict[str, Any], compiled: bool = True):
+        self.schema = schema
+        build = compile_schema if compiled else interpret_schema
+        self._validate_document = build(schema)
+        control_schema = schema.get("properties", {}).get("controls", {}).get("items", {})
+        self._validate_control = build(control_schema)
+
+    @classmethod
+    def from_file(cls, path: Path, compiled: bool = True) -> "ProfileValidator":
+        return cls(json.loads(path.read_text(encoding="utf-8")), compiled)
+
+    def errors(self, document: Any) -> List[str]:
+        errors: List[str] = []
+        self._validate_document(document, "", errors)
+        if errors:
+            return errors
+        return check_grid(document["rows"], document["cols"], document["controls"])
+
+    def control_errors(self, control: Any, index: int) -> List[str]:
+        errors: List[str] = []
+        self._validate_control(control, f"/controls/{index}", errors)
+        return errors
+
+    def validate(self, document: Any) -> None:
+        errors = self.errors(document)
+        if errors:
+            raise ProfileValidationError(errors)
+
+
+_validators: Dict[Path, ProfileValidator] = {}
+
+
+def get_profile_validator(config_dir: Optional[Path] = None) -> ProfileValidator:
+    """Return the validator, preferring a schema in ``config_dir`` over the bundled one.
+
+    Only the bundled schema is compiled; an override is user-editable and is interpreted.
+    """
+    path = BUNDLED_SCHEMA_PATH
+    if config_dir is not None and (config_dir / "profile.schema.json").exists():
+        path = config_dir / "profile.schema.json"
+    validator = _validators.get(path)
+    if validator is None:
+        validator = ProfileValidator.from_file(path, compiled=path == BUNDLED_SCHEMA_PATH)
+        _validators[path] = validator
+    return validator
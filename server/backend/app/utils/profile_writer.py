@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ProfileWriter:
+    """Single-writer, write-behind persistence queue for profile files.
+
+    - save requests are coalesced per profile (last write wins) and acked once
+      durably queued: each one is appended to an fsynced journal first, which the
+      next writer for the directory replays if the process dies before the flush
+    - a background thread flushes the queue after a short coalescing window
+    - every flush is atomic (temp file + fsync + rename), so readers never see a
+      truncated JSON file, even after a crash mid-write
+    - a failed write stays queued (reads keep seeing it) and is retried with
+      exponential backoff; ``flush`` returns False and ``stats``/``failures``
+      report the error until it succeeds
+    """
+
+    RETRY_BASE = 0.5  # seconds before the first retry, doubled per failure
+    RETRY_MAX = 30.0
+    JOURNAL_NAME = ".profile-writer.journal"
+    JOURNAL_COMPACT = 1000  # records before the journal is rewritten with the queue only
+
+    def __init__(self, directory: Path, delay: float = 0.05):
+        self.directory = directory
+        self.delay = delay
+        self._pending: Dict[str, str] = {}
+        # profile id -> (failed attempts, monotonic time of the next retry, last error)
+        self._failures: Dict[str, Tuple[int, float, str]] = {}
+        self._cond = threading.Condition()
+        # Held while touching the disk so deletes serialize with flushes
+        self._io_lock = threading.Lock()
+        # Serializes read-modify-write updates (JSON Patch) across managers
+        self.update_lock = threading.RLock()
+        self._thread: Optional[threading.Thread] = None
+        self._flushed = 0
+        self._coalesced = 0
+        self._errors = 0
+        # Appends to the journal; taken before ``_cond``, never together with ``_io_lock``
+        self._journal_lock = threading.Lock()
+        self._journal: Optional[IO[str]] = None
+        self._journal_records = 0
+        self._replay_journal()
+
+    def path_for(self, profile_id: str) -> Path:
+        return self.directory / f"{profile_id}.json"
+
+    @property
+    def journal_path(self) -> Path:
+        return self.directory / self.JOURNAL_NAME
+
+    def _replay_journal(self) -> None:
+        """Queue the saves an earlier process acked but never flushed."""
+        try:
+            lines = self.journal_path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last record: its save was never acked
+                continue
+            if record.get("deleted"):
+                self._pending.pop(record["id"], None)
+                with suppress(FileNotFoundError):
+                    self.path_for(record["id"]).unlink()
+            else:
+                self._pending[record["id"]] = record["content"]
+        self._journal_records = len(lines)
+        if self._pending:
+            logger.info(
+                f"Replaying {len(self._pending)} unflushed profile save(s) from the journal"
+            )
+            self._start()
+        else:
+            with suppress(OSError):
+                self.journal_path.unlink()
+
+    def _append_journal(self, record: Dict[str, object]) -> None:
+        # Caller holds _journal_lock
+        if self._journal is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._journal = self.journal_path.open("a", encoding="utf-8")
+        self._journal.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._journal_records += 1
+
+    def _compact_journal(self) -> None:
+        """Drop the journal once everything is on disk (or shrink it to the queue)."""
+        try:
+            self._rewrite_journal()
+        except Exception:
+            # The old journal only replays saves that are on disk already
+            logger.exception("Failed to compact the profile journal")
+
+    def _rewrite_journal(self) -> None:
+        with self._journal_lock:
+            with self._cond:
+                pending = dict(self._pending)
+            if pending and self._journal_records <= self.JOURNAL_COMPACT:
+                return
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if not pending:
+                with suppress(FileNotFoundError):
+                    self.journal_path.unlink()
+                self._journal_records = 0
+                return
+            records = [
+                {"id": profile_id, "content": content} for profile_id, content in pending.items()
+            ]
+            write_atomic(
+                self.journal_path,
+                "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records),
+            )
+            self._journal_records = len(records)
+
+    def _start(self) -> None:
+        # Caller holds _cond (or is the constructor)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="profile-writer", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, profile_id: str, content: str) -> None:
+        """Queue a save; returns once it is in the fsynced journal."""
+        with self._journal_lock:
+            self._append_journal({"id": profile_id, "content": content})
+            with self._cond:
+                if profile_id in self._pending:
+                    self._coalesced += 1
+                self._pending[profile_id] = content
+                self._start()
+                self._cond.notify_all()
+
+    def pending(self, profile_id: str) -> Optional[str]:
+        with self._cond:
+            return self._pending.get(profile_id)
+
+    def pending_ids(self) -> List[str]:
+        with self._cond:
+            return list(self._pending.keys())
+
+    def failures(self) -> Dict[str, str]:
+        """Last error of every queued save whose write has failed (and is being retried)."""
+        with self._cond:
+            return {profile_id: error for profile_id, (_, _, error) in self._failures.items()}
+
+    def delete(self, profile_id: str) -> bool:
+        """Drop any queued save and remove the file, serialized with flushes."""
+        with self._io_lock:
+            with self._journal_lock:
+                # So a replay doesn't resurrect a save queued before the delete
+                self._append_journal({"id": profile_id, "deleted": True})
+            with self._cond:
+                had_pending = self._pending.pop(profile_id, None) is not None
+                self._failures.pop(profile_id, None)
+                self._cond.notify_all()
+            file = self.path_for(profile_id)
+            if not file.exists():
+                return had_pending
+            try:
+                file.unlink()
+            except Exception:
+                return False
+            return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued save has reached the disk.
+
+        Returns False on timeout, or as soon as every save still queued has failed
+        to write (they stay queued and keep being retried).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            # The writer thread exits after dropping the journal
+            while self._pending or self._thread is not None:
+                if self._pending and all(
+                    profile_id in self._failures for profile_id in self._pending
+                ):
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self) -> Dict:
+        with self._cond:
+            last_error = max(self._failures.values(), default=None, key=lambda failure: failure[1])
+            return {
+                "pending": len(self._pending),
+                "flushed": self._flushed,
+                "coalesced": self._coalesced,
+                "errors": self._errors,
+                "failing": len(self._failures),
+                "lastError": last_error[2] if last_error else None,
+            }
+
+    def _due(self) -> Tuple[Dict[str, str], Optional[float]]:
+        """Queued saves ready to be written, and the next retry time of the others."""
+        now = time.monotonic()
+        due: Dict[str, str] = {}
+        next_retry = None
+        for profile_id, content in self._pending.items():
+            failure = self._failures.get(profile_id)
+            if failure is None or failure[1] <= now:
+                due[profile_id] = content
+            elif next_retry is None or failure[1] < next_retry:
+                next_retry = failure[1]
+        return due, next_retry
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._pending:
+                    break
+                due, next_retry = self._due()
+                if not due:
+                    # Only failed saves left: wait for the earliest retry (or a new save)
+                    assert next_retry is not None
+                    self._cond.wait(max(0.0, next_retry - time.monotonic()))
+                    continue
+            # Coalescing window: successive saves of the same profile collapse into one write
+            if self.delay > 0:
+                time.sleep(self.delay)
+            with self._io_lock:
+                with self._cond:
+                    batch = {
+                        profile_id: self._pending[profile_id]
+                        for profile_id in due
+                        if profile_id in self._pending
+                    }
+                for profile_id, content in batch.items():
+                    try:
+                        self._write_atomic(self.path_for(profile_id), content)
+                        error = None
+                    except Exception as exc:
+                        logger.exception(f"Failed to persist profile {profile_id}")
+                        error = str(exc) or type(exc).__name__
+                    with self._cond:
+                        if error is None:
+                            self._flushed += 1
+                            self._failures.pop(profile_id, None)
+                            # Only retire the entry if no newer save arrived meanwhile
+                            if self._pending.get(profile_id) is content:
+                                del self._pending[profile_id]
+                        elif profile_id in self._pending:
+                            # Keep the save queued and retry it later
+                            self._errors += 1
+                            attempts = self._failures.get(profile_id, (0, 0.0, ""))[0] + 1
+                            backoff = min(self.RETRY_MAX, self.RETRY_BASE * 2 ** (attempts - 1))
+                            self._failures[profile_id] = (
+                                attempts,
+                                time.monotonic() + backoff,
+                                error,
+                            )
+                        self._cond.notify_all()
+            self._compact_journal()
+        self._compact_journal()
+        with self._cond:
+            self._thread = None
+            if self._pending:
+                self._start()  # a save arrived while the journal was being dropped
+            self._cond.notify_all()
+
+    @staticmethod
+    def _write_atomic(path: Path, content: str) -> None:
+        write_atomic(path, content)
+
+
+def write_atomic(path: Path, content: str, durable: bool = True) -> None:
+    """Write ``content`` via temp file + rename, so readers never see a partial file.
+
+    ``durable`` fsyncs the temp file before the rename.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(content)
+            handle.flush()
+            if durable:
+                os.fsync(handle.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+# One writer per profiles directory so every manager shares the same queue
+_writers: Dict[Path, ProfileWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_profile_writer(directory: Path, delay: float = 0.05) -> ProfileWriter:
+    key = directory.resolve()
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = ProfileWriter(directory, delay)
+            _writers[key] = writer
+        return writer
+
+
+@atexit.register
+def _flush_all_writers() -> None:
+    for writer in list(_writers.values()):
+        writer.flush(timeout=5.0)
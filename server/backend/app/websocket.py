@@ -1,21 +1,41 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import json
-from typing import Any, Dict, Set
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
 from . import actions
+from .actions import keyboard, obs
 from .config import get_settings
 from .constants import (
     MESSAGE_TYPE_ACK,
+    MESSAGE_TYPE_CONTROL_PRESS,
+    MESSAGE_TYPE_CONTROL_STATE,
+    MESSAGE_TYPE_KEYBOARD_TYPED,
+    MESSAGE_TYPE_MAPPING_TRIGGER,
+    MESSAGE_TYPE_OBS_METERS_SUBSCRIBE,
+    MESSAGE_TYPE_OBS_METERS_UNSUBSCRIBE,
+    MESSAGE_TYPE_OBS_THUMBNAIL,
+    MESSAGE_TYPE_OBS_THUMBNAILS_SUBSCRIBE,
+    MESSAGE_TYPE_OBS_THUMBNAILS_UNSUBSCRIBE,
+    MESSAGE_TYPE_PROFILE_SELECT,
     MESSAGE_TYPE_PROFILE_SELECT_ACK,
+    MESSAGE_TYPE_SCRIPT_OUTPUT,
     STATUS_ERROR,
     STATUS_OK,
     WS_CLOSE_MESSAGE_TOO_BIG,
     WS_CLOSE_UNAUTHORIZED,
 )
+from .routes.thumbnails import thumbnail_url
+from .utils.control_index import ControlIndex
 from .utils.logger import get_logger
+from .utils.mapping_table import BUNDLED_CONFIG_DIR, MappingLoader
+from .utils.profile_events import get_profile_events
+from .utils.profile_manager import PROFILE_ALIASES, ProfileManager
 from .utils.rate_limiter import RateLimiter
 from .utils.token_manager import get_token_manager
 
@@ -23,6 +43,22 @@ router = APIRouter()
 settings = get_settings()
 token_manager = get_token_manager(default_token=settings.deck_token)
 connections: Set[WebSocket] = set()
+# Profile each client is currently viewing (set by profile:select)
+subscriptions: Dict[WebSocket, str] = {}
+# OBS instance whose audio meters each client receives (set by obs:meters:subscribe)
+meter_subscriptions: Dict[WebSocket, str] = {}
+_meter_task: Optional[asyncio.Task] = None
+# OBS instance and scenes whose thumbnails each client receives (obs:thumbnails:subscribe)
+thumbnail_subscriptions: Dict[WebSocket, Tuple[str, Set[str]]] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+# Connection a handler is serving (keys held with keyboard:down belong to it)
+current_client: contextvars.ContextVar[Optional[WebSocket]] = contextvars.ContextVar(
+    "current_client", default=None
+)
+# messageId of the request a handler is serving (keyboard:type texts are cancelled by it)
+current_message_id: contextvars.ContextVar[Any] = contextvars.ContextVar(
+    "current_message_id", default=None
+)
 rate_limiter = RateLimiter()
 rate_limiter.configure("websocket", settings.rate_limit_requests, settings.rate_limit_window)
 logger = get_logger(__name__)
@@ -42,11 +78,19 @@ async def websocket_endpoint(ws: WebSocket):
 
     await ws.accept()
     connections.add(ws)
+    global _loop
+    _loop = asyncio.get_running_loop()
+    # Per-connection state is dropped in ``finally``, however the connection ends
+    try:
+        await control_index.ensure_built_async()
+        if not mappings.started:
+            await _loop.run_in_executor(None, mappings.start)
+        obs.get_pool().start()
 
-    # Get client identifier for rate limiting
-    client_id = ws.headers.get("x-client-id") or (ws.client.host if ws.client else "unknown")
+        # Get client identifier for rate limiting
+        client_id = ws.headers.get("x-client-id") or (ws.client.host if ws.client else "unknown")
+        current_client.set(ws)
 
-    try:
         while True:
             message = await ws.receive_text()
 
@@ -56,6 +100,7 @@ async def websocket_endpoint(ws: WebSocket):
                 await ws.close(code=WS_CLOSE_MESSAGE_TOO_BIG)
                 return
 
+            keyboard.touch_client(ws)
             if message == "ping":
                 await ws.send_text("pong")
                 continue
@@ -64,11 +109,13 @@ async def websocket_endpoint(ws: WebSocket):
             rate_check = rate_limiter.check("websocket", client_id)
             if not rate_check["allowed"]:
                 logger.warning(f"Rate limit exceeded for {client_id}")
-                await ws.send_json({
-                    "type": "error",
-                    "error": "rate_limit_exceeded",
-                    "retry_after": rate_check["retry_after"]
-                })
+                await ws.send_json(
+                    {
+                        "type": "error",
+                        "error": "rate_limit_exceeded",
+                        "retry_after": rate_check["retry_after"],
+                    }
+                )
                 continue
 
             try:
@@ -77,7 +124,28 @@ async def websocket_endpoint(ws: WebSocket):
                 await ws.send_json({"type": "error", "error": "invalid_json"})
                 continue
 
-            response = _dispatch_action(payload)
+            if isinstance(payload, dict) and payload.get("kind") in STREAM_SUBSCRIPTIONS:
+                await ws.send_json(STREAM_SUBSCRIPTIONS[payload["kind"]](ws, payload))
+                continue
+
+            action, run = _prepare_action(payload)
+            if action in OFFLOADED_ACTIONS:
+                # Off the event loop: an unreachable OBS instance or a long script must not hold
+                # up other clients' presses (in a copy of this connection's context)
+                response = await _loop.run_in_executor(None, contextvars.copy_context().run, run)
+            else:
+                response = run()
+
+            if (
+                isinstance(payload, dict)
+                and payload.get("kind") == MESSAGE_TYPE_PROFILE_SELECT
+                and payload.get("profileId")
+            ):
+                profile_id = str(payload["profileId"])
+                subscriptions[ws] = PROFILE_ALIASES.get(profile_id, profile_id)
+                obs_states = _obs_control_states(subscriptions[ws])
+            else:
+                obs_states = []
 
             # Broadcast support: if payload.broadcast is True, send to others
             if isinstance(payload, dict) and payload.get("broadcast") is True:
@@ -89,9 +157,275 @@ async def websocket_endpoint(ws: WebSocket):
                     except Exception:
                         connections.discard(client)
             await ws.send_json(response)
+            # Current OBS state of the selected profile's controls (after the ack)
+            for state in obs_states:
+                await ws.send_json(state)
     except WebSocketDisconnect:
+        return
+    finally:
         connections.discard(ws)
+        subscriptions.pop(ws, None)
+        _drop_meters(ws)
+        _drop_thumbnails(ws)
+        keyboard.release_client(ws)
+
+
+def _on_profile_event(event: Dict[str, Any]) -> None:
+    """Hand a profile change over to the WebSocket event loop (thread-safe)."""
+    loop = _loop
+    if loop is None or loop.is_closed():
+        return
+    asyncio.run_coroutine_threadsafe(_push_profile_event(event), loop)
+
+
+async def _push_profile_event(event: Dict[str, Any]) -> None:
+    for client, profile_id in list(subscriptions.items()):
+        if profile_id != event.get("profileId"):
+            continue
+        try:
+            await client.send_json(event)
+        except Exception:
+            connections.discard(client)
+            subscriptions.pop(client, None)
+
+
+get_profile_events().add_listener("websocket", _on_profile_event)
+
+
+def _obs_control_states(
+    profile_id: str, changed: Optional[Set[str]] = None, instance: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """``control:state`` messages for a profile's OBS controls.
+
+    With ``instance``/``changed`` only controls bound to those keys of that OBS instance.
+    """
+    snapshots: Dict[str, Optional[Dict[str, Any]]] = {}
+    messages = []
+    for control_id, resolved in control_index.controls(profile_id, "obs"):
+        binding = obs.state_binding(resolved.payload)
+        if binding is None:
+            continue
+        name, key, to_value = binding
+        if instance is not None and name != instance:
+            continue
+        if name not in snapshots:
+            try:
+                mirror = obs.get_state_mirror(name)
+            except ValueError:
+                mirror = None
+            snapshots[name] = mirror.snapshot() if mirror is not None and mirror.live else None
+        state = snapshots[name]
+        if state is None or key not in state or (changed is not None and key not in changed):
+            continue
+        value = to_value(state[key])
+        if value is not None:
+            messages.append(
+                {
+                    "type": MESSAGE_TYPE_CONTROL_STATE,
+                    "profileId": profile_id,
+                    "controlId": control_id,
+                    "value": value,
+                }
+            )
+    return messages
+
+
+def _on_obs_state(instance: str, changed: Set[str]) -> None:
+    """Hand an OBS state change over to the WebSocket event loop (thread-safe)."""
+    loop = _loop
+    if loop is None or loop.is_closed():
         return
+    asyncio.run_coroutine_threadsafe(_push_obs_state(instance, changed), loop)
+
+
+async def _push_obs_state(instance: str, changed: Set[str]) -> None:
+    for client, profile_id in list(subscriptions.items()):
+        for state in _obs_control_states(profile_id, changed, instance):
+            try:
+                await client.send_json(state)
+            except Exception:
+                connections.discard(client)
+                subscriptions.pop(client, None)
+                break
+
+
+def _meter_subscription(ws: WebSocket, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Handle obs:meters:subscribe (``rate``, ``obs``) and obs:meters:unsubscribe."""
+    kind = payload.get("kind")
+    response: Dict[str, Any] = {
+        "type": MESSAGE_TYPE_ACK,
+        "kind": kind,
+        "messageId": payload.get("messageId"),
+    }
+    target = payload.get("obs")
+    name = str(target) if target else obs.DEFAULT_INSTANCE
+    if kind == MESSAGE_TYPE_OBS_METERS_UNSUBSCRIBE or meter_subscriptions.get(ws, name) != name:
+        _drop_meters(ws)
+    if kind == MESSAGE_TYPE_OBS_METERS_UNSUBSCRIBE:
+        return {**response, "status": STATUS_OK}
+    try:
+        rate = obs.get_meter_hub(name).subscribe(ws, payload.get("rate") or settings.obs_meter_rate)
+    except (TypeError, ValueError, OverflowError, RuntimeError) as exc:
+        return {**response, "status": STATUS_ERROR, "error": str(exc)}
+    meter_subscriptions[ws] = name
+    global _meter_task
+    if _meter_task is None or _meter_task.done():
+        _meter_task = asyncio.get_running_loop().create_task(_publish_meters())
+    return {**response, "status": STATUS_OK, "obs": name, "rate": rate}
+
+
+def _drop_meters(ws: WebSocket) -> None:
+    name = meter_subscriptions.pop(ws, None)
+    if name is not None:
+        obs.get_meter_hub(name).unsubscribe(ws)
+
+
+async def _publish_meters() -> None:
+    """Send due audio-meter frames until nobody is subscribed.
+
+    Each frame is encoded once and the same text goes to every client at that rate.
+    """
+    while meter_subscriptions:
+        now = time.monotonic()
+        wake = now + 1.0
+        for name in set(meter_subscriptions.values()):
+            hub = obs.get_meter_hub(name)
+            for rate, frame in hub.frames(now).items():
+                text = json.dumps({**frame, "obs": name}, separators=(",", ":"))
+                for client in hub.subscribers(rate):
+                    try:
+                        await client.send_text(text)
+                    except Exception:
+                        _drop_meters(client)
+            due = hub.next_due()
+            if due is not None:
+                wake = min(wake, due)
+        await asyncio.sleep(max(0.0, wake - time.monotonic()))
+
+
+def _thumbnail_message(instance: str, thumbnail: Any) -> Dict[str, Any]:
+    return {
+        "type": MESSAGE_TYPE_OBS_THUMBNAIL,
+        "obs": instance,
+        "scene": thumbnail.scene,
+        "etag": thumbnail.etag,
+        "url": thumbnail_url(thumbnail.scene, instance),
+    }
+
+
+def _thumbnail_subscription(ws: WebSocket, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Handle obs:thumbnails:subscribe (``scenes``, ``obs``) and obs:thumbnails:unsubscribe.
+
+    The ack lists the thumbnails already cached; later ``obs:thumbnail`` messages
+    announce changed images, which are fetched from their ``url``.
+    """
+    kind = payload.get("kind")
+    response: Dict[str, Any] = {
+        "type": MESSAGE_TYPE_ACK,
+        "kind": kind,
+        "messageId": payload.get("messageId"),
+    }
+    _drop_thumbnails(ws)
+    if kind == MESSAGE_TYPE_OBS_THUMBNAILS_UNSUBSCRIBE:
+        return {**response, "status": STATUS_OK}
+    scenes = payload.get("scenes")
+    if not isinstance(scenes, list) or not scenes:
+        return {**response, "status": STATUS_ERROR, "error": "scenes required"}
+    target = payload.get("obs")
+    name = str(target) if target else obs.DEFAULT_INSTANCE
+    try:
+        service = obs.get_thumbnails(name)
+    except ValueError as exc:
+        return {**response, "status": STATUS_ERROR, "error": str(exc)}
+    watched = {str(scene) for scene in scenes if scene}
+    # Read before watching: whatever the first refresh changes is pushed afterwards
+    cached = [service.cache.get(scene) for scene in sorted(watched)]
+    thumbnail_subscriptions[ws] = (name, watched)
+    service.watch(ws, watched)
+    return {
+        **response,
+        "status": STATUS_OK,
+        "obs": name,
+        "thumbnails": [
+            _thumbnail_message(name, thumbnail) for thumbnail in cached if thumbnail is not None
+        ],
+    }
+
+
+def _drop_thumbnails(ws: WebSocket) -> None:
+    subscription = thumbnail_subscriptions.pop(ws, None)
+    if subscription is not None:
+        obs.get_thumbnails(subscription[0]).unwatch(ws)
+
+
+def _on_thumbnails(instance: str, changed: List[Any]) -> None:
+    """Hand changed thumbnails over to the WebSocket event loop (thread-safe)."""
+    loop = _loop
+    if loop is None or loop.is_closed():
+        return
+    asyncio.run_coroutine_threadsafe(_push_thumbnails(instance, changed), loop)
+
+
+async def _push_thumbnails(instance: str, changed: List[Any]) -> None:
+    messages = [_thumbnail_message(instance, thumbnail) for thumbnail in changed]
+    for client, (name, scenes) in list(thumbnail_subscriptions.items()):
+        if name != instance:
+            continue
+        for message in messages:
+            if message["scene"] not in scenes:
+                continue
+            try:
+                await client.send_json(message)
+            except Exception:
+                _drop_thumbnails(client)
+                break
+
+
+def _on_typed(client: Any, message_id: Any, result: Dict[str, Any]) -> None:
+    """Tell the client its keyboard:type text is done (called on the input thread)."""
+    loop = _loop
+    if loop is None or loop.is_closed() or client not in connections:
+        return
+    message = {"type": MESSAGE_TYPE_KEYBOARD_TYPED, "messageId": message_id, **result}
+    asyncio.run_coroutine_threadsafe(_push_to_client(client, message), loop)
+
+
+async def _push_to_client(client: WebSocket, message: Dict[str, Any]) -> None:
+    try:
+        await client.send_json(message)
+    except Exception:
+        connections.discard(client)
+
+
+def _script_output(
+    client: Optional[WebSocket], message_id: Any
+) -> Optional[Callable[[str, str], None]]:
+    """Callback streaming a script's output to the client that ran it as script:output events."""
+    if client is None:
+        return None
+
+    def on_output(stream: str, text: str) -> None:
+        loop = _loop
+        if loop is None or loop.is_closed() or client not in connections:
+            return
+        message = {
+            "type": MESSAGE_TYPE_SCRIPT_OUTPUT,
+            "messageId": message_id,
+            "stream": stream,
+            "data": text,
+        }
+        asyncio.run_coroutine_threadsafe(_push_to_client(client, message), loop)
+
+    return on_output
+
+
+# Client-side subscriptions to server-pushed streams, handled on the event loop
+STREAM_SUBSCRIPTIONS: Dict[str, Callable[[WebSocket, Dict[str, Any]], Dict[str, Any]]] = {
+    MESSAGE_TYPE_OBS_METERS_SUBSCRIBE: _meter_subscription,
+    MESSAGE_TYPE_OBS_METERS_UNSUBSCRIBE: _meter_subscription,
+    MESSAGE_TYPE_OBS_THUMBNAILS_SUBSCRIBE: _thumbnail_subscription,
+    MESSAGE_TYPE_OBS_THUMBNAILS_UNSUBSCRIBE: _thumbnail_subscription,
+}
 
 
 # Alias for inclusion in main app
@@ -101,6 +435,14 @@ websocket_router = router
 # Action handler mapping for cleaner dispatch
 ACTION_HANDLERS = {
     "keyboard": lambda data: actions.handle_keyboard(data),
+    "keyboard:down": lambda data: actions.handle_keyboard_down(data, current_client.get()),
+    "keyboard:up": lambda data: actions.handle_keyboard_up(data, current_client.get()),
+    "keyboard:type": lambda data: actions.handle_keyboard_type(
+        data, current_client.get(), current_message_id.get()
+    ),
+    "keyboard:type:cancel": lambda data: actions.handle_keyboard_type_cancel(
+        data, current_client.get()
+    ),
     "audio": lambda data: actions.handle_audio(
         data.get("action") if isinstance(data, dict) else "",
         data if isinstance(data, dict) else {},
@@ -109,7 +451,10 @@ ACTION_HANDLERS = {
         data.get("action") if isinstance(data, dict) else "",
         data if isinstance(data, dict) else {},
     ),
-    "scripts": lambda data: actions.run_script(data),
+    "obs:batch": lambda data: actions.handle_obs_batch(data),
+    "scripts": lambda data: actions.run_script(
+        data, _script_output(current_client.get(), current_message_id.get())
+    ),
     "system": lambda data: actions.handle_system(
         data.get("action") if isinstance(data, dict) else "",
         data if isinstance(data, dict) else {},
@@ -120,6 +465,24 @@ ACTION_HANDLERS = {
     "processes": lambda data: actions.list_processes(),
 }
 
+# Controls of the stored profiles, pre-validated and bound to their handlers
+control_index = ControlIndex(ProfileManager(settings), ACTION_HANDLERS)
+get_profile_events().add_listener("control-index", control_index.on_profile_event)
+obs.get_pool().add_state_listener(_on_obs_state)
+obs.get_pool().add_thumbnail_listener(_on_thumbnails)
+keyboard.add_typing_listener(_on_typed)
+
+# Mapping id -> action table compiled from config/mappings*.json, hot-reloaded on change
+mappings = MappingLoader(
+    [BUNDLED_CONFIG_DIR, settings.config_dir], ACTION_HANDLERS, settings.mappings_poll_interval
+)
+
+
+# Actions that block on OBS or a running script go to the default executor (script output is
+# streamed from the loop meanwhile); the others stay on the event loop thread like before, as
+# pycaw, clipboard and screenshots need its COM apartment
+OFFLOADED_ACTIONS = frozenset({"obs", "obs:batch", "scripts"})
+
 
 def _dispatch_action(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Dispatch incoming action to appropriate handler.
@@ -130,6 +493,16 @@ def _dispatch_action(payload: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Response dictionary with type, status, and result data
     """
+    return _prepare_action(payload)[1]()
+
+
+def _prepare_action(
+    payload: Dict[str, Any],
+) -> Tuple[Optional[str], Callable[[], Dict[str, Any]]]:
+    """Resolve a message to the action it runs and a call returning its response.
+
+    The action is None when the message is answered without running a handler.
+    """
     kind = payload.get("kind")
     action = payload.get("action")
     data = payload.get("payload")
@@ -137,12 +510,32 @@ def _dispatch_action(payload: Dict[str, Any]) -> Dict[str, Any]:
 
     # Handle profile selection
     if kind == "profile:select":
-        return {
-            "type": MESSAGE_TYPE_PROFILE_SELECT_ACK,
-            "status": STATUS_OK,
-            "profileId": payload.get("profileId"),
-            "messageId": message_id,
-        }
+        return _reply(
+            {
+                "type": MESSAGE_TYPE_PROFILE_SELECT_ACK,
+                "status": STATUS_OK,
+                "profileId": payload.get("profileId"),
+                "messageId": message_id,
+            }
+        )
+
+    # Press of a stored control: the action comes from the saved profile, not the client
+    if kind == MESSAGE_TYPE_CONTROL_PRESS:
+        return _prepare_control_press(payload)
+
+    # Trigger of a server-side mapping by id (config/mappings*.json)
+    if kind == MESSAGE_TYPE_MAPPING_TRIGGER:
+        return _prepare_mapping(payload)
+
+    if not settings.allow_raw_actions:
+        return _reply(
+            {
+                "type": MESSAGE_TYPE_ACK,
+                "status": STATUS_ERROR,
+                "error": "raw actions disabled",
+                "messageId": message_id,
+            }
+        )
 
     # Handle control kind wrapper
     if kind == "control":
@@ -150,24 +543,90 @@ def _dispatch_action(payload: Dict[str, Any]) -> Dict[str, Any]:
 
     # Validate action exists
     if not action:
-        return {
-            "type": MESSAGE_TYPE_ACK,
-            "status": STATUS_ERROR,
-            "error": "missing action",
-            "messageId": message_id,
-        }
+        return _reply(
+            {
+                "type": MESSAGE_TYPE_ACK,
+                "status": STATUS_ERROR,
+                "error": "missing action",
+                "messageId": message_id,
+            }
+        )
 
     # Dispatch to handler
-    try:
-        handler = ACTION_HANDLERS.get(action)
-        if not handler:
-            return {
+    handler = ACTION_HANDLERS.get(action)
+    if not handler:
+        return _reply(
+            {
                 "type": MESSAGE_TYPE_ACK,
                 "status": STATUS_ERROR,
                 "error": "unknown action",
                 "messageId": message_id,
             }
+        )
+    return action, lambda: _run_handler(action, handler, data, message_id)
+
+
+def _prepare_control_press(
+    payload: Dict[str, Any],
+) -> Tuple[Optional[str], Callable[[], Dict[str, Any]]]:
+    """Run the action stored for ``profileId``/``controlId`` in the control index."""
+    message_id = payload.get("messageId")
+    control_id = payload.get("controlId")
+    resolved = control_index.resolve(payload.get("profileId"), control_id)
+    if resolved is None:
+        return _reply(
+            {
+                "type": MESSAGE_TYPE_ACK,
+                "status": STATUS_ERROR,
+                "error": "unknown control",
+                "controlId": control_id,
+                "messageId": message_id,
+            }
+        )
 
+    def run() -> Dict[str, Any]:
+        response = _run_handler(resolved.action, resolved.handler, resolved.payload, message_id)
+        response.setdefault("controlId", control_id)
+        return response
+
+    return resolved.action, run
+
+
+def _prepare_mapping(
+    payload: Dict[str, Any],
+) -> Tuple[Optional[str], Callable[[], Dict[str, Any]]]:
+    """Run the action compiled for ``mappingId`` in the current mapping table."""
+    message_id = payload.get("messageId")
+    mapping_id = payload.get("mappingId")
+    resolved = mappings.resolve(mapping_id)
+    if resolved is None:
+        return _reply(
+            {
+                "type": MESSAGE_TYPE_ACK,
+                "status": STATUS_ERROR,
+                "error": "unknown mapping",
+                "mappingId": mapping_id,
+                "messageId": message_id,
+            }
+        )
+
+    def run() -> Dict[str, Any]:
+        response = _run_handler(resolved.action, resolved.handler, resolved.payload, message_id)
+        response.setdefault("mappingId", mapping_id)
+        return response
+
+    return resolved.action, run
+
+
+def _reply(response: Dict[str, Any]) -> Tuple[Optional[str], Callable[[], Dict[str, Any]]]:
+    return None, lambda: response
+
+
+def _run_handler(
+    action: str, handler: Callable[[Any], Dict[str, Any]], data: Any, message_id: Any
+) -> Dict[str, Any]:
+    current_message_id.set(message_id)
+    try:
         result = handler(data)
         return {
             "type": MESSAGE_TYPE_ACK,
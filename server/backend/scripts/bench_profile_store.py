@@ -0,0 +1,78 @@
+"""Benchmark the JSON and SQLite profile stores.
+
+Usage (from server/backend):
+    python scripts/bench_profile_store.py [--profiles 10000] [--backends json,sqlite]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.config import Settings  # noqa: E402
+from app.utils.profile_manager import ProfileManager  # noqa: E402
+
+ACTION_KINDS = ["keyboard", "obs", "audio", "scripts"]
+
+
+def make_profile(index: int) -> dict:
+    controls = [
+        {
+            "id": f"c{row}-{col}",
+            "type": "button",
+            "row": row,
+            "col": col,
+            "label": f"Button {row}-{col}",
+            "action": {"type": ACTION_KINDS[index % len(ACTION_KINDS)], "payload": "ctrl+c"},
+        }
+        for row in range(4)
+        for col in range(4)
+    ]
+    return {"id": f"profile-{index:05d}", "name": f"Profile {index}", "rows": 4, "cols": 4, "controls": controls}
+
+
+def timed(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"  {label:<28} {(time.perf_counter() - start) * 1000:10.1f} ms")
+    return result
+
+
+def run(backend: str, count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(deck_data_dir=Path(tmp), profile_store=backend)
+        settings.ensure_runtime_dirs()
+        manager = ProfileManager(settings)
+        profiles = [make_profile(index) for index in range(count)]
+        print(f"{backend} ({count} profiles)")
+
+        def save_all():
+            for profile in profiles:
+                manager.save_profile(profile["id"], profile)
+            manager.flush()
+
+        timed("save all", save_all)
+        listed = timed("list_profiles", manager.list_profiles)
+        assert len(listed) == count
+        sample = random.sample([p["id"] for p in profiles], min(1000, count))
+        timed(f"get_profile x{len(sample)}", lambda: [manager.get_profile(pid) for pid in sample])
+        matches = timed("find_profiles_by_action", lambda: manager.find_profiles_by_action("obs"))
+        print(f"  ({len(matches)} profiles use obs)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", type=int, default=10000)
+    parser.add_argument("--backends", default="json,sqlite")
+    args = parser.parse_args()
+    for backend in args.backends.split(","):
+        run(backend.strip(), args.profiles)
+
+
+if __name__ == "__main__":
+    main()
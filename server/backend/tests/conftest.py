@@ -10,6 +10,8 @@ from fastapi.testclient import TestClient
 
 from app.config import Settings, reset_settings_cache
 from app.main import app
+from app.utils.profile_history import _flush_all_histories
+from app.utils.profile_writer import _flush_all_writers
 from app.utils.rate_limiter import RateLimiter
 from app.utils.token_manager import TokenManager
 
@@ -19,6 +21,9 @@ def temp_data_dir() -> Generator[Path, None, None]:
     """Create a temporary data directory for tests."""
     with tempfile.TemporaryDirectory() as tmpdir:
         yield Path(tmpdir)
+        # Let background profile and history writes land before the directory goes away
+        _flush_all_writers()
+        _flush_all_histories()
 
 
 @pytest.fixture
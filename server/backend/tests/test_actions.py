@@ -1,13 +1,39 @@
 """Tests for action handlers."""
 from __future__ import annotations
 
+import threading
+import time
+
 import pytest
 
+from app.actions import keyboard as keyboard_module
 from app.actions.audio import handle_audio
-from app.actions.keyboard import _parse_combo, handle_keyboard
+from app.actions.keyboard import (
+    HeldKeys,
+    TextTyper,
+    _parse_combo,
+    _parse_combo_cached,
+    handle_keyboard,
+    handle_keyboard_down,
+    handle_keyboard_type,
+    handle_keyboard_type_cancel,
+    handle_keyboard_up,
+)
+from app.actions.keyboard_backend import KeyboardController, RecordingBackend
 from app.actions.system import handle_system
 
 
+@pytest.fixture
+def keyboard(monkeypatch):
+    """Keyboard controller with the recording null backend."""
+    controller = KeyboardController(RecordingBackend())
+    monkeypatch.setattr(keyboard_module, "_controller", controller)
+    monkeypatch.setattr(keyboard_module, "_held", None)
+    monkeypatch.setattr(keyboard_module, "_typer", None)
+    yield controller
+    controller.close()
+
+
 class TestKeyboardActions:
     """Test keyboard action handlers."""
 
@@ -41,22 +67,76 @@ class TestKeyboardActions:
         result = _parse_combo("ctrl + + shift")
         assert result == ["ctrl", "shift"]
 
-    def test_handle_keyboard_valid_combo(self, monkeypatch):
+    def test_handle_keyboard_valid_combo(self, keyboard):
         """Test handling a valid keyboard combo."""
-        # Mock pyautogui.hotkey
-        called_with = []
-
-        def mock_hotkey(*keys):
-            called_with.extend(keys)
-
-        import app.actions.keyboard as keyboard_module
-        monkeypatch.setattr(keyboard_module.pyautogui, "hotkey", mock_hotkey)
-
         result = handle_keyboard("ctrl+c")
 
         assert result["status"] == "ok"
         assert result["combo"] == "ctrl+c"
-        assert called_with == ["ctrl", "c"]
+        assert keyboard.backend.keys() == [("down", "ctrl"), ("down", "c"), ("up", "c"), ("up", "ctrl")]
+
+    def test_parse_combo_is_cached(self):
+        """Test that repeated combos are parsed once."""
+        _parse_combo_cached.cache_clear()
+        _parse_combo("ctrl+alt+k")
+        _parse_combo("ctrl+alt+k")
+        assert _parse_combo_cached.cache_info().hits == 1
+
+    def test_keys_from_many_threads_never_interleave(self, keyboard):
+        """Test that concurrent combos are serialized on the input thread."""
+        threads = [threading.Thread(target=handle_keyboard, args=(f"ctrl+{key}",)) for key in "abcdefgh"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        events = keyboard.backend.keys()
+        assert len(events) == 32
+        for start in range(0, 32, 4):
+            combo = events[start:start + 4]
+            key = combo[1][1]
+            assert combo == [("down", "ctrl"), ("down", key), ("up", key), ("up", "ctrl")]
+
+    def test_failed_press_releases_pressed_keys(self):
+        """Test that a backend error doesn't leave modifiers held down."""
+
+        class Failing(RecordingBackend):
+            def press(self, key):
+                if key == "bad":
+                    raise ValueError("Unknown key: bad")
+                super().press(key)
+
+        controller = KeyboardController(Failing())
+        try:
+            with pytest.raises(ValueError, match="Unknown key"):
+                controller.hotkey(["shift", "bad"]).result(1)
+            assert controller.backend.keys() == [("down", "shift"), ("up", "shift")]
+        finally:
+            controller.close()
+
+    def test_key_delay_spaces_events(self):
+        """Test the configurable inter-key delay."""
+        controller = KeyboardController(RecordingBackend(), key_delay=0.02)
+        try:
+            controller.hotkey(["ctrl", "c"]).result(1)
+            times = [at for _, _, at in controller.backend.events]
+            assert times[-1] - times[0] >= 0.05
+        finally:
+            controller.close()
+
+    def test_pynput_backend_resolves_every_pyautogui_key(self):
+        """Test that every pyautogui key name maps to pynput or is sent through pyautogui."""
+        from app.actions.keyboard_backend import PynputBackend
+
+        try:
+            import pyautogui
+
+            backend = PynputBackend()
+        except Exception as exc:  # both need a display
+            pytest.skip(f"pynput/pyautogui unavailable: {exc}")
+        for key in pyautogui.KEYBOARD_KEYS:
+            backend._resolve(key)  # ValueError("Unknown key: ...") otherwise
+        assert backend._resolve("num0") is None
 
     def test_handle_keyboard_empty_string(self):
         """Test that empty strings are rejected."""
@@ -77,6 +157,158 @@ class TestKeyboardActions:
             handle_keyboard(None)  # type: ignore
 
 
+class TestHeldKeys:
+    """Test press-and-hold with the held-key registry."""
+
+    def test_down_and_up_hold_keys_for_a_client(self, keyboard):
+        """Test that keyboard:down holds keys until keyboard:up."""
+        assert handle_keyboard_down("ctrl+m", client="deck")["held"] == ["ctrl", "m"]
+        assert keyboard.backend.keys() == [("down", "ctrl"), ("down", "m")]
+
+        assert handle_keyboard_up("ctrl+m", client="deck")["released"] == ["m", "ctrl"]
+        assert keyboard.backend.keys()[2:] == [("up", "m"), ("up", "ctrl")]
+        assert keyboard_module.get_held_keys().stats()["clients"] == 0
+
+    def test_shared_key_released_by_last_holder(self, keyboard):
+        """Test that a key held by two clients is pressed and released once."""
+        held = HeldKeys(keyboard)
+        held.down("a", ("f13",)).result(1)
+        held.down("b", ("f13",)).result(1)
+        held.up("a").result(1)
+        assert keyboard.backend.keys() == [("down", "f13")]
+
+        held.up("b").result(1)
+        assert keyboard.backend.keys() == [("down", "f13"), ("up", "f13")]
+
+    def test_release_all_on_disconnect(self, keyboard):
+        """Test that release_client lets go of everything a client holds."""
+        handle_keyboard_down("shift", client="deck")
+        handle_keyboard_down("f13", client="deck")
+        keyboard_module.release_client("deck")
+        keyboard.submit(lambda: None).result(1)
+
+        assert keyboard.backend.keys()[2:] == [("up", "f13"), ("up", "shift")]
+
+    def test_unresponsive_client_is_released(self, keyboard):
+        """Test that holds expire once a client stops sending heartbeats."""
+        held = HeldKeys(keyboard, timeout=0.1)
+        held.down("deck", ("f13",)).result(1)
+        for _ in range(3):
+            time.sleep(0.05)
+            held.touch("deck")
+        assert held.held("deck") == ["f13"]
+
+        time.sleep(0.2)
+        assert held.held("deck") == []
+        assert keyboard.backend.keys() == [("down", "f13"), ("up", "f13")]
+        assert held.stats()["expired"] == 1
+
+    def test_timed_release_is_precise(self, keyboard):
+        """Test that a hold with durationMs is released on time by the input thread."""
+        handle_keyboard_down({"keys": "f13", "durationMs": 50}, client="deck")
+        time.sleep(0.15)
+
+        (_, _, pressed), (_, _, released) = keyboard.backend.events
+        # Sub-ms when idle; the margin covers GIL hand-offs on a busy test machine
+        assert 0.05 <= released - pressed < 0.07
+        assert keyboard.stats()["maxLateMs"] < 10
+
+    def test_timed_release_skips_newer_hold(self, keyboard):
+        """Test that an old timed release doesn't end a hold started after it."""
+        held = HeldKeys(keyboard)
+        held.down("deck", ("f13",), 0.05).result(1)
+        held.up("deck").result(1)
+        held.down("deck", ("f13",)).result(1)
+        time.sleep(0.1)
+
+        assert held.held("deck") == ["f13"]
+
+    def test_hold_payload_validation(self, keyboard):
+        """Test that hold payloads need a combo and a numeric duration."""
+        with pytest.raises(ValueError, match="key combo"):
+            handle_keyboard_down({"durationMs": 10})
+        with pytest.raises(ValueError, match="durationMs"):
+            handle_keyboard_down({"keys": "a", "durationMs": "soon"})
+
+
+class TestTextTyper:
+    """Test chunked text typing (keyboard:type)."""
+
+    def test_types_in_chunks_at_rate(self, keyboard):
+        """Test that text goes out chunk by chunk at the configured rate."""
+        typer = TextTyper(keyboard, rate=200, chunk=4)
+        assert typer.type("deck", "m1", "hello world!").result(2) == {"typed": 12, "cancelled": False}
+
+        chunks = [(text, at) for event, text, at in keyboard.backend.events]
+        assert [text for text, _ in chunks] == ["hell", "o wo", "rld!"]
+        # 8 characters between the first and last chunk at 200 chars/s
+        assert 0.039 <= chunks[-1][1] - chunks[0][1] < 0.06
+
+    def test_unicode_text_is_normalized(self, keyboard):
+        """Test that decomposed accents are composed and CRLF becomes one newline."""
+        typer = TextTyper(keyboard, rate=0, chunk=3)
+        typer.type("deck", None, "e\u0301te\u0301\r\n✓ 日本").result(2)
+
+        assert "".join(text for _, text, _ in keyboard.backend.events) == "été\n✓ 日本"
+
+    def test_cancel_stops_before_next_chunk(self, keyboard):
+        """Test that a text is cancelled by its messageId while it runs."""
+        typer = TextTyper(keyboard, rate=100, chunk=1)
+        future = typer.type("deck", "m1", "x" * 100)
+        time.sleep(0.05)
+        assert typer.cancel("other", "m1").result(1) is False
+        assert typer.cancel("deck", "m1").result(1) is True
+
+        result = future.result(1)
+        assert result["cancelled"] is True
+        assert 0 < result["typed"] < 100
+        time.sleep(0.05)
+        assert len(keyboard.backend.events) == result["typed"]
+
+    def test_texts_never_interleave(self, keyboard):
+        """Test that queued texts are typed one after another."""
+        typer = TextTyper(keyboard, rate=1000, chunk=2)
+        first = typer.type("a", "m1", "abcdef")
+        second = typer.type("b", "m1", "uvwxyz")
+        first.result(1), second.result(1)
+
+        assert "".join(text for _, text, _ in keyboard.backend.events) == "abcdefuvwxyz"
+
+    def test_handler_acks_queued_text_and_notifies_listener(self, keyboard):
+        """Test that keyboard:type returns at once and listeners hear when it's done."""
+        done = threading.Event()
+        results = []
+
+        def listener(client, message_id, result):
+            results.append((client, message_id, result))
+            done.set()
+
+        keyboard_module.get_typer().add_listener(listener)
+
+        assert handle_keyboard_type({"text": "hi", "rate": 100}, client="deck", message_id="m1") == {
+            "status": "ok",
+            "queued": 2,
+            "etaMs": 20,
+        }
+        assert done.wait(1)
+        assert results == [("deck", "m1", {"status": "ok", "typed": 2, "cancelled": False})]
+        assert handle_keyboard_type_cancel("m1", client="deck")["cancelled"] is False
+
+    def test_disconnect_cancels_typing(self, keyboard):
+        """Test that release_client cancels the client's texts."""
+        future = keyboard_module.get_typer().type("deck", "m1", "x" * 100, 100)
+        keyboard_module.release_client("deck")
+
+        assert future.result(1)["cancelled"] is True
+
+    def test_type_payload_validation(self, keyboard):
+        """Test that keyboard:type needs text and a numeric rate."""
+        with pytest.raises(ValueError, match="non-empty string"):
+            handle_keyboard_type({"text": ""})
+        with pytest.raises(ValueError, match="rate"):
+            handle_keyboard_type({"text": "a", "rate": "fast"})
+
+
 class TestAudioActions:
     """Test audio action handlers."""
 
@@ -0,0 +1,1017 @@
+"""Tests for the OBS clients against local fake OBS servers (HTTP and WebSocket v5)."""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from websockets.asyncio.server import serve
+
+from app.actions import obs
+from app.actions.obs import (
+    OBSClient,
+    OBSInstance,
+    OBSPool,
+    OBSSourceManager,
+    OBSTransitionManager,
+    SceneItemCache,
+    handle_obs,
+    handle_obs_batch,
+    state_binding,
+)
+from app.actions.obs_actions import OBS_ACTIONS, OBSAction, Param, compile_actions
+from app.actions.obs_meters import AudioMeterHub, quantize
+from app.actions.obs_state import OBSStateMirror
+from app.actions.obs_thumbnails import Thumbnail, ThumbnailCache, ThumbnailService
+from app.utils.circuit_breaker import AdaptiveTimeout, CircuitBreaker
+from app.actions.obs_ws import EVENT_SUBSCRIPTION_ALL, EVENT_SUBSCRIPTION_INPUT_VOLUME_METERS, OBSWebSocketClient, auth_response
+
+
+class FakeOBSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections += 1  # type: ignore[attr-defined]
+
+    def do_POST(self) -> None:  # noqa: N802
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append({**body, "auth": self.headers.get("Authorization")})  # type: ignore[attr-defined]
+        code = 100 if body["requestType"] != "Missing" else 404
+        data = json.dumps(
+            {"requestStatus": {"code": code, "comment": "nope"}, "responseData": {"echo": body["requestType"]}}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def fake_obs() -> Iterator[ThreadingHTTPServer]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOBSHandler)
+    server.connections = 0  # type: ignore[attr-defined]
+    server.requests: List[Dict] = []  # type: ignore[attr-defined]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestOBSClientPool:
+    """Test the pooled keep-alive HTTP connection."""
+
+    def test_calls_reuse_one_connection(self, fake_obs: ThreadingHTTPServer):
+        """Test that consecutive calls share a single TCP connection and auth header."""
+        client = OBSClient(f"ws://127.0.0.1:{fake_obs.server_port}", password="secret")
+        try:
+            for _ in range(5):
+                assert client.call("GetVersion") == {"echo": "GetVersion"}
+
+            stats = client.stats()
+            assert fake_obs.connections == 1  # type: ignore[attr-defined]
+            assert stats["requests"] == 5
+            assert stats["poolsCreated"] == 1
+            assert stats["open"] == 1
+            assert fake_obs.requests[0]["auth"].startswith("Basic ")  # type: ignore[attr-defined]
+        finally:
+            client.close()
+
+    def test_close_and_reopen_lazily(self, fake_obs: ThreadingHTTPServer):
+        """Test that close() drops the pool and the next call creates a new one."""
+        client = OBSClient(f"ws://127.0.0.1:{fake_obs.server_port}")
+        assert client.stats()["poolsCreated"] == 0
+
+        client.call("GetVersion")
+        client.close()
+        client.call("GetVersion")
+        client.close()
+
+        assert client.stats()["poolsCreated"] == 2
+        assert fake_obs.connections == 2  # type: ignore[attr-defined]
+
+    def test_request_errors_are_counted(self, fake_obs: ThreadingHTTPServer):
+        """Test that OBS status errors surface as RuntimeError and count as failures."""
+        client = OBSClient(f"ws://127.0.0.1:{fake_obs.server_port}")
+        try:
+            with pytest.raises(RuntimeError, match="not found"):
+                client.call("Missing")
+        finally:
+            client.close()
+
+        unreachable = OBSClient("ws://127.0.0.1:9", timeout=0.5)
+        with pytest.raises(RuntimeError):
+            unreachable.call("GetVersion")
+        assert unreachable.stats()["failures"] == 1
+
+
+class FakeOBSWebSocket:
+    """Minimal obs-websocket v5 server on its own event loop thread.
+
+    ``Sleep`` requests answer after ``requestData.ms`` milliseconds, concurrently with
+    other requests, so responses can arrive out of order.
+    """
+
+    SALT = "salt"
+    CHALLENGE = "challenge"
+
+    def __init__(self, password: str = ""):
+        self.password = password
+        self.connections = 0
+        self.requests: List[Dict[str, Any]] = []
+        self.batches: List[Dict[str, Any]] = []
+        self.responses: Dict[str, Dict[str, Any]] = {}
+        self.sockets: List[Any] = []
+        self.loop = asyncio.new_event_loop()
+        self.port = 0
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(ready,), daemon=True)
+        self.thread.start()
+        ready.wait(5)
+
+    def _run(self, ready: threading.Event) -> None:
+        asyncio.set_event_loop(self.loop)
+
+        async def start() -> Any:
+            return await serve(self._handle, "127.0.0.1", 0)
+
+        self.server = self.loop.run_until_complete(start())
+        self.port = self.server.sockets[0].getsockname()[1]
+        ready.set()
+        self.loop.run_forever()
+
+    async def _handle(self, ws: Any) -> None:
+        self.connections += 1
+        hello: Dict[str, Any] = {"obsWebSocketVersion": "5.0.0", "rpcVersion": 1}
+        if self.password:
+            hello["authentication"] = {"salt": self.SALT, "challenge": self.CHALLENGE}
+        await ws.send(json.dumps({"op": 0, "d": hello}))
+        identify = json.loads(await ws.recv())["d"]
+        if self.password and identify.get("authentication") != auth_response(self.password, self.SALT, self.CHALLENGE):
+            await ws.close(4009, "Authentication failed")
+            return
+        await ws.send(json.dumps({"op": 2, "d": {"negotiatedRpcVersion": 1}}))
+        self.sockets.append(ws)
+        async for raw in ws:
+            message = json.loads(raw)
+            if message["op"] == 8:
+                self.batches.append(message["d"])
+                asyncio.ensure_future(self._respond_batch(ws, message["d"]))
+            else:
+                self.requests.append(message["d"])
+                asyncio.ensure_future(self._respond(ws, message["d"]))
+
+    async def _execute(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        request_type = request["requestType"]
+        if request_type == "Sleep":
+            await asyncio.sleep(request["requestData"]["ms"] / 1000)
+        code = 600 if request_type == "Missing" else 100
+        response_data = self.responses.get(request_type, {"echo": request_type, **request.get("requestData", {})})
+        return {
+            "requestType": request_type,
+            "requestStatus": {"result": code == 100, "code": code, "comment": "nope"},
+            "responseData": response_data,
+        }
+
+    async def _respond(self, ws: Any, request: Dict[str, Any]) -> None:
+        response = await self._execute(request)
+        await ws.send(json.dumps({"op": 7, "d": {**response, "requestId": request["requestId"]}}))
+
+    async def _respond_batch(self, ws: Any, batch: Dict[str, Any]) -> None:
+        results = []
+        for request in batch["requests"]:
+            results.append({**await self._execute(request), "requestId": request.get("requestId")})
+            if batch.get("haltOnFailure") and not results[-1]["requestStatus"]["result"]:
+                break
+        if batch["executionType"] == 2:
+            # Parallel results come back as they finish, not in request order
+            results.reverse()
+        await ws.send(json.dumps({"op": 9, "d": {"requestId": batch["requestId"], "results": results}}))
+
+    def drop_connections(self) -> None:
+        async def drop() -> None:
+            for ws in self.sockets:
+                await ws.close(1001, "going away")
+            self.sockets.clear()
+
+        asyncio.run_coroutine_threadsafe(drop(), self.loop).result(5)
+
+    def send_event(self, event_type: str, event_data: Dict[str, Any]) -> None:
+        async def send() -> None:
+            for ws in self.sockets:
+                await ws.send(json.dumps({"op": 5, "d": {"eventType": event_type, "eventIntent": 1, "eventData": event_data}}))
+
+        asyncio.run_coroutine_threadsafe(send(), self.loop).result(5)
+
+    def stop(self) -> None:
+        async def shutdown() -> None:
+            self.server.close()
+            await self.server.wait_closed()
+            for task in asyncio.all_tasks():
+                if task is not asyncio.current_task():
+                    task.cancel()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+
+@pytest.fixture
+def fake_obs_ws() -> Iterator[FakeOBSWebSocket]:
+    server = FakeOBSWebSocket(password="secret")
+    yield server
+    server.stop()
+
+
+class TestOBSWebSocketClient:
+    """Test the native obs-websocket v5 transport."""
+
+    def test_authenticates_and_reuses_one_socket(self, fake_obs_ws: FakeOBSWebSocket):
+        """Test that the client identifies with the password and sends every call over one socket."""
+        client = OBSWebSocketClient(f"ws://127.0.0.1:{fake_obs_ws.port}", password="secret", timeout=5)
+        try:
+            for _ in range(5):
+                assert client.call("GetVersion") == {"echo": "GetVersion"}
+
+            stats = client.stats()
+            assert fake_obs_ws.connections == 1
+            assert stats["transport"] == "websocket"
+            assert stats["connected"] is True
+            assert stats["requests"] == 5
+            assert len({request["requestId"] for request in fake_obs_ws.requests}) == 5
+        finally:
+            client.close()
+
+    def test_concurrent_requests_are_multiplexed(self, fake_obs_ws: FakeOBSWebSocket):
+        """Test that out-of-order responses are matched to their callers by requestId."""
+        client = OBSWebSocketClient(f"ws://127.0.0.1:{fake_obs_ws.port}", password="secret", timeout=5)
+        results: Dict[int, Dict[str, Any]] = {}
+
+        def worker(index: int) -> None:
+            # Later workers sleep less, so they are answered first
+            results[index] = client.call("Sleep", {"ms": 200 - index * 20, "index": index})
+
+        try:
+            client.call("GetVersion")
+            threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+            elapsed = time.perf_counter() - started
+
+            assert {index: result["index"] for index, result in results.items()} == {i: i for i in range(8)}
+            # Served concurrently, not one after another (8 sequential calls take ~1.1s)
+            assert elapsed < 0.8
+            assert fake_obs_ws.connections == 1
+        finally:
+            client.close()
+
+    async def test_call_async(self, fake_obs_ws: FakeOBSWebSocket):
+        """Test that call_async can be awaited from another event loop."""
+        client = OBSWebSocketClient(f"ws://127.0.0.1:{fake_obs_ws.port}", password="secret", timeout=5)
+        try:
+            results = await asyncio.gather(*(client.call_async("Sleep", {"ms": 10, "n": n}) for n in range(3)))
+            assert [result["n"] for result in results] == [0, 1, 2]
+        finally:
+            client.close()
+
+    def test_reconnects_after_disconnect(self, fake_obs_ws: FakeOBSWebSocket):
+        """Test that the client re-establishes the socket after the server drops it."""
+        client = OBSWebSocketClient(
+            f"ws://127.0.0.1:{fake_obs_ws.port}", password="secret", timeout=5, reconnect_base=0.05
+        )
+        try:
+            client.call("GetVersion")
+            fake_obs_ws.drop_connections()
+            assert client.call("GetVersion") == {"echo": "GetVersion"}
+            assert fake_obs_ws.connections == 2
+            assert client.stats()["connects"] == 2
+        finally:
+            client.close()
+
+    def test_pending_requests_fail_on_disconnect(self, fake_obs_ws: FakeOBSWebSocket):
+        """Test that a request in flight fails fast when the connection drops."""
+        client = OBSWebSocketClient(f"ws://127.0.0.1:{fake_obs_ws.port}", password="secret", timeout=5)
+        try:
+            client.call("GetVersion")
+            threading.Timer(0.1, fake_obs_ws.drop_connections).start()
+            started = time.perf_counter()
+            with pytest.raises(RuntimeError, match="connection lost"):
+                client.call("Sleep", {"ms": 3000})
+            assert time.perf_counter() - started < 2
+        finally:
+            client.close()
+
+    def test_slow_requests_do_not_trip_the_breaker(self, fake_obs_ws: FakeOBSWebSocket):
+        """Test that timeouts on a live socket leave the breaker closed and batches get per-request time."""
+        client = OBSWebSocketClient(
+            f"ws://127.0.0.1:{fake_obs_ws.port}", password="secret", timeout=0.3, breaker_threshold=1
+        )
+        try:
+            client.connect()
+            wait_for(lambda: client.connected)
+            for _ in range(2):
+                with pytest.raises(RuntimeError, match="timeout"):
+                    client.call("Sleep", {"ms": 600})
+            assert client.stats()["breaker"]["state"] == "closed"
+            assert client.stats()["timeouts"] == 2
+
+            # Three 200 ms requests outlast one request timeout but not three
+            results = client.call_batch([{"requestType": "Sleep", "requestData": {"ms": 200}}] * 3, "parallel")
+            assert [result["ok"] for result in results] == [True, True, True]
+        finally:
+            client.close()
+
+    def test_errors(self, fake_obs_ws: FakeOBSWebSocket):
+        """Test request status errors, bad passwords and unreachable servers."""
+        client = OBSWebSocketClient(f"ws://127.0.0.1:{fake_obs_ws.port}", password="secret", timeout=5)
+        try:
+            with pytest.raises(RuntimeError, match="not found"):
+                client.call("Missing")
+            assert client.stats()["failures"] == 0
+        finally:
+            client.close()
+
+        wrong = OBSWebSocketClient(f"ws://127.0.0.1:{fake_obs_ws.port}", password="wrong", timeout=1)
+        try:
+            with pytest.raises(RuntimeError):
+                wrong.call("GetVersion")
+            assert wrong.stats()["failures"] == 1
+        finally:
+            wrong.close()
+
+        unreachable = OBSWebSocketClient("ws://127.0.0.1:9", timeout=0.5)
+        try:
+            with pytest.raises(RuntimeError, match="Cannot connect"):
+                unreachable.call("GetVersion")
+        finally:
+            unreachable.close()
+
+
+class FakeSceneClient:
+    """In-process OBS stand-in that records requests and validates sceneItemIds."""
+
+    def __init__(self):
+        self.scenes: Dict[str, Dict[str, int]] = {"Main": {"Camera": 1, "Overlay": 2}}
+        self.calls: List[str] = []
+
+    def call(self, request_type: str, request_data: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        self.calls.append(request_type)
+        items = self.scenes[request_data["sceneName"]]
+        if request_type == "GetSceneItemList":
+            return {"sceneItems": [{"sourceName": name, "sceneItemId": item_id} for name, item_id in items.items()]}
+        if request_data["sceneItemId"] not in items.values():
+            raise RuntimeError("OBS resource not found: No scene items were found")
+        return {}
+
+    def call_batch(self, requests, execution_type="serial", halt_on_failure=False):
+        self.calls.append("RequestBatch:" + ",".join(request["requestType"] for request in requests))
+        results = []
+        for request in requests:
+            items = self.scenes[request["requestData"]["sceneName"]]
+            ok = request["requestData"]["sceneItemId"] in items.values()
+            results.append({"requestType": request["requestType"], "ok": ok, "code": 100 if ok else 600, "comment": None, "responseData": {}})
+            if halt_on_failure and not ok:
+                break
+        return results
+
+
+class TestSceneItemCache:
+    """Test the (sceneName, sourceName) -> sceneItemId cache."""
+
+    def test_toggles_cost_one_request_after_first_lookup(self):
+        """Test that only the first press in a scene pays for GetSceneItemList."""
+        client = FakeSceneClient()
+        sources = OBSSourceManager(client, SceneItemCache(ttl=30))
+
+        sources.set_source_visibility("Main", "Camera", False)
+        sources.set_source_visibility("Main", "Camera", True)
+        sources.set_source_locked("Main", "Overlay", True)
+
+        assert client.calls == ["GetSceneItemList", "SetSceneItemEnabled", "SetSceneItemEnabled", "SetSceneItemLocked"]
+        assert sources.cache.stats()["hits"] == 2
+
+    def test_stale_id_is_refreshed_once(self):
+        """Test that a failed command with a cached id reloads the scene and retries."""
+        client = FakeSceneClient()
+        sources = OBSSourceManager(client, SceneItemCache(ttl=30))
+        sources.set_source_visibility("Main", "Camera", True)
+
+        client.scenes["Main"]["Camera"] = 7
+        client.calls.clear()
+        sources.set_source_visibility("Main", "Camera", False)
+
+        assert client.calls == ["SetSceneItemEnabled", "GetSceneItemList", "SetSceneItemEnabled"]
+        assert sources.cache.get("Main", "Camera") == 7
+
+        del client.scenes["Main"]["Overlay"]
+        with pytest.raises(RuntimeError, match="Source not found"):
+            sources.set_source_visibility("Main", "Overlay", False)
+
+    def test_ttl_and_events(self):
+        """Test expiry, scene-scoped event invalidation and reconnect invalidation."""
+        now = [0.0]
+        cache = SceneItemCache(ttl=10, clock=lambda: now[0])
+        items = [{"sourceName": "Camera", "sceneItemId": 1}]
+        cache.store("Main", items, cache.generation)
+        cache.store("Other", items, cache.generation)
+
+        now[0] = 11
+        assert cache.get("Main", "Camera") is None
+
+        cache.store("Main", items, cache.generation)
+        cache.store("Other", items, cache.generation)
+        cache.on_event("SceneItemRemoved", {"sceneName": "Main", "sourceName": "Camera", "sceneItemId": 1})
+        assert cache.get("Main", "Camera") is None
+        assert cache.get("Other", "Camera") == 1
+
+        # A list fetched before an invalidation is not stored after it
+        generation = cache.generation
+        cache.on_event(None, {})
+        cache.store("Main", items, generation)
+        assert cache.get("Main", "Camera") is None
+        assert cache.get("Other", "Camera") is None
+
+    def test_disabled_with_zero_ttl(self):
+        """Test that ttl=0 looks the item up on every command."""
+        client = FakeSceneClient()
+        sources = OBSSourceManager(client, SceneItemCache(ttl=0))
+        sources.set_source_visibility("Main", "Camera", True)
+        sources.set_source_visibility("Main", "Camera", True)
+        assert client.calls.count("GetSceneItemList") == 2
+
+    def test_websocket_events_invalidate(self, fake_obs_ws: FakeOBSWebSocket):
+        """Test that scene item events pushed by OBS reach the manager's cache."""
+        client = OBSWebSocketClient(f"ws://127.0.0.1:{fake_obs_ws.port}", password="secret", timeout=5)
+        try:
+            sources = OBSSourceManager(client)
+            client.call("GetVersion")
+            sources.cache.store("Main", [{"sourceName": "Camera", "sceneItemId": 1}], sources.cache.generation)
+
+            fake_obs_ws.send_event("SceneItemCreated", {"sceneName": "Main", "sourceName": "Logo", "sceneItemId": 3})
+            deadline = time.monotonic() + 2
+            while sources.cache.get("Main", "Camera") is not None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert sources.cache.get("Main", "Camera") is None
+        finally:
+            client.close()
+
+
+class TestOBSRequestBatch:
+    """Test RequestBatch support and the compound actions built on it."""
+
+    def test_batch_is_one_message(self, fake_obs_ws: FakeOBSWebSocket):
+        """Test that a batch is sent as a single RequestBatch and results keep request order."""
+        client = OBSWebSocketClient(f"ws://127.0.0.1:{fake_obs_ws.port}", password="secret", timeout=5)
+        try:
+            results = client.call_batch(
+                [
+                    {"requestType": "GetVersion"},
+                    {"requestType": "Missing", "requestData": {"a": 1}},
+                    {"requestType": "GetStats"},
+                ]
+            )
+            assert [result["requestType"] for result in results] == ["GetVersion", "Missing", "GetStats"]
+            assert [result["ok"] for result in results] == [True, False, True]
+            assert results[1]["code"] == 600
+            assert len(fake_obs_ws.batches) == 1 and not fake_obs_ws.requests
+            assert fake_obs_ws.batches[0]["executionType"] == 0
+
+            halted = client.call_batch(
+                [{"requestType": "Missing"}, {"requestType": "GetVersion"}], execution_type="parallel", halt_on_failure=True
+            )
+            assert len(halted) == 1
+            assert fake_obs_ws.batches[1]["executionType"] == 2
+
+            with pytest.raises(ValueError):
+                client.call_batch([{"requestType": "GetVersion"}], execution_type="sideways")
+            with pytest.raises(ValueError):
+                client.call_batch([{"requestData": {}}])
+        finally:
+            client.close()
+
+    def test_http_fallback_has_the_same_contract(self, fake_obs: ThreadingHTTPServer):
+        """Test that the HTTP client sends batches request by request with the same result shape."""
+        client = OBSClient(f"ws://127.0.0.1:{fake_obs.server_port}")
+        try:
+            results = client.call_batch([{"requestType": "GetVersion"}, {"requestType": "Missing"}, {"requestType": "GetStats"}], halt_on_failure=True)
+            assert [(result["requestType"], result["ok"]) for result in results] == [("GetVersion", True), ("Missing", False)]
+            assert results[0]["responseData"] == {"echo": "GetVersion"}
+        finally:
+            client.close()
+
+    def test_compound_handlers_batch(self):
+        """Test that multi-field source updates and named transitions use one batch."""
+        client = FakeSceneClient()
+        sources = OBSSourceManager(client, SceneItemCache(ttl=30))
+        sources.update_source("Main", "Camera", {"visible": True, "x": 10, "y": 20, "width": 640, "height": 360})
+        assert client.calls == ["GetSceneItemList", "RequestBatch:SetSceneItemEnabled,SetSceneItemTransform"]
+
+        client.scenes["Main"]["Camera"] = 9
+        client.calls.clear()
+        sources.update_source("Main", "Camera", {"locked": True})
+        assert client.calls == ["RequestBatch:SetSceneItemLocked", "GetSceneItemList", "RequestBatch:SetSceneItemLocked"]
+
+        recorded: List[Any] = []
+
+        class Recorder:
+            def call(self, request_type, request_data=None):
+                recorded.append(request_type)
+                return {}
+
+            def call_batch(self, requests, execution_type="serial", halt_on_failure=False):
+                recorded.append([request["requestType"] for request in requests])
+                return [{"requestType": request["requestType"], "ok": True, "code": 100, "comment": None, "responseData": {}} for request in requests]
+
+        transitions = OBSTransitionManager(Recorder())
+        transitions.trigger_transition("Fade", 300)
+        transitions.trigger_transition()
+        assert recorded == [
+            ["SetCurrentSceneTransition", "SetCurrentSceneTransitionDuration", "TriggerStudioModeTransition"],
+            "TriggerStudioModeTransition",
+        ]
+
+    def test_obs_batch_action(self, fake_obs_ws: FakeOBSWebSocket, monkeypatch: pytest.MonkeyPatch):
+        """Test the generic obs:batch deck action."""
+        client = OBSWebSocketClient(f"ws://127.0.0.1:{fake_obs_ws.port}", password="secret", timeout=5)
+        monkeypatch.setitem(obs.get_pool()._instances, "default", OBSInstance("default", client))
+        try:
+            ok = handle_obs_batch({"requests": [{"requestType": "GetVersion"}, {"requestType": "GetStats"}], "executionType": "parallel"})
+            assert ok["status"] == "ok"
+            assert [result["responseData"]["echo"] for result in ok["results"]] == ["GetVersion", "GetStats"]
+
+            failed = handle_obs_batch({"requests": [{"requestType": "Missing"}]})
+            assert failed["status"] == "error" and "not found" in failed["error"]
+            assert failed["results"][0]["code"] == 600
+
+            assert handle_obs_batch({"requests": []})["status"] == "error"
+            assert handle_obs_batch({"requests": [{"requestType": "X"}] * 101})["status"] == "error"
+            assert handle_obs_batch({"requests": [{"requestType": "X"}], "executionType": "nope"})["status"] == "error"
+        finally:
+            client.close()
+
+
+def wait_for(predicate, timeout: float = 3.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+class TestOBSStateMirror:
+    """Test the event-fed OBS state mirror."""
+
+    @pytest.fixture
+    def mirror(self, fake_obs_ws: FakeOBSWebSocket) -> Iterator[OBSStateMirror]:
+        fake_obs_ws.responses.update({
+            "GetCurrentProgramScene": {"currentProgramSceneName": "Main"},
+            "GetStudioModeEnabled": {"studioModeEnabled": False},
+            "GetStreamStatus": {"outputActive": True},
+            "GetRecordStatus": {"outputActive": False},
+            "GetInputList": {"inputs": [{"inputName": "Mic"}, {"inputName": "Desktop"}]},
+            "GetInputMute": {"inputMuted": True},
+            "GetInputVolume": {"inputVolumeDb": -6.0},
+        })
+        client = OBSWebSocketClient(f"ws://127.0.0.1:{fake_obs_ws.port}", password="secret", timeout=5)
+        mirror = OBSStateMirror(client)
+        mirror.start()
+        wait_for(lambda: mirror.live)
+        yield mirror
+        client.close()
+
+    def test_resync_on_connect(self, mirror: OBSStateMirror, fake_obs_ws: FakeOBSWebSocket):
+        """Test that connecting loads the state with batches and no single requests."""
+        assert mirror.snapshot() == {
+            "programScene": "Main",
+            "studioMode": False,
+            "previewScene": None,
+            "streaming": True,
+            "recording": False,
+            "input:Mic:muted": True,
+            "input:Mic:volumeDb": -6.0,
+            "input:Desktop:muted": True,
+            "input:Desktop:volumeDb": -6.0,
+        }
+        assert len(fake_obs_ws.batches) == 2
+        assert not fake_obs_ws.requests
+
+    def test_events_update_state_and_notify(self, mirror: OBSStateMirror, fake_obs_ws: FakeOBSWebSocket):
+        """Test that OBS events update the mirror and report only the changed keys."""
+        changes: List[set] = []
+        mirror.add_listener(changes.append)
+
+        fake_obs_ws.send_event("StreamStateChanged", {"outputActive": False, "outputState": "OBS_WEBSOCKET_OUTPUT_STOPPING"})
+        fake_obs_ws.send_event("CurrentProgramSceneChanged", {"sceneName": "Main"})
+        fake_obs_ws.send_event("InputNameChanged", {"oldInputName": "Mic", "inputName": "Voice"})
+        fake_obs_ws.send_event("InputMuteStateChanged", {"inputName": "Voice", "inputMuted": False})
+        wait_for(lambda: len(changes) == 3)
+
+        assert changes == [{"streaming"}, {"input:Voice:muted", "input:Voice:volumeDb"}, {"input:Voice:muted"}]
+        assert mirror.get("streaming") is False
+        assert mirror.get("input:Voice:muted") is False
+        assert mirror.get("input:Mic:muted") is None
+
+    def test_toggle_decides_locally(self, mirror: OBSStateMirror, fake_obs_ws: FakeOBSWebSocket, monkeypatch: pytest.MonkeyPatch):
+        """Test that a toggle costs one request when the mirror is live."""
+        monkeypatch.setitem(obs.get_pool()._instances, "default", OBSInstance("default", mirror.client, mirror))
+
+        assert handle_obs("TOGGLE_STREAMING")["action"] == "stop_streaming"
+        assert handle_obs("TOGGLE_RECORDING")["action"] == "start_recording"
+        assert [request["requestType"] for request in fake_obs_ws.requests] == ["StopStream", "StartRecord"]
+
+    def test_http_transport_is_never_live(self):
+        """Test that without events the mirror stays out of the way."""
+        mirror = OBSStateMirror(OBSClient("ws://127.0.0.1:9"))
+        assert not mirror.enabled
+        assert mirror.get("streaming") is None
+
+    def test_state_binding(self):
+        """Test which state key each kind of OBS control reflects."""
+        instance, key, value = state_binding("TOGGLE_STREAMING")
+        assert (instance, key) == ("default", "streaming") and value(True) == 1
+        _, key, value = state_binding({"action": "SET_SCENE", "params": {"sceneName": "Main"}})
+        assert key == "programScene" and value("Main") == 1 and value("Other") == 0
+        instance, key, _ = state_binding({"action": "MUTE", "obs": "encoder", "params": {"inputName": "Mic"}})
+        assert (instance, key) == ("encoder", "input:Mic:muted")
+        assert state_binding({"action": "list_filters"}) is None
+        assert state_binding({"action": "TOGGLE_STREAMING", "obs": ["a", "b"]}) is None
+
+
+class TestOBSPool:
+    """Test named OBS instances and target routing."""
+
+    @pytest.fixture
+    def pool(self, fake_obs_ws: FakeOBSWebSocket, monkeypatch: pytest.MonkeyPatch) -> Iterator[OBSPool]:
+        url = f"ws://127.0.0.1:{fake_obs_ws.port}"
+        pool = OBSPool(
+            {
+                "default": {"url": url, "password": "secret", "transport": "websocket"},
+                "encoder": {"url": url, "password": "secret", "transport": "websocket"},
+            }
+        )
+        monkeypatch.setattr(obs, "_pool", pool)
+        yield pool
+        pool.close()
+
+    def test_instances_are_isolated_and_lazy(self, pool: OBSPool):
+        """Test that each instance gets its own client, breaker and caches on first use."""
+        assert pool.stats()["encoder"] == {"connected": False, "created": False}
+        default, encoder = pool.get(), pool.get("encoder")
+        assert pool.get("default") is default
+        assert default.client is not encoder.client
+        assert default.client.breaker is not encoder.client.breaker
+        assert default.state is not encoder.state
+        assert default.manager.sources.cache is not encoder.manager.sources.cache
+        with pytest.raises(ValueError):
+            pool.get("nope")
+
+    def test_target_routing(self, pool: OBSPool, fake_obs_ws: FakeOBSWebSocket):
+        """Test that the obs field picks the instance and unknown names are rejected."""
+        assert handle_obs("START_RECORDING", {"obs": "encoder"})["status"] == "ok"
+        assert [request["requestType"] for request in fake_obs_ws.requests] == ["StartRecord"]
+        assert pool.stats()["default"] == {"connected": False, "created": False}
+
+        unknown = handle_obs("START_RECORDING", {"obs": "nope"})
+        assert unknown == {"status": "error", "error": "Unknown OBS instance: nope"}
+        assert handle_obs_batch({"requests": [{"requestType": "GetVersion"}], "obs": ["encoder", "nope"]})["status"] == "error"
+
+    def test_fan_out_runs_concurrently(self, pool: OBSPool):
+        """Test that one command sent to several instances doesn't run in series."""
+        for name in pool.names():
+            pool.get(name).client.connect()
+        wait_for(lambda: all(pool.get(name).client.connected for name in pool.names()))
+
+        started = time.monotonic()
+        response = handle_obs_batch({"requests": [{"requestType": "Sleep", "requestData": {"ms": 300}}], "obs": ["default", "encoder"]})
+        elapsed = time.monotonic() - started
+
+        assert response["status"] == "ok"
+        assert set(response["results"]) == {"default", "encoder"}
+        assert elapsed < 0.55
+
+
+class MeterClient:
+    """Event source with the subscription API ``AudioMeterHub`` uses."""
+
+    def __init__(self):
+        self.event_subscriptions = EVENT_SUBSCRIPTION_ALL
+        self.listeners: List[Any] = []
+
+    def add_event_listener(self, listener):
+        self.listeners.append(listener)
+
+    def set_event_subscriptions(self, mask):
+        self.event_subscriptions = mask
+
+    def connect(self):
+        pass
+
+    def meters(self, **levels):
+        """One InputVolumeMeters event; ``levels`` maps input names to (magnitude, peak) per channel."""
+        inputs = [
+            {"inputName": name, "inputLevelsMul": [[magnitude, peak, peak] for magnitude, peak in channels]}
+            for name, channels in levels.items()
+        ]
+        for listener in self.listeners:
+            listener("InputVolumeMeters", {"inputs": inputs})
+
+
+class TestAudioMeterHub:
+    """Test the decimated InputVolumeMeters stream."""
+
+    def test_quantize(self):
+        """Test the one-byte dB scale."""
+        assert quantize(0.0) == 0
+        assert quantize(1.0) == 255
+        assert quantize(0.001) == 0  # -60 dBFS
+        assert quantize(10 ** (-30 / 20)) == 128
+
+    def test_subscription_toggles_meter_events(self):
+        """Test that OBS only sends meter events while someone is subscribed."""
+        client = MeterClient()
+        hub = AudioMeterHub(client, max_rate=30)
+        assert hub.subscribe("a", 100) == 30
+        assert hub.subscribe("b", 10) == 10
+        assert client.event_subscriptions & EVENT_SUBSCRIPTION_INPUT_VOLUME_METERS
+        hub.unsubscribe("a")
+        assert hub.stats()["rates"] == [10]
+        hub.unsubscribe("b")
+        assert client.event_subscriptions == EVENT_SUBSCRIPTION_ALL
+        with pytest.raises(RuntimeError):
+            AudioMeterHub(OBSClient("ws://127.0.0.1:9")).subscribe("a", 10)
+
+    def test_subscription_rejects_non_finite_rates(self):
+        """Test that Infinity/NaN rates (valid JSON to Python) are refused, not crashed on."""
+        client = MeterClient()
+        hub = AudioMeterHub(client, max_rate=30)
+        for rate in (float("inf"), float("-inf"), float("nan")):
+            with pytest.raises(ValueError):
+                hub.subscribe("a", rate)
+        assert hub.subscribers() == []
+        assert hub.subscribe("a", 1e9) == 30
+
+    def test_frames_are_decimated_per_rate(self):
+        """Test peak/RMS reduction over a window and one frame per rate period."""
+        now = [0.0]
+        client = MeterClient()
+        hub = AudioMeterHub(client, clock=lambda: now[0])
+        hub.subscribe("fast", 20)
+        hub.subscribe("slow", 5)
+        hub.subscribe("slow2", 5)
+
+        client.meters(Mic=[(0.5, 0.9), (0.1, 0.2)], Desktop=[(0.0, 0.0)])
+        client.meters(Mic=[(0.5, 1.0), (0.1, 0.2)])
+        now[0] = 0.05
+        frames = hub.frames()
+        assert list(frames) == [20]
+        assert frames[20]["inputs"] == ["Desktop", "Mic"]
+        assert frames[20]["peak"] == [0, 255]
+        assert frames[20]["rms"] == [0, quantize((0.13) ** 0.5)]
+        assert hub.frames() == {}  # nothing due
+
+        client.meters(Mic=[(0.01, 0.01)])
+        now[0] = 0.2
+        frames = hub.frames()
+        assert set(frames) == {5, 20}
+        assert frames[5]["peak"][1] == 255  # the slow window still holds the first peak
+        assert frames[20]["inputs"] == ["Mic"] and frames[20]["peak"] == [quantize(0.01)]
+        assert sorted(hub.subscribers(5)) == ["slow", "slow2"]
+
+
+class RecordingClient:
+    """Records single requests and answers them with ``{"outputActive": False}``."""
+
+    def __init__(self):
+        self.calls: List[Any] = []
+
+    def call(self, request_type, request_data=None):
+        self.calls.append((request_type, request_data))
+        return {"outputActive": False}
+
+
+class TestOBSActionTable:
+    """Test the compiled OBS action table."""
+
+    @pytest.fixture
+    def instance(self, monkeypatch: pytest.MonkeyPatch) -> OBSInstance:
+        instance = OBSInstance("default", RecordingClient())
+        monkeypatch.setitem(obs.get_pool()._instances, "default", instance)
+        return instance
+
+    def test_requests_and_result_shapes(self, instance: OBSInstance):
+        """Test that table rows build the same requests and responses as before."""
+        assert handle_obs("obs_volume", {"params": {"sourceName": "Mic", "volume": "-6"}}) == {
+            "status": "ok", "inputName": "Mic", "volumeDb": -6.0,
+        }
+        assert handle_obs("UNMUTE", {"params": {"inputName": "Mic"}}) == {"status": "ok", "muted": False, "inputName": "Mic"}
+        assert handle_obs("set_filter_enabled", {"params": {"sourceName": "Cam", "filterName": "Blur", "enabled": 1}}) == {
+            "status": "ok", "action": "set_filter_enabled", "result": {"outputActive": False},
+        }
+        assert handle_obs("TOGGLE_STREAMING")["action"] == "start_streaming"
+        assert instance.client.calls == [
+            ("SetInputVolume", {"inputName": "Mic", "inputVolumeDb": -6.0}),
+            ("SetInputMute", {"inputMuted": False, "inputName": "Mic"}),
+            ("SetSourceFilterEnabled", {"sourceName": "Cam", "filterName": "Blur", "filterEnabled": True}),
+            ("GetStreamStatus", None),
+            ("StartStream", None),
+        ]
+
+    def test_validation_errors(self, instance: OBSInstance):
+        """Test generated validators and unknown actions."""
+        missing = handle_obs("set_source_position", {"params": {"sceneName": "Main", "x": 1}})
+        assert missing["error"] == "Missing parameter(s) for OBS action: sourceName, y"
+        assert handle_obs("SET_VOLUME", {"params": {"inputName": "Mic", "volumeDb": "loud"}})["error"] == (
+            "Invalid parameter for OBS action: volumeDb"
+        )
+        assert handle_obs("nope")["error"] == "Unknown OBS action: nope"
+        assert not instance.client.calls
+
+    def test_compile_rejects_bad_rows(self):
+        """Test that duplicate names and rows without a request or run are refused."""
+        assert "CHANGE_SCENE" in OBS_ACTIONS and "SET_STUDIO_MODE" in OBS_ACTIONS
+        with pytest.raises(ValueError):
+            compile_actions([OBSAction(("a",), request="A"), OBSAction(("A",), request="B")])
+        with pytest.raises(ValueError):
+            compile_actions([OBSAction(("a",), (Param("x"),))])
+
+
+class ScreenshotClient:
+    """Answers GetSourceScreenshot batches with the images in ``frames``."""
+
+    def __init__(self, frames: Dict[str, bytes]):
+        self.frames = frames
+        self.batches: List[List[str]] = []
+
+    def call_batch(self, requests, execution_type="serial", halt_on_failure=False):
+        self.batches.append([request["requestData"]["sourceName"] for request in requests])
+        results = []
+        for request in requests:
+            image = self.frames.get(request["requestData"]["sourceName"])
+            data = {"imageData": "data:image/jpg;base64," + base64.b64encode(image).decode()} if image else None
+            results.append({"requestType": "GetSourceScreenshot", "ok": image is not None, "code": 100 if image else 600, "comment": None, "responseData": data})
+        return results
+
+
+class TestThumbnails:
+    """Test the cached scene thumbnail service."""
+
+    def test_cache_is_bounded_by_bytes_and_dedupes(self):
+        """Test LRU eviction by total size and that identical images aren't stored again."""
+        cache = ThumbnailCache(max_bytes=10)
+        assert cache.put(Thumbnail("a", b"1234", "image/jpg"))
+        assert cache.put(Thumbnail("b", b"1234", "image/jpg"))
+        assert not cache.put(Thumbnail("a", b"1234", "image/jpg"))  # same frame, and a is now most recent
+        assert cache.put(Thumbnail("c", b"5678", "image/jpg"))
+        assert cache.get("b") is None
+        assert cache.get("a").data == b"1234"
+        assert cache.stats()["bytes"] == 8 and cache.stats()["evictions"] == 1 and cache.stats()["unchanged"] == 1
+
+    def test_refresh_reports_only_changed_scenes(self):
+        """Test that watched scenes are fetched in one batch and unchanged frames cost nothing."""
+        client = ScreenshotClient({"Main": b"main-1", "BRB": b"brb-1"})
+        service = ThumbnailService(client, interval=60)
+        changes: List[List[str]] = []
+        service.add_listener(lambda changed: changes.append([thumbnail.scene for thumbnail in changed]))
+        try:
+            service.watch("deck-1", ["Main", "BRB"])
+            service.watch("deck-2", ["Main", "Gone"])
+            wait_for(lambda: changes)
+            client.frames["Main"] = b"main-2"
+            assert [thumbnail.scene for thumbnail in service.refresh()] == ["Main"]
+            assert service.refresh() == []
+            assert client.batches[-1] == ["BRB", "Gone", "Main"]
+            assert changes[-1] == ["Main"]
+
+            assert service.get("Main").data == b"main-2"
+            with pytest.raises(RuntimeError):
+                service.get("Gone")
+        finally:
+            service.close()
+
+    def test_malformed_image_data_raises(self):
+        """Test that invalid base64 is rejected and skipped by refreshes instead of cached."""
+        client = ScreenshotClient({"Main": b"main-1"})
+        real_call_batch = client.call_batch
+
+        def corrupt(requests, execution_type="serial", halt_on_failure=False):
+            results = real_call_batch(requests, execution_type, halt_on_failure)
+            for result in results:
+                result["responseData"] = {"imageData": "data:image/jpg;base64,not*base64!"}
+            return results
+
+        client.call_batch = corrupt
+        service = ThumbnailService(client, interval=60)
+        try:
+            with pytest.raises(RuntimeError, match="malformed"):
+                service.get("Main")
+            assert service.fetch(["Main"]) == []
+        finally:
+            service.close()
+
+
+class TestCircuitBreaker:
+    """Test fail-fast OBS calls and latency-adaptive timeouts."""
+
+    def test_trips_and_half_opens(self):
+        """Test that the breaker opens after the threshold and lets one trial through later."""
+        now = [0.0]
+        breaker = CircuitBreaker("test", threshold=3, reset_timeout=5, clock=lambda: now[0])
+        for _ in range(2):
+            breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert not breaker.allow()
+
+        now[0] = 5
+        assert breaker.allow() and breaker.state == "half_open"
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        breaker.record_success()
+        assert breaker.state == "closed" and breaker.allow()
+        assert breaker.stats()["trips"] == 2 and breaker.stats()["rejected"] == 2
+
+    def test_background_probe_closes(self):
+        """Test that the probe thread closes the breaker once the service answers."""
+        attempts = []
+
+        def probe():
+            attempts.append(1)
+            if len(attempts) < 2:
+                raise RuntimeError("down")
+
+        breaker = CircuitBreaker("test", threshold=1, reset_timeout=0.01, probe=probe)
+        breaker.record_failure()
+        assert not breaker.allow()
+        wait_for(lambda: breaker.state == "closed")
+        assert len(attempts) == 2
+
+    def test_adaptive_timeout(self):
+        """Test that the timeout follows observed latency within its bounds."""
+        timeout = AdaptiveTimeout(minimum=0.05, maximum=10)
+        assert timeout.timeout() == 10
+        for _ in range(20):
+            timeout.observe(0.002)
+        assert timeout.timeout() == 0.05
+        for _ in range(5):
+            timeout.observe(0.5)
+        assert 0.5 < timeout.timeout() < 10
+
+    def test_missing_obs_fails_fast(self):
+        """Test that a missing OBS costs no network wait per press, before and after the breaker opens."""
+        client = OBSWebSocketClient("ws://127.0.0.1:9", timeout=5, breaker_threshold=2, reconnect_base=0.01)
+        try:
+            started = time.perf_counter()
+            with pytest.raises(RuntimeError, match="Cannot connect"):
+                client.call("GetVersion")
+            # The failed connection attempt answers the waiting press, not the 5 s timeout
+            assert time.perf_counter() - started < 1
+            wait_for(lambda: client.stats()["breaker"]["state"] == "open")
+            self._assert_fast(client)
+        finally:
+            client.close()
+
+        http_client = OBSClient("ws://127.0.0.1:9", timeout=5, breaker_threshold=2, breaker_reset=30)
+        try:
+            for _ in range(2):
+                with pytest.raises(RuntimeError, match="Cannot connect"):
+                    http_client.call("GetVersion")
+            assert http_client.stats()["breaker"]["state"] == "open"
+            self._assert_fast(http_client)
+        finally:
+            http_client.close()
+
+    @staticmethod
+    def _assert_fast(client: Any) -> None:
+        started = time.perf_counter()
+        for _ in range(100):
+            with pytest.raises(RuntimeError, match="circuit open"):
+                client.call("GetVersion")
+        assert (time.perf_counter() - started) / 100 < 0.001
+
+    def test_http_probe_recovers(self, fake_obs: ThreadingHTTPServer):
+        """Test that the HTTP client's probe closes the breaker when OBS answers again."""
+        client = OBSClient(f"ws://127.0.0.1:{fake_obs.server_port}", breaker_threshold=1, breaker_reset=0.01)
+        try:
+            client.breaker.record_failure()
+            with pytest.raises(RuntimeError, match="circuit open"):
+                client.call("GetVersion")
+            wait_for(lambda: client.breaker.state == "closed")
+            assert client.call("GetVersion") == {"echo": "GetVersion"}
+            assert client.stats()["latency"]["srttMs"] is not None
+        finally:
+            client.close()
@@ -1,15 +1,49 @@
 """Security tests for script execution."""
 from __future__ import annotations
 
-import subprocess
+import asyncio
+import threading
+import time
 from pathlib import Path
 
 import pytest
 
-from app.actions.scripts import ALLOWED_EXTENSIONS, ALLOWED_SCRIPT_DIRS, _validate_script_path, run_script
+from app.actions import scripts as scripts_module
+from app.actions.scripts import (
+    ALLOWED_EXTENSIONS,
+    ALLOWED_SCRIPT_DIRS,
+    OutputBuffer,
+    ScriptRunner,
+    _validate_script_path,
+    run_script,
+)
 from app.config import Settings
 
 
+@pytest.fixture(autouse=True)
+def allow_temp_scripts(temp_data_dir: Path, monkeypatch):
+    """Allow scripts from the temp data dir (the module list is built from the real settings)."""
+    monkeypatch.setattr(scripts_module, "ALLOWED_SCRIPT_DIRS", [*ALLOWED_SCRIPT_DIRS, temp_data_dir / "scripts"])
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    """Fresh script runner with a short timeout."""
+    runner = ScriptRunner(max_concurrent=2, timeout=2.0, output_limit=1024)
+    monkeypatch.setattr(scripts_module, "_runner", runner)
+    yield runner
+    runner.close()
+
+
+def _script(temp_data_dir: Path, name: str, body: str) -> Path:
+    scripts_dir = temp_data_dir / "scripts"
+    scripts_dir.mkdir(parents=True, exist_ok=True)
+    script = scripts_dir / name
+    script.write_text("#!/bin/bash\n" + body)
+    script.chmod(0o755)
+    return script
+
+
 class TestScriptPathValidation:
     """Test script path validation security."""
 
@@ -132,25 +166,20 @@ class TestRunScript:
         assert "error" in result
         assert "not found" in result["error"].lower()
 
-    def test_run_script_timeout(self, temp_data_dir: Path, monkeypatch):
-        """Test that long-running scripts timeout."""
-        scripts_dir = temp_data_dir / "scripts"
-        scripts_dir.mkdir(parents=True, exist_ok=True)
-
-        script = scripts_dir / "timeout.sh"
-        script.write_text("#!/bin/bash\nsleep 100")
-        script.chmod(0o755)
-
-        # Mock subprocess.run to raise TimeoutExpired
-        def mock_run(*args, **kwargs):
-            raise subprocess.TimeoutExpired(cmd=args[0], timeout=30)
-
-        monkeypatch.setattr(subprocess, "run", mock_run)
+    def test_run_script_timeout(self, temp_data_dir: Path, runner: ScriptRunner):
+        """Test that long-running scripts timeout and are killed with their children."""
+        script = _script(temp_data_dir, "timeout.sh", "echo started\nsleep 100 &\nsleep 100")
+        runner.timeout = 0.3
 
+        started = time.monotonic()
         result = run_script([str(script)])
 
         assert result["status"] == "error"
         assert "timeout" in result["error"].lower()
+        assert result["stdout"] == "started\n"
+        # Killing the process group closes the pipes the background sleep also holds
+        assert time.monotonic() - started < 2
+        assert runner.stats()["killed"] == 1
 
     def test_run_script_exit_code_error(self, temp_data_dir: Path):
         """Test handling of script execution errors."""
@@ -230,56 +259,101 @@ class TestRunScript:
             assert "Python works" in result["stdout"]
 
 
-class TestScriptSecurityConstraints:
-    """Test security constraints are properly enforced."""
+class TestScriptRunner:
+    """Test the asyncio subprocess runner."""
 
-    def test_shell_false_enforced(self, temp_data_dir: Path, monkeypatch):
-        """Test that shell=False is enforced."""
-        scripts_dir = temp_data_dir / "scripts"
-        scripts_dir.mkdir(parents=True, exist_ok=True)
+    def test_output_streamed_as_it_arrives(self, temp_data_dir: Path, runner: ScriptRunner):
+        """Test that output reaches the callback while the script still runs."""
+        script = _script(temp_data_dir, "stream.sh", "echo one\nsleep 0.3\necho two >&2\necho three")
+        chunks = []
 
-        script = scripts_dir / "test.sh"
-        script.write_text("#!/bin/bash\necho 'test'")
-        script.chmod(0o755)
+        def on_output(stream, text):
+            chunks.append((stream, text, time.monotonic()))
 
-        # Track subprocess.run calls
-        original_run = subprocess.run
-        calls = []
+        started = time.monotonic()
+        result = run_script([str(script)], on_output)
 
-        def track_run(*args, **kwargs):
-            calls.append(kwargs)
-            return original_run(*args, **kwargs)
+        assert result == {"status": "ok", "stdout": "one\nthree\n", "stderr": "two\n"}
+        assert chunks[0][:2] == ("stdout", "one\n")
+        assert chunks[0][2] - started < 0.25
+        assert "".join(text for stream, text, _ in chunks if stream == "stderr") == "two\n"
 
-        monkeypatch.setattr(subprocess, "run", track_run)
+    def test_output_kept_in_bounded_buffer(self, temp_data_dir: Path, runner: ScriptRunner):
+        """Test that only the last output_limit characters are kept."""
+        script = _script(temp_data_dir, "chatty.sh", "for i in $(seq 1 2000); do echo line-$i; done")
 
-        run_script([str(script)])
+        result = run_script([str(script)])
 
-        # Verify shell=False was used
-        assert len(calls) == 1
-        assert calls[0].get("shell") is False
+        assert len(result["stdout"]) == 1024
+        assert result["stdout"].endswith("line-2000\n")
+        assert result["truncated"]["stdout"] > 0
 
-    def test_timeout_enforced(self, temp_data_dir: Path, monkeypatch):
-        """Test that timeout is enforced."""
-        scripts_dir = temp_data_dir / "scripts"
-        scripts_dir.mkdir(parents=True, exist_ok=True)
+    def test_concurrency_limit(self, temp_data_dir: Path, runner: ScriptRunner):
+        """Test that at most max_concurrent scripts run at once."""
+        script = _script(temp_data_dir, "slow.sh", "sleep 0.3")
+        threads = [threading.Thread(target=run_script, args=([str(script)],)) for _ in range(4)]
 
-        script = scripts_dir / "test.sh"
-        script.write_text("#!/bin/bash\necho 'test'")
-        script.chmod(0o755)
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        time.sleep(0.15)
+        stats = runner.stats()
+        for thread in threads:
+            thread.join()
+
+        assert (stats["running"], stats["waiting"]) == (2, 2)
+        # Two rounds of two
+        assert time.monotonic() - started >= 0.6
+
+    def test_unicode_output_split_across_reads(self):
+        """Test that multi-byte characters survive being split between two reads."""
+
+        async def pump():
+            stream = asyncio.StreamReader()
+            encoded = "héllo ✓".encode()
+            stream.feed_data(encoded[:2])
+            stream.feed_data(encoded[2:])
+            stream.feed_eof()
+            buffer = OutputBuffer(100)
+            await ScriptRunner._pump(stream, "stdout", buffer, None)
+            return buffer.text()
+
+        assert asyncio.run(pump()) == "héllo ✓"
 
-        # Track subprocess.run calls
-        original_run = subprocess.run
+    def test_output_buffer_keeps_tail(self):
+        """Test the ring buffer drops the oldest characters."""
+        buffer = OutputBuffer(5)
+        for text in ("abc", "def", "gh"):
+            buffer.append(text)
+
+        assert buffer.text() == "defgh"
+        assert buffer.dropped == 3
+
+
+class TestScriptSecurityConstraints:
+    """Test security constraints are properly enforced."""
+
+    def test_shell_false_enforced(self, temp_data_dir: Path, runner: ScriptRunner, monkeypatch):
+        """Test that scripts are exec'd directly (shell=False)."""
+        script = _script(temp_data_dir, "test.sh", "echo 'test'")
+
+        # Track subprocess launches
+        original_exec = asyncio.create_subprocess_exec
         calls = []
 
-        def track_run(*args, **kwargs):
-            calls.append(kwargs)
-            return original_run(*args, **kwargs)
+        async def track_exec(*args, **kwargs):
+            calls.append((args, kwargs))
+            return await original_exec(*args, **kwargs)
 
-        monkeypatch.setattr(subprocess, "run", track_run)
+        monkeypatch.setattr(asyncio, "create_subprocess_exec", track_exec)
 
-        run_script([str(script)])
+        run_script([str(script), "; rm -rf /"])
 
-        # Verify timeout was set
+        # Verify shell=False was used and arguments were passed as-is
         assert len(calls) == 1
-        assert "timeout" in calls[0]
-        assert calls[0]["timeout"] == 30
+        assert calls[0][1].get("shell") is False
+        assert calls[0][0] == (str(script.resolve()), "; rm -rf /")
+
+    def test_timeout_enforced(self):
+        """Test that the configured timeout applies to scripts."""
+        assert scripts_module.get_runner().timeout == Settings().script_timeout == 30
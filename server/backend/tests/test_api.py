@@ -8,8 +8,11 @@ the per-test temp directory.
 
 from __future__ import annotations
 
+import io
+import json
 import os
 import sys
+import zipfile
 from typing import Tuple
 
 import pytest
@@ -20,6 +23,8 @@ from fastapi.testclient import TestClient
 MODULES_TO_RESET = [
     "app.config",
     "app.utils.token_manager",
+    "app.utils.profile_manager",
+    "app.routes",
     "app.routes.tokens",
     "app.routes.profiles",
     "app.routes.health",
@@ -129,3 +134,172 @@ def test_profile_crud(client):
     assert listed.status_code == 200
     ids = {item["id"] for item in listed.json().get("profiles", [])}
     assert "test-profile" in ids
+
+
+def test_profile_patch_with_version_conflict(client):
+    test_client, _ = client
+
+    payload = {
+        "id": "patched",
+        "name": "Patched",
+        "rows": 2,
+        "cols": 2,
+        "controls": [{"id": "c1", "type": "button", "row": 0, "col": 0}],
+    }
+    assert test_client.post("/profiles/patched", json=payload).status_code == 200
+
+    patch = test_client.patch(
+        "/profiles/patched",
+        json={"version": 1, "operations": [{"op": "replace", "path": "/controls/0/col", "value": 1}]},
+    )
+    assert patch.status_code == 200
+    assert patch.json()["version"] == 2
+    assert test_client.get("/profiles/patched").json()["controls"][0]["col"] == 1
+
+    stale = test_client.patch(
+        "/profiles/patched",
+        json={"version": 1, "operations": [{"op": "replace", "path": "/name", "value": "x"}]},
+    )
+    assert stale.status_code == 409
+    assert stale.json()["detail"]["currentVersion"] == 2
+
+    invalid = test_client.patch(
+        "/profiles/patched",
+        json={"version": 2, "operations": [{"op": "replace", "path": "/controls/0/row", "value": "top"}]},
+    )
+    assert invalid.status_code == 400
+
+
+def test_profile_save_reports_validation_errors(client):
+    test_client, _ = client
+
+    payload = {
+        "id": "overlap",
+        "name": "Overlap",
+        "rows": 1,
+        "cols": 2,
+        "controls": [
+            {"id": "c1", "type": "button", "row": 0, "col": 0, "colSpan": 2},
+            {"id": "c2", "type": "button", "row": 0, "col": 1},
+        ],
+    }
+    response = test_client.post("/profiles/overlap", json=payload)
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["errors"] == ["/controls/1: 'c2' overlaps /controls/0 ('c1') at row 0, col 1"]
+
+
+def _transfer_profile(profile_id: str) -> dict:
+    return {
+        "id": profile_id,
+        "name": profile_id.title(),
+        "rows": 1,
+        "cols": 1,
+        "controls": [{"id": "c1", "type": "button", "row": 0, "col": 0}],
+    }
+
+
+def test_profile_export_import_ndjson(client, tmp_path):
+    test_client, _ = client
+
+    for profile_id in ("alpha", "beta"):
+        assert test_client.post(f"/profiles/{profile_id}", json=_transfer_profile(profile_id)).status_code == 200
+
+    export = test_client.get("/profiles/export")
+    assert export.status_code == 200
+    assert export.headers["content-type"].startswith("application/x-ndjson")
+    lines = export.content.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["alpha", "beta"]
+
+    broken = json.dumps({**_transfer_profile("gamma"), "rows": 0})
+    body = b"\n".join(lines + [b"{not json", broken.encode(), b""])
+    response = test_client.post(
+        "/profiles/import", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 2
+    assert report["failed"] == 2
+    assert report["errors"][0]["line"] == 3
+    assert report["errors"][1]["profileId"] == "gamma"
+    assert report["errors"][1]["errors"] == ["/rows: must be >= 1"]
+    assert test_client.get("/profiles/alpha").json()["version"] == 2
+
+
+def test_profile_export_import_zip(client):
+    test_client, _ = client
+
+    assert test_client.post("/profiles/alpha", json=_transfer_profile("alpha")).status_code == 200
+
+    export = test_client.get("/profiles/export", params={"format": "zip"})
+    assert export.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(export.content)) as archive:
+        assert archive.namelist() == ["alpha.json"]
+        assert json.loads(archive.read("alpha.json"))["name"] == "Alpha"
+
+    upload = io.BytesIO()
+    with zipfile.ZipFile(upload, "w") as archive:
+        archive.writestr("delta.json", json.dumps(_transfer_profile("delta")))
+        archive.writestr("escape.json", json.dumps(_transfer_profile("../escape")))
+    response = test_client.post(
+        "/profiles/import", content=upload.getvalue(), headers={"Content-Type": "application/zip"}
+    )
+
+    assert response.json()["imported"] == 1
+    assert response.json()["errors"][0]["entry"] == "escape.json"
+    assert test_client.get("/profiles/delta").status_code == 200
+
+
+def test_profile_import_reports_failed_writes(client, monkeypatch):
+    from app.utils.profile_writer import ProfileWriter  # type: ignore
+
+    test_client, _ = client
+
+    def disk_full(path, content):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ProfileWriter, "_write_atomic", staticmethod(disk_full))
+    body = json.dumps(_transfer_profile("alpha")).encode() + b"\n"
+    response = test_client.post(
+        "/profiles/import", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+
+    report = response.json()
+    assert report["imported"] == 0
+    assert report["errors"] == [{"profileId": "alpha", "error": "write failed: disk full"}]
+
+
+def test_profile_versions_and_rollback(client):
+    test_client, _ = client
+
+    assert test_client.post("/profiles/alpha", json=_transfer_profile("alpha")).status_code == 200
+    assert test_client.post("/profiles/alpha", json={**_transfer_profile("alpha"), "name": "Renamed"}).status_code == 200
+
+    versions = test_client.get("/profiles/alpha/versions").json()["versions"]
+    assert [v["version"] for v in versions] == [1, 2]
+    assert test_client.get("/profiles/alpha/versions/1").json()["name"] == "Alpha"
+    assert test_client.get("/profiles/alpha/versions/7").status_code == 404
+
+    rollback = test_client.post("/profiles/alpha/versions/1/rollback")
+    assert rollback.status_code == 200
+    assert rollback.json()["version"] == 3
+    assert test_client.get("/profiles/alpha").json()["name"] == "Alpha"
+
+
+def test_profile_listing_pagination(client):
+    test_client, _ = client
+
+    for profile_id in ("alpha", "beta", "gamma"):
+        assert test_client.post(f"/profiles/{profile_id}", json=_transfer_profile(profile_id)).status_code == 200
+
+    page = test_client.get("/profiles/", params={"limit": 2, "fields": "id,name,controlCount"}).json()
+    assert page["profiles"] == [
+        {"id": "alpha", "name": "Alpha", "controlCount": 1},
+        {"id": "beta", "name": "Beta", "controlCount": 1},
+    ]
+    rest = test_client.get("/profiles/", params={"limit": 2, "cursor": page["nextCursor"]}).json()
+    assert [item["id"] for item in rest["profiles"]] == ["gamma"]
+    assert rest["nextCursor"] is None
+
+    assert test_client.get("/profiles/", params={"fields": "document"}).status_code == 400
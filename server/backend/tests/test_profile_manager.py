@@ -1,13 +1,32 @@
 """Tests for ProfileManager utility."""
 from __future__ import annotations
 
+import base64
 import json
+import sqlite3
+import threading
+import time
 from pathlib import Path
 
 import pytest
 
 from app.config import Settings
+from app.exceptions import ProfileNotFoundError, ProfileVersionConflictError
+from app.utils import profile_writer as profile_writer_module
+from app.utils.json_patch import JsonPatchError, apply_patch
+from app.utils.profile_events import apply_profile_diff, diff_profiles
+from app.utils.profile_history import ProfileHistory
 from app.utils.profile_manager import Control, Profile, ProfileManager
+from app.utils.profile_sqlite import SqliteProfileStore
+from app.utils.profile_transfer import NdjsonSplitter
+from app.utils.profile_validation import (
+    BUNDLED_SCHEMA_PATH,
+    ProfileValidationError,
+    ProfileValidator,
+    check_grid,
+    get_profile_validator,
+)
+from app.utils.profile_writer import ProfileWriter, get_profile_writer
 
 
 class TestProfileManager:
@@ -126,6 +145,9 @@ class TestProfileManager:
         assert result.id == "test-profile"
         assert result.name == "Test Profile"
 
+        # Saves are write-behind; wait for the queue to drain
+        assert manager.flush(timeout=5.0)
+
         # Verify file was created
         profile_file = test_settings.profiles_dir / "test-profile.json"
         assert profile_file.exists()
@@ -145,6 +167,7 @@ class TestProfileManager:
         """Test that saved profile is valid JSON with correct formatting."""
         manager = ProfileManager(test_settings)
         manager.save_profile("test-profile", sample_profile)
+        assert manager.flush(timeout=5.0)
 
         profile_file = test_settings.profiles_dir / "test-profile.json"
         content = profile_file.read_text(encoding="utf-8")
@@ -191,6 +214,642 @@ class TestProfileManager:
         result = manager.delete_profile("test-profile")
         assert result is False
 
+    def test_save_profile_visible_before_flush(self, test_settings: Settings, sample_profile: dict):
+        """Test that queued saves are served by get/list before they reach the disk."""
+        test_settings.profile_write_delay = 0.5
+        manager = ProfileManager(test_settings)
+
+        manager.save_profile("test-profile", sample_profile)
+
+        assert manager.get_profile("test-profile")["name"] == "Test Profile"
+        assert [p["id"] for p in manager.list_profiles()] == ["test-profile"]
+        assert manager.flush(timeout=5.0)
+
+    def test_delete_profile_cancels_pending_save(self, test_settings: Settings, sample_profile: dict):
+        """Test that deleting a queued profile drops the pending write."""
+        test_settings.profile_write_delay = 0.2
+        manager = ProfileManager(test_settings)
+
+        manager.save_profile("test-profile", sample_profile)
+        assert manager.delete_profile("test-profile") is True
+        assert manager.flush(timeout=5.0)
+
+        assert not (test_settings.profiles_dir / "test-profile.json").exists()
+        assert manager.get_profile("test-profile") is None
+
+
+class TestProfileManagerAsync:
+    """Test the async API backed by the profile I/O thread pool."""
+
+    async def test_async_crud(self, test_settings: Settings, sample_profile: dict):
+        """Test that async methods mirror the sync API."""
+        manager = ProfileManager(test_settings)
+
+        saved = await manager.save_profile_async("test-profile", sample_profile)
+        assert saved.version == 1
+        assert (await manager.get_profile_async("test-profile"))["name"] == "Test Profile"
+        assert [p["id"] for p in await manager.list_profiles_async()] == ["test-profile"]
+        patched = await manager.patch_profile_async(
+            "test-profile", 1, [{"op": "replace", "path": "/name", "value": "Async"}]
+        )
+        assert patched["version"] == 2
+        assert await manager.flush_async(timeout=5.0)
+        assert await manager.delete_profile_async("test-profile") is True
+
+    async def test_disk_access_runs_off_the_event_loop(self, test_settings: Settings, monkeypatch):
+        """Test that directory scans happen on the dedicated I/O threads."""
+        manager = ProfileManager(test_settings)
+        threads = []
+
+        original = ProfileManager.list_profiles
+
+        def recording_list(self):
+            threads.append(threading.current_thread().name)
+            return original(self)
+
+        monkeypatch.setattr(ProfileManager, "list_profiles", recording_list)
+        await manager.list_profiles_async()
+
+        assert threads and threads[0].startswith("profile-io")
+
+
+class TestProfileWriter:
+    """Test the write-behind profile persistence queue."""
+
+    def test_successive_saves_are_coalesced(self, temp_data_dir: Path):
+        """Test that rapid saves of one profile collapse into a single flush."""
+        writer = ProfileWriter(temp_data_dir, delay=0.2)
+
+        for i in range(10):
+            writer.enqueue("p1", json.dumps({"id": "p1", "name": f"v{i}"}))
+
+        assert writer.flush(timeout=5.0)
+        stats = writer.stats()
+        assert stats["flushed"] == 1
+        assert stats["coalesced"] == 9
+        assert json.loads((temp_data_dir / "p1.json").read_text())["name"] == "v9"
+
+    def test_atomic_write_leaves_no_temp_files(self, temp_data_dir: Path):
+        """Test that flushes go through a temp file that is renamed into place."""
+        writer = ProfileWriter(temp_data_dir, delay=0)
+
+        writer.enqueue("p1", "{}")
+        assert writer.flush(timeout=5.0)
+
+        assert sorted(p.name for p in temp_data_dir.iterdir()) == ["p1.json"]
+
+    def test_acked_saves_survive_a_crash(self, temp_data_dir: Path):
+        """Test that saves still in the queue are replayed from the journal by the next writer."""
+        crashed = ProfileWriter(temp_data_dir, delay=0)
+        crashed._start = lambda: None  # dies before its thread ever flushes
+        crashed.enqueue("p1", '{"id": "p1"}')
+        crashed.enqueue("gone", '{"id": "gone"}')
+        crashed.delete("gone")
+
+        writer = ProfileWriter(temp_data_dir, delay=0)
+
+        assert writer.pending("p1") == '{"id": "p1"}'
+        assert writer.pending("gone") is None
+        assert writer.flush(timeout=5.0)
+        assert sorted(p.name for p in temp_data_dir.iterdir()) == ["p1.json"]
+
+    def test_failed_write_is_reported_and_retried(self, temp_data_dir: Path, monkeypatch):
+        """Test that a failed write keeps the old file intact, stays queued and is retried."""
+        target = temp_data_dir / "p1.json"
+        target.write_text('{"id": "p1", "name": "old"}', encoding="utf-8")
+        writer = ProfileWriter(temp_data_dir, delay=0)
+        monkeypatch.setattr(ProfileWriter, "RETRY_BASE", 0.05)
+        real_replace = profile_writer_module.os.replace
+        disk_full = [True]
+
+        def flaky_replace(src, dst):
+            if disk_full[0]:
+                raise OSError("disk full")
+            real_replace(src, dst)
+
+        monkeypatch.setattr(profile_writer_module.os, "replace", flaky_replace)
+        writer.enqueue("p1", '{"id": "p1", "name": "new"}')
+        assert writer.flush(timeout=5.0) is False
+
+        assert json.loads(target.read_text())["name"] == "old"
+        # No temp file left behind; the save itself stays in the journal
+        assert sorted(p.name for p in temp_data_dir.iterdir()) == [ProfileWriter.JOURNAL_NAME, "p1.json"]
+        assert writer.pending("p1") is not None
+        assert writer.failures() == {"p1": "disk full"}
+        assert writer.stats()["failing"] == 1
+        assert writer.stats()["lastError"] == "disk full"
+
+        disk_full[0] = False
+        deadline = time.monotonic() + 5
+        while writer.stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert writer.flush(timeout=5.0)
+        assert json.loads(target.read_text())["name"] == "new"
+        assert not (temp_data_dir / ProfileWriter.JOURNAL_NAME).exists()
+        assert writer.failures() == {}
+        assert writer.stats()["errors"] >= 1
+
+    def test_writer_shared_per_directory(self, temp_data_dir: Path):
+        """Test that every manager of a directory uses the same single writer."""
+        assert get_profile_writer(temp_data_dir) is get_profile_writer(temp_data_dir)
+
+
+class TestProfilePatch:
+    """Test JSON Patch updates with optimistic concurrency."""
+
+    def test_patch_control_bumps_version(self, test_settings: Settings, sample_profile: dict):
+        """Test that a patch updates one control and increments the version."""
+        manager = ProfileManager(test_settings)
+        manager.save_profile("test-profile", sample_profile)
+
+        patched = manager.patch_profile(
+            "test-profile",
+            1,
+            [
+                {"op": "replace", "path": "/controls/0/col", "value": 2},
+                {"op": "replace", "path": "/name", "value": "Renamed"},
+            ],
+        )
+
+        assert patched["version"] == 2
+        assert patched["name"] == "Renamed"
+        assert patched["controls"][0]["col"] == 2
+        assert manager.get_profile("test-profile")["version"] == 2
+
+    def test_patch_stale_version_conflicts(self, test_settings: Settings, sample_profile: dict):
+        """Test that a patch against an old version is rejected."""
+        manager = ProfileManager(test_settings)
+        manager.save_profile("test-profile", sample_profile)
+        manager.patch_profile("test-profile", 1, [{"op": "replace", "path": "/name", "value": "A"}])
+
+        with pytest.raises(ProfileVersionConflictError) as exc:
+            manager.patch_profile("test-profile", 1, [{"op": "replace", "path": "/name", "value": "B"}])
+
+        assert exc.value.current_version == 2
+        assert manager.get_profile("test-profile")["name"] == "A"
+
+    def test_patch_add_control_is_validated(self, test_settings: Settings, sample_profile: dict):
+        """Test that added controls go through the Control model."""
+        manager = ProfileManager(test_settings)
+        manager.save_profile("test-profile", sample_profile)
+
+        with pytest.raises(ValueError):
+            manager.patch_profile(
+                "test-profile", 1, [{"op": "add", "path": "/controls/-", "value": {"id": "c2"}}]
+            )
+
+        patched = manager.patch_profile(
+            "test-profile",
+            1,
+            [{"op": "add", "path": "/controls/-", "value": {"id": "c2", "type": "fader", "row": 1, "col": 1}}],
+        )
+        assert patched["controls"][1]["label"] is None
+        assert len(patched["controls"]) == 2
+
+    def test_patch_rejects_id_and_missing_profile(self, test_settings: Settings, sample_profile: dict):
+        """Test that ids are immutable and unknown profiles raise."""
+        manager = ProfileManager(test_settings)
+        manager.save_profile("test-profile", sample_profile)
+
+        with pytest.raises(ValueError):
+            manager.patch_profile("test-profile", 1, [{"op": "replace", "path": "/id", "value": "x"}])
+        with pytest.raises(ProfileNotFoundError):
+            manager.patch_profile("missing", 1, [])
+
+    def test_patch_rejects_out_of_range_control_index(self, test_settings: Settings, sample_profile: dict):
+        """Test that bad control indexes are patch errors, even as a move source."""
+        manager = ProfileManager(test_settings)
+        manager.save_profile("test-profile", sample_profile)
+
+        for pointer in ("/controls/99/label", "/controls/-1/label", "/controls/01/label"):
+            with pytest.raises(JsonPatchError):
+                manager.patch_profile("test-profile", 1, [{"op": "move", "from": pointer, "path": "/name"}])
+        with pytest.raises(JsonPatchError):
+            manager.patch_profile("test-profile", 1, [{"op": "replace", "path": "/controls/5/label", "value": "x"}])
+
+    def test_failed_patch_leaves_profile_untouched(self, test_settings: Settings, sample_profile: dict):
+        """Test that patches are all-or-nothing."""
+        manager = ProfileManager(test_settings)
+        manager.save_profile("test-profile", sample_profile)
+
+        with pytest.raises(JsonPatchError):
+            manager.patch_profile(
+                "test-profile",
+                1,
+                [
+                    {"op": "replace", "path": "/name", "value": "Changed"},
+                    {"op": "test", "path": "/rows", "value": 99},
+                ],
+            )
+
+        assert manager.get_profile("test-profile")["name"] == "Test Profile"
+
+
+class TestProfileEvents:
+    """Test profile change events and control-level diffs."""
+
+    def test_diff_round_trip(self):
+        """Test that applying a diff to the previous profile yields the current one."""
+        previous = {
+            "id": "p",
+            "name": "Old",
+            "version": 1,
+            "controls": [{"id": "a", "row": 0}, {"id": "b", "row": 1}, {"id": "c", "row": 2}],
+        }
+        current = {
+            "id": "p",
+            "name": "New",
+            "version": 2,
+            "controls": [{"id": "c", "row": 2}, {"id": "a", "row": 5}, {"id": "d", "row": 3}],
+        }
+
+        diff = diff_profiles(previous, current)
+
+        assert diff["profile"] == {"name": "New"}
+        assert [c["id"] for c in diff["upserted"]] == ["a", "d"]
+        assert diff["removed"] == ["b"]
+        assert diff["order"] == ["c", "a", "d"]
+        assert apply_profile_diff(previous, diff, version=2) == current
+
+    def test_diff_omits_order_when_implied(self):
+        """Test that appends and in-place edits don't ship an explicit order."""
+        previous = {"id": "p", "controls": [{"id": "a"}]}
+        current = {"id": "p", "controls": [{"id": "a", "label": "x"}, {"id": "b"}]}
+
+        assert "order" not in diff_profiles(previous, current)
+
+    def test_save_publishes_versioned_events(self, test_settings: Settings, sample_profile: dict):
+        """Test that saves bump the version and notify listeners."""
+        events = []
+        manager = ProfileManager(test_settings)
+        manager.events.add_listener("test", events.append)
+        try:
+            manager.save_profile("test-profile", sample_profile)
+            second = manager.save_profile("test-profile", {**sample_profile, "name": "Renamed"})
+            manager.delete_profile("test-profile")
+        finally:
+            manager.events.remove_listener("test")
+
+        assert second.version == 2
+        assert [e["type"] for e in events] == ["profile:changed", "profile:changed", "profile:deleted"]
+        assert events[1]["diff"] == {"profile": {"name": "Renamed"}}
+        assert events[2]["previousVersion"] == 2
+
+
+class TestProfileValidation:
+    """Test the compiled schema validator and grid occupancy checks."""
+
+    def test_schema_errors_carry_pointers(self):
+        """Test that schema violations are reported with JSON pointers."""
+        errors = get_profile_validator().errors(
+            {"id": "p", "rows": 0, "cols": 2, "controls": [{"id": "a", "type": "button", "row": "x", "col": 0}, 3]}
+        )
+
+        assert errors == [
+            "/name: required",
+            "/rows: must be >= 1",
+            "/controls/0/row: expected integer",
+            "/controls/1: expected object",
+        ]
+
+    def test_override_schema_is_interpreted(self, tmp_path: Path):
+        """Test that a config-dir schema is interpreted, not compiled, with the same errors."""
+        schema = json.loads(BUNDLED_SCHEMA_PATH.read_text(encoding="utf-8"))
+        injected = "x') or __import__('os')._exit(1) or ('"
+        schema["required"].append(injected)
+        (tmp_path / "profile.schema.json").write_text(json.dumps(schema), encoding="utf-8")
+        document = {"id": "p", "rows": 0, "cols": 2, "controls": [{"id": "a", "type": "button", "row": "x", "col": 0}, 3]}
+
+        errors = get_profile_validator(tmp_path).errors(document)
+        bundled = get_profile_validator().errors(document)
+
+        assert errors == bundled[:1] + [f"/{injected}: required"] + bundled[1:]
+        interpreted = ProfileValidator(json.loads(BUNDLED_SCHEMA_PATH.read_text(encoding="utf-8")), compiled=False)
+        assert interpreted.errors(document) == bundled
+
+    def test_grid_overlap_bounds_and_duplicates(self):
+        """Test that spans are placed on the grid and collisions are pinpointed."""
+        errors = check_grid(
+            2,
+            2,
+            [
+                {"id": "a", "row": 0, "col": 0, "rowSpan": 2, "colSpan": 2},
+                {"id": "b", "row": 1, "col": 1},
+                {"id": "a", "row": 0, "col": 2},
+            ],
+        )
+
+        assert errors == [
+            "/controls/1: 'b' overlaps /controls/0 ('a') at row 1, col 1",
+            "/controls/2: duplicate id 'a' (see /controls/0)",
+            "/controls/2: 'a' at row 0, col 2 (span 1x1) does not fit the 2x2 grid",
+        ]
+
+    def test_full_page_is_valid(self):
+        """Test that a fully packed 16x16 page passes."""
+        controls = [{"id": f"c{r}-{c}", "type": "button", "row": r, "col": c} for r in range(16) for c in range(16)]
+
+        get_profile_validator().validate({"id": "p", "name": "P", "rows": 16, "cols": 16, "controls": controls})
+
+    def test_save_rejects_overlap(self, test_settings: Settings, sample_profile: dict):
+        """Test that save_profile refuses overlapping controls."""
+        manager = ProfileManager(test_settings)
+        payload = {
+            **sample_profile,
+            "controls": sample_profile["controls"] + [{"id": "c2", "type": "button", "row": 0, "col": 0}],
+        }
+
+        with pytest.raises(ProfileValidationError) as exc:
+            manager.save_profile("test-profile", payload)
+
+        assert exc.value.errors == ["/controls/1: 'c2' overlaps /controls/0 ('ctrl-1') at row 0, col 0"]
+        assert manager.get_profile("test-profile") is None
+
+    def test_patch_rejects_span_overlap(self, test_settings: Settings, sample_profile: dict):
+        """Test that widening a control over a neighbour fails the patch."""
+        manager = ProfileManager(test_settings)
+        payload = {
+            **sample_profile,
+            "controls": sample_profile["controls"] + [{"id": "c2", "type": "button", "row": 0, "col": 1}],
+        }
+        manager.save_profile("test-profile", payload)
+
+        with pytest.raises(ProfileValidationError):
+            manager.patch_profile("test-profile", 1, [{"op": "add", "path": "/controls/0/colSpan", "value": 2}])
+
+        assert manager.get_profile("test-profile")["version"] == 1
+
+
+class TestSqliteProfileStore:
+    """Test the SQLite profile backend."""
+
+    @pytest.fixture
+    def sqlite_settings(self, test_settings: Settings) -> Settings:
+        return test_settings.model_copy(update={"profile_store": "sqlite"})
+
+    def test_crud_and_action_index(self, sqlite_settings: Settings, sample_profile: dict):
+        """Test the ProfileManager API on top of SQLite, including action lookups."""
+        manager = ProfileManager(sqlite_settings)
+        assert manager.store.backend == "sqlite"
+
+        manager.save_profile("test-profile", sample_profile)
+        manager.save_profile("other", {**sample_profile, "id": "other", "name": "Other", "controls": []})
+
+        assert manager.list_profiles() == [
+            {"id": "other", "name": "Other"},
+            {"id": "test-profile", "name": "Test Profile"},
+        ]
+        kind = sample_profile["controls"][0]["action"]["type"].lower()
+        assert manager.find_profiles_by_action(kind) == ["test-profile"]
+
+        patched = manager.patch_profile("test-profile", 1, [{"op": "remove", "path": "/controls/0/action"}])
+        assert patched["version"] == 2
+        assert manager.get_profile("test-profile")["controls"][0]["action"] is None
+        assert manager.find_profiles_by_action(kind) == []
+
+        assert manager.delete_profile("other") is True
+        assert manager.delete_profile("other") is False
+        assert manager.profile_ids() == ["test-profile"]
+        assert sqlite_settings.profiles_db_path.exists()
+
+    def test_migrates_json_directory_once(self, test_settings: Settings, sample_profile: dict):
+        """Test that existing JSON profiles are imported on first open only."""
+        (test_settings.profiles_dir / "test-profile.json").write_text(json.dumps(sample_profile))
+        (test_settings.profiles_dir / "broken.json").write_text("{not json")
+        (test_settings.profiles_dir / "malformed.json").write_text(json.dumps({"id": "malformed", "rows": "x"}))
+
+        store = SqliteProfileStore(test_settings.profiles_db_path)
+        assert store.migrate_json_dir(test_settings.profiles_dir) == 1
+        assert store.read("test-profile")["name"] == "Test Profile"
+
+        store.delete("test-profile")
+        assert store.migrate_json_dir(test_settings.profiles_dir) == 0
+        assert store.ids() == []
+        store.close()
+
+    def test_interrupted_migration_runs_again(self, test_settings: Settings, sample_profile: dict, monkeypatch):
+        """Test that the migrated marker commits together with the imported rows."""
+        (test_settings.profiles_dir / "test-profile.json").write_text(json.dumps(sample_profile))
+        store = SqliteProfileStore(test_settings.profiles_db_path)
+
+        def crash(connection, profile_id, document):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        monkeypatch.setattr(SqliteProfileStore, "_upsert", staticmethod(crash))
+        with pytest.raises(sqlite3.OperationalError):
+            store.migrate_json_dir(test_settings.profiles_dir)
+        monkeypatch.undo()
+
+        assert store.migrate_json_dir(test_settings.profiles_dir) == 1
+        store.close()
+
+    def test_unknown_backend_rejected(self, test_settings: Settings):
+        """Test that a typo in profile_store fails loudly."""
+        with pytest.raises(ValueError):
+            ProfileManager(test_settings.model_copy(update={"profile_store": "mongo"}))
+
+
+class TestProfileHistory:
+    """Test content-addressed version history."""
+
+    @staticmethod
+    def _page(label: str, count: int = 8) -> dict:
+        controls = [{"id": f"c{i}", "type": "button", "row": 0, "col": i, "label": f"b{i}"} for i in range(count)]
+        controls[0]["label"] = label
+        return {"id": "page", "name": "Page", "rows": 1, "cols": count, "controls": controls}
+
+    def test_versions_store_only_changed_controls(self, test_settings: Settings):
+        """Test that each save adds blobs for the changed controls only and versions rebuild."""
+        manager = ProfileManager(test_settings)
+        first = manager.save_profile("page", self._page("v1")).model_dump()
+        blobs = lambda: len(list((test_settings.history_dir / "blobs").glob("*/*")))  # noqa: E731
+        manager.flush()
+        after_first = blobs()
+
+        manager.save_profile("page", self._page("v2"))
+        manager.save_profile("page", self._page("v3"))
+        manager.flush()
+
+        assert blobs() == after_first + 2
+        assert [v["changedControls"] for v in manager.list_versions("page")] == [8, 1, 1]
+        assert manager.get_version("page", 1) == first
+        assert manager.get_version("page", 2)["controls"][0]["label"] == "v2"
+        assert manager.get_version("page", 9) is None
+
+    def test_rollback_saves_a_new_version(self, test_settings: Settings):
+        """Test that rolling back restores old content as the next version."""
+        manager = ProfileManager(test_settings)
+        manager.save_profile("page", self._page("v1"))
+        manager.patch_profile("page", 1, [{"op": "remove", "path": "/controls/3"}])
+
+        restored = manager.rollback_profile("page", 1)
+
+        assert restored.version == 3
+        assert len(manager.get_profile("page")["controls"]) == 8
+        with pytest.raises(ProfileNotFoundError):
+            manager.rollback_profile("page", 42)
+
+    def test_retention_prunes_and_collects_blobs(self, temp_data_dir: Path):
+        """Test that old versions fold into a new base and orphaned blobs are swept."""
+        history = ProfileHistory(temp_data_dir, keep=2, gc_interval=3600)
+        history._last_gc = time.monotonic()  # no background sweep during the test
+        for version in range(1, 4):
+            history.record("page", {**self._page(f"v{version}"), "version": version})
+        snapshot = history.get("page", 3)
+
+        # The fourth save exceeds keep + slack and prunes down to the last two versions
+        history.record("page", {**self._page("v4"), "version": 4})
+
+        assert [v["version"] for v in history.versions("page")] == [3, 4]
+        assert history.get("page", 1) is None
+        assert history.get("page", 3) == snapshot
+        # The v1 and v2 labels of c0 are no longer referenced
+        assert history.collect_garbage() == 2
+        assert history.collect_garbage() == 0
+        assert history.get("page", 3)["controls"][0]["label"] == "v3"
+
+    def test_replay_skips_unknown_ids_in_order(self, temp_data_dir: Path):
+        """Test that an order entry naming a control the log never stored is ignored."""
+        history = ProfileHistory(temp_data_dir)
+        history.record("page", {**self._page("v1", count=2), "version": 1})
+        history.flush()
+        with history._log_path("page").open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps({"version": 2, "savedAt": time.time(), "order": ["c1", "ghost", "c0"]}) + "\n")
+
+        rebuilt = history.get("page", 2)
+
+        assert [control["id"] for control in rebuilt["controls"]] == ["c1", "c0"]
+
+    def test_failed_history_write_restarts_from_the_log(self, temp_data_dir: Path, monkeypatch):
+        """Test that a failed append drops the queued deltas and the next save re-bases."""
+        history = ProfileHistory(temp_data_dir)
+        history.record("page", {**self._page("v1"), "version": 1})
+        history.flush()
+        original = ProfileHistory._append
+
+        def crash(self, profile_id, blobs, entry):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(ProfileHistory, "_append", crash)
+        history.record("page", {**self._page("v2"), "version": 2})
+        history.flush()
+        monkeypatch.setattr(ProfileHistory, "_append", original)
+        history.record("page", {**self._page("v3"), "version": 3})
+
+        assert [v["version"] for v in history.versions("page")] == [1, 3]
+        assert history.get("page", 3)["controls"][0]["label"] == "v3"
+
+
+class TestProfileQuery:
+    """Test paginated, projected listing from the metadata index."""
+
+    @pytest.fixture(params=["json", "sqlite"])
+    def manager(self, request, test_settings: Settings) -> ProfileManager:
+        manager = ProfileManager(test_settings.model_copy(update={"profile_store": request.param}))
+        for index, name in enumerate(["Delta", "alpha", "Charlie", "bravo", "Echo"]):
+            controls = [{"id": f"c{i}", "type": "button", "row": 0, "col": i} for i in range(index)]
+            manager.save_profile(f"p{index}", {"id": f"p{index}", "name": name, "rows": 1, "cols": 5, "controls": controls})
+        return manager
+
+    def test_pages_cover_every_profile_once(self, manager: ProfileManager):
+        """Test that following nextCursor walks the whole sorted listing."""
+        seen = []
+        cursor = None
+        while True:
+            page = manager.query_profiles(limit=2, cursor=cursor, sort="name", fields=["name", "controlCount"])
+            seen += page["profiles"]
+            cursor = page["nextCursor"]
+            if cursor is None:
+                break
+
+        assert [item["name"] for item in seen] == ["Charlie", "Delta", "Echo", "alpha", "bravo"]
+        assert seen[0] == {"id": "p2", "name": "Charlie", "controlCount": 2}
+
+    def test_descending_sort_and_cursor_survives_deletes(self, manager: ProfileManager):
+        """Test that keyset cursors stay valid when earlier items disappear."""
+        first = manager.query_profiles(limit=2, sort="-controlCount", fields=["controlCount"])
+        assert [item["id"] for item in first["profiles"]] == ["p4", "p3"]
+
+        manager.delete_profile("p4")
+        second = manager.query_profiles(limit=2, cursor=first["nextCursor"], sort="-controlCount")
+
+        assert [item["id"] for item in second["profiles"]] == ["p2", "p1"]
+        assert set(second["profiles"][0]) == {"id", "name", "version", "rows", "cols", "controlCount", "updatedAt"}
+
+    def test_rejects_bad_arguments(self, manager: ProfileManager):
+        """Test that unknown fields, sort keys and mismatched cursors raise."""
+        cursor = manager.query_profiles(limit=1)["nextCursor"]
+        with pytest.raises(ValueError):
+            manager.query_profiles(fields=["secret"])
+        with pytest.raises(ValueError):
+            manager.query_profiles(sort="rows")
+        with pytest.raises(ValueError):
+            manager.query_profiles(cursor=cursor, sort="name")
+        with pytest.raises(ValueError):
+            manager.query_profiles(cursor="garbage")
+
+    def test_rejects_cursor_value_of_the_wrong_type(self, manager: ProfileManager):
+        """Test that a well-formed cursor whose value doesn't fit the sort key raises ValueError."""
+        forged = base64.urlsafe_b64encode(json.dumps(["controlCount", "three", "p3"]).encode()).decode()
+        with pytest.raises(ValueError):
+            manager.query_profiles(cursor=forged, sort="controlCount")
+
+    def test_json_index_follows_external_changes(self, test_settings: Settings):
+        """Test that files added or removed behind the store's back show up in the listing."""
+        manager = ProfileManager(test_settings)
+        manager.save_profile("p0", {"id": "p0", "name": "Zero", "rows": 1, "cols": 1, "controls": []})
+        manager.flush()
+        assert [item["id"] for item in manager.query_profiles()["profiles"]] == ["p0"]
+
+        (test_settings.profiles_dir / "p0.json").unlink()
+        (test_settings.profiles_dir / "dropped.json").write_text(
+            json.dumps({"id": "dropped", "name": "Dropped", "rows": 1, "cols": 1, "controls": []})
+        )
+
+        assert manager.query_profiles(fields=["name"])["profiles"] == [{"id": "dropped", "name": "Dropped"}]
+
+
+class TestProfileTransfer:
+    """Test incremental NDJSON splitting for imports."""
+
+    def test_splitter_joins_chunks_and_drops_oversized_lines(self):
+        """Test that lines span chunks and oversized lines are skipped without buffering."""
+        splitter = NdjsonSplitter(max_line_bytes=8)
+
+        assert splitter.feed(b'{"a"') == []
+        assert splitter.feed(b':1}\n0123456789') == [b'{"a":1}', None]
+        assert splitter.feed(b'abc\n{}') == []
+        assert splitter.close() == [b"{}"]
+
+
+class TestJsonPatch:
+    """Test the RFC 6902 implementation."""
+
+    def test_operations(self):
+        """Test add/remove/replace/move/copy/test on a small document."""
+        document = {"a": {"b": [1, 2]}, "c~d": 1}
+        document = apply_patch(
+            document,
+            [
+                {"op": "add", "path": "/a/b/1", "value": 9},
+                {"op": "remove", "path": "/a/b/0"},
+                {"op": "replace", "path": "/c~0d", "value": 2},
+                {"op": "copy", "from": "/a/b", "path": "/e"},
+                {"op": "move", "from": "/e", "path": "/f"},
+                {"op": "test", "path": "/f", "value": [9, 2]},
+            ],
+        )
+        assert document == {"a": {"b": [9, 2]}, "c~d": 2, "f": [9, 2]}
+
+    def test_invalid_paths(self):
+        """Test that bad pointers and indices raise JsonPatchError."""
+        with pytest.raises(JsonPatchError):
+            apply_patch({"a": []}, [{"op": "replace", "path": "/a/0", "value": 1}])
+        with pytest.raises(JsonPatchError):
+            apply_patch({"a": []}, [{"op": "add", "path": "a", "value": 1}])
+        with pytest.raises(JsonPatchError):
+            apply_patch({"a": {}}, [{"op": "move", "from": "/a", "path": "/a/b"}])
+
 
 class TestControlModel:
     """Test the Control Pydantic model."""
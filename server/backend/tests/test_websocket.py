@@ -7,8 +7,10 @@ modules are reloaded per test to pick up the temp config.
 
 from __future__ import annotations
 
+import json
 import os
 import sys
+import time
 from typing import Tuple
 
 import pytest
@@ -20,6 +22,8 @@ from starlette.websockets import WebSocketDisconnect
 MODULES_TO_RESET = [
     "app.config",
     "app.utils.token_manager",
+    "app.utils.profile_manager",
+    "app.routes",
     "app.routes.tokens",
     "app.routes.profiles",
     "app.routes.health",
@@ -97,3 +101,411 @@ def test_websocket_invalid_json_returns_error(client):
         message = ws.receive_json()
         assert message["type"] == "error"
         assert message["error"] == "invalid_json"
+
+
+def test_websocket_pushes_profile_deltas_to_viewers(client):
+    test_client, token = client
+
+    profile = {
+        "id": "live",
+        "name": "Live",
+        "rows": 2,
+        "cols": 2,
+        "controls": [
+            {"id": "a", "type": "button", "row": 0, "col": 0},
+            {"id": "b", "type": "button", "row": 0, "col": 1},
+        ],
+    }
+    assert test_client.post("/profiles/live", json=profile).status_code == 200
+
+    with test_client.websocket_connect(
+        "/ws", headers={"Authorization": f"Bearer {token}"}
+    ) as ws:
+        ws.send_json({"kind": "profile:select", "profileId": "live", "messageId": "sel"})
+        assert ws.receive_json()["type"] == "profile:select:ack"
+
+        patch = test_client.patch(
+            "/profiles/live",
+            json={"version": 1, "operations": [{"op": "replace", "path": "/controls/1/label", "value": "B"}]},
+        )
+        assert patch.status_code == 200
+
+        event = ws.receive_json()
+        assert event["type"] == "profile:changed"
+        assert event["profileId"] == "live"
+        assert event["version"] == 2
+        assert event["previousVersion"] == 1
+        assert [c["id"] for c in event["diff"]["upserted"]] == ["b"]
+        assert "removed" not in event["diff"]
+
+        assert test_client.delete("/profiles/live").status_code == 200
+        deleted = ws.receive_json()
+        assert deleted == {"type": "profile:deleted", "profileId": "live", "previousVersion": 2}
+
+
+def test_websocket_control_press_resolves_stored_action(client):
+    test_client, token = client
+
+    profile = {
+        "id": "deck",
+        "name": "Deck",
+        "rows": 1,
+        "cols": 2,
+        "controls": [
+            {"id": "procs", "type": "button", "row": 0, "col": 0,
+             "action": {"type": "processes", "payload": {"limit": 1}}},
+            {"id": "noop", "type": "button", "row": 0, "col": 1},
+        ],
+    }
+    assert test_client.post("/profiles/deck", json=profile).status_code == 200
+
+    with test_client.websocket_connect(
+        "/ws", headers={"Authorization": f"Bearer {token}"}
+    ) as ws:
+        ws.send_json({"kind": "control:press", "profileId": "deck", "controlId": "procs", "messageId": "p1"})
+        ack = ws.receive_json()
+        assert ack["type"] == "ack"
+        assert ack["status"] == "ok"
+        assert ack["controlId"] == "procs"
+        assert ack["messageId"] == "p1"
+
+        ws.send_json({"kind": "control:press", "profileId": "deck", "controlId": "noop", "messageId": "p2"})
+        assert ws.receive_json()["error"] == "unknown control"
+
+        # Controls removed from the saved profile can no longer be pressed
+        patch = test_client.patch(
+            "/profiles/deck", json={"version": 1, "operations": [{"op": "remove", "path": "/controls/0"}]}
+        )
+        assert patch.status_code == 200
+        ws.send_json({"kind": "control:press", "profileId": "deck", "controlId": "procs", "messageId": "p3"})
+        assert ws.receive_json()["error"] == "unknown control"
+
+
+def test_websocket_mapping_trigger_uses_config_mappings(client, tmp_path):
+    test_client, token = client
+    (tmp_path / "config" / "mappings.json").write_text(
+        json.dumps({"procs": {"action": "processes", "payload": {"limit": 1}}, "bad": {"action": "nope"}})
+    )
+
+    with test_client.websocket_connect(
+        "/ws", headers={"Authorization": f"Bearer {token}"}
+    ) as ws:
+        ws.send_json({"kind": "mapping:trigger", "mappingId": "procs", "messageId": "m1"})
+        ack = ws.receive_json()
+        assert ack["status"] == "ok"
+        assert ack["mappingId"] == "procs"
+
+        ws.send_json({"kind": "mapping:trigger", "mappingId": "bad", "messageId": "m2"})
+        assert ws.receive_json()["error"] == "unknown mapping"
+
+
+def test_mapping_loader_swaps_table_on_change(tmp_path):
+    from app.utils.mapping_table import MappingLoader
+
+    handlers = {"keyboard": lambda data: {"status": "ok"}}
+    file = tmp_path / "mappings.json"
+    file.write_text(json.dumps({"a": {"action": "keyboard", "payload": "A"}}))
+    loader = MappingLoader([tmp_path], handlers, poll_interval=0)
+    loader.start()
+    first = loader.table
+
+    assert loader.resolve("a").payload == "A"
+    assert loader.reload() is False
+
+    file.write_text(json.dumps({"a": {"action": "KEYBOARD", "payload": "B"}, "b": {"type": "keyboard"}}))
+    assert loader.reload() is True
+    assert loader.resolve("a").payload == "B"
+    assert loader.resolve("b").action == "keyboard"
+    assert first.resolve("a").payload == "A"  # published tables are never mutated
+
+    file.write_text("{broken")
+    assert loader.reload() is False
+    assert loader.stats()["mappings"] == 2
+
+
+class _EventedOBS:
+    """Connected OBS stand-in that answers the state mirror's resync batches."""
+
+    connected = True
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.listeners = []
+
+    def add_event_listener(self, listener):
+        self.listeners.append(listener)
+
+    def connect(self):
+        pass
+
+    def call_batch(self, requests, execution_type="serial", halt_on_failure=False):
+        return [
+            {"requestType": r["requestType"], "ok": True, "code": 100, "comment": None,
+             "responseData": self.responses.get(r["requestType"], {})}
+            for r in requests
+        ]
+
+
+def test_websocket_pushes_obs_control_state(tmp_path, monkeypatch):
+    from app.actions import obs
+    from app.actions.obs_state import OBSStateMirror
+
+    mirror = OBSStateMirror(_EventedOBS({
+        "GetCurrentProgramScene": {"currentProgramSceneName": "Main"},
+        "GetStreamStatus": {"outputActive": True},
+    }))
+    mirror.resync()
+    monkeypatch.setitem(obs.get_pool()._instances, "default", obs.OBSInstance("default", mirror.client, mirror))
+    test_client, token = _fresh_client(tmp_path)
+
+    profile = {
+        "id": "obs",
+        "name": "OBS",
+        "rows": 1,
+        "cols": 3,
+        "controls": [
+            {"id": "live", "type": "button", "row": 0, "col": 0,
+             "action": {"type": "obs", "payload": "TOGGLE_STREAMING"}},
+            {"id": "main", "type": "button", "row": 0, "col": 1,
+             "action": {"type": "obs", "payload": {"action": "SET_SCENE", "params": {"sceneName": "Main"}}}},
+            {"id": "brb", "type": "button", "row": 0, "col": 2,
+             "action": {"type": "obs", "payload": {"action": "SET_SCENE", "params": {"sceneName": "BRB"}}}},
+        ],
+    }
+    assert test_client.post("/profiles/obs", json=profile).status_code == 200
+
+    with test_client.websocket_connect(
+        "/ws", headers={"Authorization": f"Bearer {token}"}
+    ) as ws:
+        ws.send_json({"kind": "profile:select", "profileId": "obs", "messageId": "sel"})
+        assert ws.receive_json()["type"] == "profile:select:ack"
+        initial = {}
+        for _ in range(3):
+            state = ws.receive_json()
+            initial[state["controlId"]] = state["value"]
+        assert initial == {"live": 1, "main": 1, "brb": 0}
+
+        # A scene switch in OBS updates the scene buttons only
+        mirror.on_event("CurrentProgramSceneChanged", {"sceneName": "BRB"})
+        pushed = {}
+        for _ in range(2):
+            state = ws.receive_json()
+            assert state["type"] == "control:state"
+            pushed[state["controlId"]] = state["value"]
+        assert pushed == {"main": 0, "brb": 1}
+
+        mirror.on_event("StreamStateChanged", {"outputActive": False, "outputState": "OBS_WEBSOCKET_OUTPUT_STOPPED"})
+        assert ws.receive_json() == {"type": "control:state", "profileId": "obs", "controlId": "live", "value": 0}
+
+
+class _MeteredOBS(_EventedOBS):
+    event_subscriptions = 0
+
+    def set_event_subscriptions(self, mask):
+        self.event_subscriptions = mask
+
+
+def test_websocket_streams_obs_meters(tmp_path, monkeypatch):
+    from app.actions import obs
+
+    source = _MeteredOBS({})
+    monkeypatch.setitem(obs.get_pool()._instances, "default", obs.OBSInstance("default", source))
+    test_client, token = _fresh_client(tmp_path)
+
+    with test_client.websocket_connect(
+        "/ws", headers={"Authorization": f"Bearer {token}"}
+    ) as ws:
+        ws.send_json({"kind": "obs:meters:subscribe", "rate": 20, "messageId": "m"})
+        ack = ws.receive_json()
+        assert ack["status"] == "ok" and ack["rate"] == 20
+        assert source.event_subscriptions
+
+        for listener in source.listeners:
+            listener("InputVolumeMeters", {"inputs": [{"inputName": "Mic", "inputLevelsMul": [[1.0, 1.0, 1.0]]}]})
+        frame = ws.receive_json()
+        assert frame == {"type": "obs:meters", "inputs": ["Mic"], "peak": [255], "rms": [255], "obs": "default"}
+
+        ws.send_json({"kind": "obs:meters:unsubscribe"})
+        assert ws.receive_json()["status"] == "ok"
+        assert source.event_subscriptions == 0
+
+        ws.send_json({"kind": "obs:meters:subscribe", "obs": "nope"})
+        assert ws.receive_json()["error"] == "Unknown OBS instance: nope"
+
+        ws.send_text('{"kind": "obs:meters:subscribe", "rate": Infinity}')
+        assert ws.receive_json()["status"] == "error"
+        ws.send_text("ping")
+        assert ws.receive_text() == "pong"
+
+
+class _ScreenshotOBS(_EventedOBS):
+    def call_batch(self, requests, execution_type="serial", halt_on_failure=False):
+        if requests[0]["requestType"] != "GetSourceScreenshot":
+            return super().call_batch(requests, execution_type, halt_on_failure)
+        return [
+            {"requestType": "GetSourceScreenshot", "ok": True, "code": 100, "comment": None,
+             "responseData": {"imageData": "data:image/png;base64,iVBORw0K"}}
+            for _ in requests
+        ]
+
+
+def test_obs_thumbnails_rest_and_push(tmp_path, monkeypatch):
+    from app.actions import obs
+
+    instance = obs.OBSInstance("default", _ScreenshotOBS({}))
+    monkeypatch.setitem(obs.get_pool()._instances, "default", instance)
+    test_client, token = _fresh_client(tmp_path)
+
+    first = test_client.get("/obs/thumbnails/Main")
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "image/png"
+    etag = first.headers["etag"]
+    assert test_client.get("/obs/thumbnails/Main", headers={"If-None-Match": etag}).status_code == 304
+    assert test_client.get("/obs/thumbnails/Main?obs=nope").status_code == 404
+
+    with test_client.websocket_connect(
+        "/ws", headers={"Authorization": f"Bearer {token}"}
+    ) as ws:
+        ws.send_json({"kind": "obs:thumbnails:subscribe", "scenes": ["Main", "BRB"]})
+        ack = ws.receive_json()
+        assert ack["status"] == "ok"
+        assert [t["scene"] for t in ack["thumbnails"]] == ["Main"]
+        assert ack["thumbnails"][0]["etag"] == etag.strip('"')
+
+        # Main is unchanged, so only the newly watched BRB is announced
+        pushed = ws.receive_json()
+        assert pushed == {"type": "obs:thumbnail", "obs": "default", "scene": "BRB",
+                          "etag": etag.strip('"'), "url": "/obs/thumbnails/BRB"}
+    instance.thumbnails.close()
+
+
+def test_websocket_runs_only_obs_actions_off_the_loop(client, monkeypatch):
+    import asyncio
+
+    from app import websocket as websocket_module
+
+    def on_loop() -> bool:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    ran = {}
+
+    def recorder(action):
+        def handler(data):
+            ran[action] = on_loop()
+            return {}
+
+        return handler
+
+    for action in ("keyboard", "audio", "obs"):
+        monkeypatch.setitem(websocket_module.ACTION_HANDLERS, action, recorder(action))
+    test_client, token = client
+
+    with test_client.websocket_connect("/ws", headers={"Authorization": f"Bearer {token}"}) as ws:
+        for action in ("keyboard", "audio", "obs"):
+            ws.send_json({"action": action, "payload": {}, "messageId": action})
+            assert ws.receive_json()["status"] == "ok"
+
+    # Keyboard and audio stay on the event loop thread; only OBS goes to the executor
+    assert ran == {"keyboard": True, "audio": True, "obs": False}
+
+
+def test_websocket_held_keys_released_on_disconnect(client, monkeypatch):
+    from app.actions import keyboard as keyboard_module
+    from app.actions.keyboard_backend import KeyboardController, RecordingBackend
+
+    controller = KeyboardController(RecordingBackend())
+    monkeypatch.setattr(keyboard_module, "_controller", controller)
+    monkeypatch.setattr(keyboard_module, "_held", None)
+    test_client, token = client
+
+    with test_client.websocket_connect("/ws", headers={"Authorization": f"Bearer {token}"}) as ws:
+        ws.send_json({"action": "keyboard:down", "payload": "f13", "messageId": "ptt"})
+        ack = ws.receive_json()
+        assert ack["status"] == "ok" and ack["messageId"] == "ptt"
+        assert controller.backend.keys() == [("down", "f13")]
+        ws.send_text("ping")
+        assert ws.receive_text() == "pong"
+
+    for _ in range(100):
+        if len(controller.backend.events) == 2:
+            break
+        time.sleep(0.01)
+    assert controller.backend.keys() == [("down", "f13"), ("up", "f13")]
+    controller.close()
+
+
+def test_websocket_state_dropped_when_server_closes(client, monkeypatch):
+    from app import websocket as websocket_module
+    from app.actions import keyboard as keyboard_module
+    from app.actions.keyboard_backend import KeyboardController, RecordingBackend
+
+    controller = KeyboardController(RecordingBackend())
+    monkeypatch.setattr(keyboard_module, "_controller", controller)
+    monkeypatch.setattr(keyboard_module, "_held", None)
+    test_client, token = client
+
+    with test_client.websocket_connect("/ws", headers={"Authorization": f"Bearer {token}"}) as ws:
+        ws.send_json({"action": "keyboard:down", "payload": "f13", "messageId": "ptt"})
+        assert ws.receive_json()["status"] == "ok"
+        # An oversized message makes the server close the socket itself
+        ws.send_text("x" * (websocket_module.settings.max_message_size + 1))
+        with pytest.raises(WebSocketDisconnect):
+            ws.receive_text()
+
+    for _ in range(100):
+        if len(controller.backend.events) == 2:
+            break
+        time.sleep(0.01)
+    assert controller.backend.keys() == [("down", "f13"), ("up", "f13")]
+    assert not websocket_module.connections
+    controller.close()
+
+
+def test_websocket_keyboard_type_cancelled_by_message_id(client, monkeypatch):
+    from app.actions import keyboard as keyboard_module
+    from app.actions.keyboard_backend import KeyboardController, RecordingBackend
+
+    controller = KeyboardController(RecordingBackend())
+    monkeypatch.setattr(keyboard_module, "_controller", controller)
+    monkeypatch.setattr(keyboard_module, "_typer", None)
+    test_client, token = client
+
+    with test_client.websocket_connect("/ws", headers={"Authorization": f"Bearer {token}"}) as ws:
+        ws.send_json({"action": "keyboard:type", "payload": {"text": "x" * 200, "rate": 50}, "messageId": "t1"})
+        ack = ws.receive_json()
+        assert ack["status"] == "ok" and ack["queued"] == 200 and ack["messageId"] == "t1"
+
+        ws.send_json({"action": "keyboard:type:cancel", "payload": "t1", "messageId": "c1"})
+        messages = {message["messageId"]: message for message in (ws.receive_json(), ws.receive_json())}
+        assert messages["c1"]["cancelled"] is True
+        assert messages["t1"]["type"] == "keyboard:typed"
+        assert messages["t1"]["cancelled"] is True and messages["t1"]["typed"] < 200
+    controller.close()
+
+
+def test_websocket_streams_script_output(client, tmp_path, monkeypatch):
+    from app.actions import scripts as scripts_module
+
+    scripts_dir = tmp_path / "scripts"
+    scripts_dir.mkdir(exist_ok=True)
+    script = scripts_dir / "hello.sh"
+    script.write_text("#!/bin/bash\necho hello\necho oops >&2\n")
+    script.chmod(0o755)
+    monkeypatch.setattr(scripts_module, "ALLOWED_SCRIPT_DIRS", [scripts_dir])
+    test_client, token = client
+
+    with test_client.websocket_connect("/ws", headers={"Authorization": f"Bearer {token}"}) as ws:
+        ws.send_json({"action": "scripts", "payload": [str(script)], "messageId": "s1"})
+        messages = []
+        while not messages or messages[-1]["type"] != "ack":
+            messages.append(ws.receive_json())
+
+    output = [message for message in messages if message["type"] == "script:output"]
+    assert all(message["messageId"] == "s1" for message in output)
+    assert "".join(m["data"] for m in output if m["stream"] == "stdout") == "hello\n"
+    assert "".join(m["data"] for m in output if m["stream"] == "stderr") == "oops\n"
+    assert messages[-1]["status"] == "ok" and messages[-1]["stdout"] == "hello\n"